@@ -11,6 +11,10 @@ from app.controllers.api.admin.faculty_management import admin_faculty_bp
 from app.controllers.api.admin.major_management import admin_major_bp
 from app.controllers.api.admin.role_management import admin_role_bp
 from app.controllers.api.admin.user_management import admin_user_bp
+from app.commands import backfill_name_normalized
+from app.utils.token_blocklist import init_blocklist
+from app.utils.reset_code_store import init_reset_codes
+from app.services.mail_queue import init_mail_queue
 
 def create_app():
     app = Flask(__name__)
@@ -19,6 +23,8 @@ def create_app():
     # Khởi tạo các extension
     db.init_app(app)
     jwt.init_app(app)
+    init_blocklist(app)
+    init_reset_codes(app)
 
     # Đăng ký các blueprint
     app.register_blueprint(auth_bp, url_prefix="/api/auth")
@@ -32,5 +38,8 @@ def create_app():
     app.register_blueprint(admin_user_bp, url_prefix="/api/user")
 
     mail.init_app(app)
+    init_mail_queue(app)
+
+    app.cli.add_command(backfill_name_normalized)
     return app
     
\ No newline at end of file
@@ -0,0 +1,22 @@
+import click
+from sqlalchemy import update
+from app import db
+from app.models.user import Users, Faculty, Major
+from app.utils.text_helper import normalize_text
+
+
+# Điền name_normalized cho dữ liệu user/khoa/chuyên ngành có sẵn trước khi có cột này:
+#   flask --app run backfill-name-normalized
+@click.command('backfill-name-normalized')
+def backfill_name_normalized():
+    for model in (Users, Faculty, Major):
+        rows = db.session.query(model.id, model.name, model.name_normalized).all()
+        updates = [
+            {'id': id, 'name_normalized': normalize_text(name)}
+            for id, name, current in rows
+            if current != normalize_text(name)
+        ]
+        if updates:
+            db.session.execute(update(model), updates)
+        click.echo(f'{model.__tablename__}: cập nhật {len(updates)}/{len(rows)} dòng')
+    db.session.commit()
@@ -7,11 +7,47 @@ class Config:
     SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey")
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "superjwtsecretkey")
 
+    # Số process dùng để băm mật khẩu khi import danh sách (1 = băm tuần tự).
+    # Mỗi worker gunicorn có pool riêng nên tổng số process = số worker x giá trị này
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+    PASSWORD_HASH_CHUNK_SIZE = int(os.getenv("PASSWORD_HASH_CHUNK_SIZE", 16))
+
+    # Job import chạy nền: thư mục chứa file upload/kết quả + SQLite trạng thái job
+    IMPORT_JOBS_DIR = os.getenv("IMPORT_JOBS_DIR", os.path.join('tmp', 'import_jobs'))
+    IMPORT_JOB_WORKERS = int(os.getenv("IMPORT_JOB_WORKERS", 2))
+
+    # Thời gian sống (giây) của cache danh mục khoa/chuyên ngành trong mỗi process
+    CATALOG_CACHE_TTL = int(os.getenv("CATALOG_CACHE_TTL", 300))
+
+    # Thời gian (giây) mỗi process tin phiên bản vai trò đã cache khi kiểm tra claim vai trò trong JWT
+    ROLE_VERSION_TTL = int(os.getenv("ROLE_VERSION_TTL", 30))
+
+    # Chu kỳ (giây) mỗi process dựng lại ma trận vai trò -> quyền
+    PERMISSION_MATRIX_TTL = int(os.getenv("PERMISSION_MATRIX_TTL", 300))
+
+    # Token đã đăng xuất: 'sqlite' (dùng chung giữa các worker trên máy) hoặc 'memory' (1 worker)
+    TOKEN_BLOCKLIST_BACKEND = os.getenv("TOKEN_BLOCKLIST_BACKEND", "sqlite")
+    TOKEN_BLOCKLIST_PATH = os.getenv("TOKEN_BLOCKLIST_PATH", os.path.join('tmp', 'token_blocklist.sqlite3'))
+
+    # Mã khôi phục mật khẩu: 'sqlite' (dùng chung giữa các worker) hoặc 'memory'
+    RESET_CODE_BACKEND = os.getenv("RESET_CODE_BACKEND", "sqlite")
+    RESET_CODE_PATH = os.getenv("RESET_CODE_PATH", os.path.join('tmp', 'reset_codes.sqlite3'))
+    RESET_CODE_TTL = int(os.getenv("RESET_CODE_TTL", 600))
+    RESET_CODE_MAX_ATTEMPTS = int(os.getenv("RESET_CODE_MAX_ATTEMPTS", 5))
+    RESET_CODE_SWEEP_INTERVAL = int(os.getenv("RESET_CODE_SWEEP_INTERVAL", 300))
+
     # Cấu hình Gmail SMTP
-    MAIL_SERVER = 'smtp.gmail.com'
-    MAIL_PORT = 587
-    MAIL_USE_TLS = True
+    MAIL_SERVER = os.getenv("MAIL_SERVER", 'smtp.gmail.com')
+    MAIL_PORT = int(os.getenv("MAIL_PORT", 587))
+    MAIL_USE_TLS = os.getenv("MAIL_USE_TLS", "1") == "1"
     MAIL_USERNAME = 'nguyennhatminh230203@gmail.com'  # Gmail của bạn
     MAIL_PASSWORD = 'inya kohq ohmd iujt'  # App Password của bạn
     MAIL_DEFAULT_SENDER = 'nguyennhatminh230203@gmail.com'
+
+    # Hàng đợi gửi mail nền: số mail tối đa đang chờ, số lần thử lại, thời gian chờ
+    # lần thử lại đầu (giây, gấp đôi sau mỗi lần), đóng kết nối SMTP sau bao nhiêu giây rảnh
+    MAIL_QUEUE_MAX_SIZE = int(os.getenv("MAIL_QUEUE_MAX_SIZE", 10000))
+    MAIL_QUEUE_MAX_RETRIES = int(os.getenv("MAIL_QUEUE_MAX_RETRIES", 3))
+    MAIL_QUEUE_BACKOFF = float(os.getenv("MAIL_QUEUE_BACKOFF", 2))
+    MAIL_QUEUE_IDLE_TIMEOUT = float(os.getenv("MAIL_QUEUE_IDLE_TIMEOUT", 30))
     
@@ -6,30 +6,35 @@ from app.models.user import Users, Student, Instructor, UserRole, Role, Faculty,
 from app import db
 from werkzeug.security import generate_password_hash
 from datetime import datetime
-from functools import wraps
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from werkzeug.security import check_password_hash
 import random
 from flask_mail import Message
-from app.extensions import mail, db
+from app.extensions import db
 from werkzeug.utils import secure_filename
 import os
 from app.utils.course_helper import generate_prefix_from_name
+from app.utils.table_reader import open_table
+from app.services.catalog_import import import_faculty_major_rows
+from app.services.catalog_cache import get_faculty, get_major
+from app.services.user_query import (
+    list_users, parse_user_list_args, build_user_export_query, user_row_to_dict
+)
+from app.utils.streaming import requested_stream_format, stream_query
+from app.services.user_import import (
+    import_student_file, import_instructor_file,
+    STUDENT_COLUMNS, INSTRUCTOR_COLUMNS
+)
+from app.services.import_checkpoints import file_sha256
+from app.services.role_claims import bump_role_version, invalidate_role_version
+from app.utils.user_helper import role_required
+from app.services.mail_queue import send_async, mail_queue_stats
+from app.utils.reset_code_store import (
+    save_reset_code, verify_reset_code, CODE_OK, CODE_MISSING, CODE_LOCKED
+)
 
 admin_bp = Blueprint('admin_bp', __name__)
 
-# Hàm tạo student_id từ năm nhập học, ngành, khoa và STT
-def generate_student_id(enrollment_year, faculty_id, major_id, stt):
-    year_suffix = str(enrollment_year)[-2:]
-    faculty_code = str(faculty_id).zfill(2)
-    major_code = str(major_id).zfill(2)
-    stt_code = str(stt).zfill(4)
-    return f"{year_suffix}{faculty_code}{major_code}{stt_code}"
-
-# Hàm tạo email sinh viên từ student_id
-def generate_student_email(student_id):
-    return f"{student_id}@daihocnguyentrai.edu.vn"
-
 @admin_bp.route('/upload-student-list', methods=['POST'])
 def upload_student_list():
     if 'file' not in request.files:
@@ -38,111 +43,18 @@ def upload_student_list():
     file = request.files['file']
 
     try:
-        df = pd.read_excel(file)
+        file_hash = file_sha256(file)
+        reader = open_table(file)
     except Exception as e:
         return jsonify({'error': f"Lỗi khi đọc file: {str(e)}"}), 500
 
-    # Các cột bắt buộc
-    required_columns = ['STT', 'Tên', 'Ngày tháng năm sinh', 'CCCD', 'Faculty', 'Major', 'Enrollment Year', 'SĐT', 'Giới tính', 'Địa chỉ']
-    for column in required_columns:
-        if column not in df.columns:
-            return jsonify({'error': f"Cột '{column}' không tồn tại trong file Excel"}), 400
-
-    faculties_dict = {f.name: f.id for f in Faculty.query.all()}
-    majors_dict = {m.name: m.id for m in Major.query.all()}
-
-    success_results = []
-    error_results = []
-    existing_emails = set()
-
-    gender_map = {
-        'nam': 'male',
-        'nữ': 'female',
-        'nu': 'female',
-        'khác': 'other',
-        'other': 'other'
-    }
-
-    for index, row in df.iterrows():
-        try:
-            name = row['Tên']
-            dob = row['Ngày tháng năm sinh']
-            cccd = str(row['CCCD']).strip()
-            faculty_name = row['Faculty']
-            major_name = row['Major']
-            enrollment_year = str(row['Enrollment Year']).strip()
-            phone = str(row['SĐT']).strip()
-            stt = row['STT']
-            address = str(row['Địa chỉ']).strip()
-            gender_raw = str(row['Giới tính']).strip().lower()
-            gender = gender_map.get(gender_raw, 'other')
-
-            faculty_id = faculties_dict.get(faculty_name)
-            major_id = majors_dict.get(major_name)
-
-            if not faculty_id or not major_id:
-                error_results.append(f"Không tìm thấy ID cho Faculty: {faculty_name}, Major: {major_name}")
-                continue
-
-            if isinstance(dob, str):
-                try:
-                    dob = datetime.strptime(dob, '%d/%m/%Y').date()
-                except ValueError:
-                    error_results.append(f"Không thể chuyển đổi ngày sinh cho {name}: {dob}")
-                    continue
-
-            student_id = generate_student_id(enrollment_year, major_id, faculty_id, stt)
-            email = generate_student_email(student_id)
-
-            if db.session.query(Users).filter_by(email=email).first():
-                error_results.append(f"Email {email} đã tồn tại trong hệ thống")
-                continue
-
-            if email in existing_emails:
-                error_results.append(f"Email {email} bị trùng trong file Excel")
-                continue
-
-            existing_emails.add(email)
-
-            if db.session.query(Student).filter_by(student_id=student_id).first():
-                error_results.append(f"Student ID {student_id} đã tồn tại trong hệ thống")
-                continue
-
-            hashed_password = generate_password_hash(cccd)
-
-            user = Users(
-                email=email,
-                password=hashed_password,
-                name=name,
-                phone=phone,
-                birth=dob,
-                first_login=True,
-                gender=gender,
-                address=address
-            )
-            db.session.add(user)
-            db.session.flush()
-
-            student = Student(
-                user_id=user.id,
-                student_id=student_id,
-                faculty_id=faculty_id,
-                major_id=major_id,
-                enrollment_year=enrollment_year,
-            )
-            db.session.add(student)
-
-            db.session.commit()
-
-            success_results.append({
-                'STT': len(success_results) + 1,
-                'Tên': name,
-                'Gmail': email
-            })
-
-        except Exception as e:
-            db.session.rollback()
-            error_results.append(f"Lỗi xử lý sinh viên {name if 'name' in locals() else '[Không rõ]'}: {str(e)}")
+    with reader:
+        # Các cột bắt buộc
+        for column in STUDENT_COLUMNS:
+            if column not in reader.columns:
+                return jsonify({'error': f"Cột '{column}' không tồn tại trong file"}), 400
+
+        success_results, error_results = import_student_file(reader, file_hash=file_hash)
 
     # Tạo file Excel trả về
     output = BytesIO()
@@ -164,27 +76,6 @@ def upload_student_list():
         mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
     )
 
-# Hàm tạo mã giảng viên
-def generate_instructor_id(faculty_id, stt):
-    faculty_code = str(faculty_id).zfill(2)
-    stt_code = str(stt).zfill(4)
-    return f"GV{faculty_code}{stt_code}"
-
-# Hàm tạo email giảng viên
-def generate_instructor_email(employee_id):
-    return f"{employee_id}@daihocnguyentrai.edu.vn"
-
-# Hàm lấy STT tiếp theo theo faculty
-def get_next_instructor_stt(faculty_id):
-    faculty_code = str(faculty_id).zfill(2)
-    existing_ids = db.session.query(Instructor.employee_id).all()
-    filtered = [
-        int(eid[0][len("GV" + faculty_code):])
-        for eid in existing_ids
-        if eid[0].startswith(f"GV{faculty_code}")
-    ]
-    return max(filtered) + 1 if filtered else 1
-
 @admin_bp.route('/upload-instructor-list', methods=['POST'])
 def upload_instructor_list():
     if 'file' not in request.files:
@@ -193,122 +84,17 @@ def upload_instructor_list():
     file = request.files['file']
 
     try:
-        df = pd.read_excel(file)
+        file_hash = file_sha256(file)
+        reader = open_table(file)
     except Exception as e:
         return jsonify({'error': f"Lỗi khi đọc file: {str(e)}"}), 500
 
-    required_columns = [
-        'STT', 'Tên', 'Ngày tháng năm sinh', 'CCCD', 'Faculty',
-        'SĐT', 'Giới tính', 'Địa chỉ', 'Vị trí', 'Học vị', 'Năm vào'
-    ]
-    for column in required_columns:
-        if column not in df.columns:
-            return jsonify({'error': f"Cột '{column}' không tồn tại trong file Excel"}), 400
-
-    faculties_dict = {f.name: f.id for f in Faculty.query.all()}
-    success_results = []
-    error_results = []
-    existing_emails = set()
-    faculty_stt_map = {}
-
-    gender_map = {
-        'nam': 'male',
-        'nữ': 'female',
-        'nu': 'female',
-        'khác': 'other',
-        'other': 'other'
-    }
-
-    for index, row in df.iterrows():
-        try:
-            name = row['Tên']
-            dob = row['Ngày tháng năm sinh']
-            cccd = str(row['CCCD']).strip()
-            faculty_name = row['Faculty']
-            phone = str(row['SĐT']).strip()
-            gender_raw = str(row['Giới tính']).strip().lower()
-            address = str(row['Địa chỉ']).strip()
-            position = str(row['Vị trí']).strip()
-            degree = str(row['Học vị']).strip()
-            joined_year_raw = row['Năm vào']
-            joined_year = str(int(joined_year_raw)) if pd.notnull(joined_year_raw) else None
-
-            gender = gender_map.get(gender_raw, 'other')
-
-            faculty_id = faculties_dict.get(faculty_name)
-            if not faculty_id:
-                error_results.append(f"Khoa không hợp lệ: {faculty_name}")
-                continue
-
-            # Xử lý ngày sinh
-            if isinstance(dob, str):
-                try:
-                    dob = datetime.strptime(dob, '%d/%m/%Y').date()
-                except ValueError:
-                    error_results.append(f"Không thể chuyển đổi ngày sinh cho {name}: {dob}")
-                    continue
-
-            # Lấy STT kế tiếp theo khoa
-            if faculty_id not in faculty_stt_map:
-                faculty_stt_map[faculty_id] = get_next_instructor_stt(faculty_id)
-
-            next_stt = faculty_stt_map[faculty_id]
-            faculty_stt_map[faculty_id] += 1
-
-            # Tạo mã nhân viên và email
-            employee_id = generate_instructor_id(faculty_id, next_stt)
-            email = generate_instructor_email(employee_id)
-
-            if db.session.query(Users).filter_by(email=email).first():
-                error_results.append(f"Email {email} đã tồn tại trong hệ thống")
-                continue
-
-            if db.session.query(Instructor).filter_by(employee_id=employee_id).first():
-                error_results.append(f"Mã nhân viên {employee_id} đã tồn tại")
-                continue
-
-            if email in existing_emails:
-                error_results.append(f"Email {email} bị trùng trong file Excel")
-                continue
-
-            existing_emails.add(email)
-
-            hashed_password = generate_password_hash(cccd)
-
-            user = Users(
-                email=email,
-                password=hashed_password,
-                name=name,
-                phone=phone,
-                birth=dob,
-                gender=gender,
-                address=address,
-                first_login=True
-            )
-            db.session.add(user)
-            db.session.flush()
-
-            instructor = Instructor(
-                user_id=user.id,
-                employee_id=employee_id,
-                position=position,
-                degree=degree,
-                faculty_id=faculty_id,
-                joined_year=joined_year
-            )
-            db.session.add(instructor)
-
-            db.session.commit()
-
-            success_results.append({
-                'STT': len(success_results) + 1,
-                'Tên': name,
-                'Gmail': email
-            })
-
-        except Exception as e:
-            db.session.rollback()
-            error_results.append(f"Lỗi xử lý giảng viên {name if 'name' in locals() else '[Không rõ]'}: {str(e)}")
+    with reader:
+        for column in INSTRUCTOR_COLUMNS:
+            if column not in reader.columns:
+                return jsonify({'error': f"Cột '{column}' không tồn tại trong file"}), 400
+
+        success_results, error_results = import_instructor_file(reader, file_hash=file_hash)
 
     output = BytesIO()
     with pd.ExcelWriter(output, engine='openpyxl') as writer:
@@ -325,97 +111,25 @@ def upload_instructor_list():
         mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
     )
 
-def role_required(allowed_roles):
-    def decorator(fn):
-        @wraps(fn)
-        @jwt_required()
-        def wrapper(*args, **kwargs):
-            user_id = get_jwt_identity()
-
-            user_role = (
-                db.session.query(Role.name)
-                .join(UserRole, Role.id == UserRole.role_id)
-                .filter(UserRole.user_id == user_id)
-                .first()
-            )
-
-            role_name = user_role[0].lower() if user_role else None
-
-            if role_name not in [r.lower() for r in allowed_roles]:
-                return jsonify({'error': 'Bạn không có quyền truy cập'}), 403
-
-            return fn(*args, **kwargs)
-        return wrapper
-    return decorator
-
 # Lấy tất cả các user theo vai trò
 @admin_bp.route('/users', methods=['GET'])
 @role_required(['Admin'])  # Chỉ admin được phép truy cập
 def get_users():
-    role_filter = request.args.get('role')
-
-    users = Users.query.all()
-    user_list = []
-
-    for user in users:
-        # Lấy role
-        user_role = (
-            db.session.query(Role.name)
-            .join(UserRole, Role.id == UserRole.role_id)
-            .filter(UserRole.user_id == user.id)
-            .first()
+    # ?limit=&cursor=&sort=name|-name|email|id&fields=id,name,email&role=&faculty_id=&major_id=&status=&enrollment_year=&is_deleted=&q=
+    try:
+        options = parse_user_list_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # ?stream=json|ndjson: xuất toàn bộ user khớp bộ lọc, không phân trang
+    stream_format = requested_stream_format()
+    if stream_format:
+        return stream_query(
+            build_user_export_query(options),
+            lambda row: user_row_to_dict(row, options['fields']),
+            stream_format
         )
-        role = user_role[0] if user_role else "Không có"
-
-        # Lọc nếu có yêu cầu ?role=
-        if role_filter:
-            if role_filter.lower() == 'student' and not Student.query.filter_by(user_id=user.id).first():
-                continue
-            if role_filter.lower() == 'instructor' and not Instructor.query.filter_by(user_id=user.id).first():
-                continue
-
-        # Thông tin cơ bản
-        user_data = {
-            'id': user.id,
-            'name': user.name,
-            'email': user.email,
-            'phone': user.phone,
-            'birth': user.birth,
-            'gender': user.gender,
-            'address': user.address,
-            'status': user.status,
-            'first_login': user.first_login,
-            'created_at': user.created_at,
-            'role': role
-        }
-
-        # Thông tin sinh viên nếu có
-        student = Student.query.filter_by(user_id=user.id).first()
-        if student:
-            faculty = Faculty.query.get(student.faculty_id)
-            major = Major.query.get(student.major_id)
-            user_data['student_info'] = {
-                'student_id': student.student_id,
-                'faculty': faculty.name if faculty else None,
-                'major': major.name if major else None,
-                'enrollment_year': student.enrollment_year
-            }
-
-        # Thông tin giảng viên nếu có
-        instructor = Instructor.query.filter_by(user_id=user.id).first()
-        if instructor:
-            faculty = Faculty.query.get(instructor.faculty_id)
-            user_data['instructor_info'] = {
-                'employee_id': instructor.employee_id,
-                'faculty': faculty.name if faculty else None,
-                'position': instructor.position,
-                'degree': instructor.degree,
-                'joined_year': instructor.joined_year
-            }
-
-        user_list.append(user_data)
-
-    return jsonify({'users': user_list}), 200
+    return jsonify(list_users(options)), 200
 
 
 @admin_bp.route('/update_users/<int:user_id>', methods=['PUT'])
@@ -463,13 +177,13 @@ def update_user(user_id):
             student.student_id = data['student_id']
 
         if 'faculty_id' in data:
-            faculty = Faculty.query.get(data['faculty_id'])
+            faculty = get_faculty(data['faculty_id'])
             if not faculty:
                 return jsonify({'error': 'Khoa không tồn tại'}), 400
             student.faculty_id = data['faculty_id']
 
         if 'major_id' in data:
-            major = Major.query.get(data['major_id'])
+            major = get_major(data['major_id'])
             if not major:
                 return jsonify({'error': 'Ngành học không tồn tại'}), 400
             student.major_id = data['major_id']
@@ -484,7 +198,7 @@ def update_user(user_id):
             instructor.employee_id = data['employee_id']
 
         if 'faculty_id' in data:
-            faculty = Faculty.query.get(data['faculty_id'])
+            faculty = get_faculty(data['faculty_id'])
             if not faculty:
                 return jsonify({'error': 'Khoa không tồn tại'}), 400
             instructor.faculty_id = data['faculty_id']
@@ -522,10 +236,12 @@ def delete_user(user_id):
 
     # Xoá các vai trò liên kết (nếu dùng bảng trung gian)
     UserRole.query.filter_by(user_id=user.id).delete()
+    bump_role_version()
 
     # Xoá người dùng chính
     db.session.delete(user)
     db.session.commit()
+    invalidate_role_version()
 
     return jsonify({'message': 'Xoá người dùng thành công'}), 200
 
@@ -627,7 +343,9 @@ def assign_role_to_user(user_id):
     # Gán role
     new_user_role = UserRole(user_id=user_id, role_id=role_id)
     db.session.add(new_user_role)
+    bump_role_version()
     db.session.commit()
+    invalidate_role_version()
 
     return jsonify({'message': 'Gán vai trò thành công'}), 201
 
@@ -652,7 +370,9 @@ def remove_role_from_user(user_id, role_id):
 
     # Xoá role khỏi user
     db.session.delete(user_role)
+    bump_role_version()
     db.session.commit()
+    invalidate_role_version()
 
     return jsonify({'message': 'Gỡ vai trò khỏi người dùng thành công'}), 200
 
@@ -672,7 +392,6 @@ def change_password_first_time():
 
     return jsonify({'message': 'Đổi mật khẩu thành công'})
 
-reset_codes = {}
 # gửi gmail
 @admin_bp.route('/send-email', methods=['POST']) 
 def forgot_password():
@@ -684,24 +403,41 @@ def forgot_password():
         return jsonify({"error": "Không tìm thấy email"}), 404
 
     code = str(random.randint(100000, 999999))
-    reset_codes[email] = code
+    save_reset_code(email, code)
 
-    # Gửi email
+    # Gửi email qua hàng đợi nền, không chờ SMTP
     msg = Message("Mã khôi phục mật khẩu", recipients=[email])
     msg.body = f"Mã xác nhận của bạn là: {code}"
-    mail.send(msg)
+    if not send_async(msg):
+        return jsonify({"error": "Hệ thống gửi mail đang quá tải, vui lòng thử lại sau"}), 503
 
     return jsonify({"message": "Mã xác nhận đã được gửi đến email"}), 200
 
+# Độ dài hàng đợi mail, số mail đã gửi/lỗi/thử lại, độ trễ từ lúc xếp hàng đến lúc gửi xong
+@admin_bp.route('/mail-stats', methods=['GET'])
+@role_required(['Admin'])
+def get_mail_stats():
+    return jsonify(mail_queue_stats()), 200
+
 # thay doi mk khi chua dang nhap --> phai gui gmail de lay ma
 @admin_bp.route('/reset-password', methods=['POST'])
 def reset_password():
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     email = data.get("email")
     code = data.get("code")
     new_password = data.get("new_password")
 
-    if reset_codes.get(email) != code:
+    # Kiểm tra đầu vào trước khi xác nhận mã: mã đúng bị huỷ ngay
+    if not email or not code or not isinstance(new_password, str) or not new_password:
+        return jsonify({"error": "Thiếu email, mã xác nhận hoặc mật khẩu mới"}), 400
+
+    # Mã đúng thì bị huỷ ngay, không dùng lại được
+    result = verify_reset_code(email, code)
+    if result == CODE_LOCKED:
+        return jsonify({"error": "Nhập sai quá số lần cho phép, vui lòng yêu cầu mã mới"}), 429
+    if result == CODE_MISSING:
+        return jsonify({"error": "Mã xác nhận không tồn tại hoặc đã hết hạn"}), 400
+    if result != CODE_OK:
         return jsonify({"error": "Mã xác nhận không đúng"}), 400
 
     user = Users.query.filter_by(email=email).first()
@@ -710,7 +446,6 @@ def reset_password():
 
     user.password = generate_password_hash(new_password)
     db.session.commit()
-    reset_codes.pop(email)  # Xóa mã sau khi dùng
 
     return jsonify({"message": "Đổi mật khẩu thành công"}), 201
 
@@ -742,8 +477,8 @@ def import_faculty_and_majors():
         return jsonify({'message': 'Không tìm thấy file'}), 400
 
     file = request.files['file']
-    if file.filename == '' or not file.filename.endswith('.xlsx'):
-        return jsonify({'message': 'Tên file không hợp lệ hoặc không phải định dạng .xlsx'}), 400
+    if file.filename == '':
+        return jsonify({'message': 'Tên file không hợp lệ'}), 400
 
     filename = secure_filename(file.filename)
     filepath = os.path.join('tmp', filename)
@@ -751,42 +486,16 @@ def import_faculty_and_majors():
     file.save(filepath)
 
     try:
-        df = pd.read_excel(filepath)
-        added_faculty, added_major, skipped_major = 0, 0, 0
-
-        for _, row in df.iterrows():
-            faculty_name = row.get('Faculty Name')
-            major_name = row.get('Major Name')
-            if not faculty_name or not major_name:
-                continue
-
-            # Thêm hoặc tìm faculty
-            faculty = Faculty.query.filter_by(name=faculty_name).first()
-            if not faculty:
-                faculty = Faculty(name=faculty_name, prefix=generate_prefix_from_name(faculty_name))
-                db.session.add(faculty)
-                db.session.flush()  # để lấy faculty.id ngay lập tức
-                added_faculty += 1
-
-            # Thêm major nếu chưa có
-            existing_major = Major.query.filter_by(name=major_name, faculty_id=faculty.id).first()
-            if existing_major:
-                skipped_major += 1
-                continue
-
-            prefix = generate_prefix_from_name(major_name)
-            major = Major(name=major_name, prefix=prefix, faculty_id=faculty.id)
-            db.session.add(major)
-            added_major += 1
-
-        db.session.commit()
+        with open_table(filepath) as reader:
+            result = import_faculty_major_rows(reader.iter_rows(['Faculty Name', 'Major Name']))
         os.remove(filepath)
 
         return jsonify({
             'message': 'Import ngành và chuyên ngành hoàn tất',
-            'added_faculty': added_faculty,
-            'added_major': added_major,
-            'skipped_major (tồn tại)': skipped_major
+            'added_faculty': result['added_faculty'],
+            'added_major': result['added_major'],
+            'skipped_major (tồn tại)': result['skipped_major'],
+            'missing_faculty': result['missing_faculty']
         }), 200
 
     except Exception as e:
@@ -3,9 +3,17 @@ import pandas as pd
 from flask import Blueprint, request, jsonify, send_file
 from flask_jwt_extended import jwt_required
 from app.utils.user_helper import role_required
+from app.utils.streaming import requested_stream_format, stream_query
+from app.utils.fieldsets import requested_fields, model_columns, row_to_dict
+from app.utils.conditional import etag_by_table_version
+from app.services.table_versions import bump_version
+from app.services.catalog_cache import invalidate_catalog, cache_stats
+from app.utils.text_helper import normalize_text
 from app.models.user import Users, Faculty, Major
 from app import db
 from app.utils.course_helper import generate_prefix_from_name
+from app.utils.table_reader import open_table
+from app.services.catalog_import import import_faculty_major_rows, import_faculty_rows
 from werkzeug.utils import secure_filename
 from io import BytesIO
 
@@ -21,8 +29,8 @@ def import_faculty_and_majors():
         return jsonify({'message': 'Không tìm thấy file'}), 400
 
     file = request.files['file']
-    if file.filename == '' or not file.filename.endswith('.xlsx'):
-        return jsonify({'message': 'Tên file không hợp lệ hoặc không phải định dạng .xlsx'}), 400
+    if file.filename == '':
+        return jsonify({'message': 'Tên file không hợp lệ'}), 400
 
     filename = secure_filename(file.filename)
     filepath = os.path.join('tmp', filename)
@@ -30,42 +38,16 @@ def import_faculty_and_majors():
     file.save(filepath)
 
     try:
-        df = pd.read_excel(filepath)
-        added_faculty, added_major, skipped_major = 0, 0, 0
-
-        for _, row in df.iterrows():
-            faculty_name = row.get('Faculty Name')
-            major_name = row.get('Major Name')
-            if not faculty_name or not major_name:
-                continue
-
-            # Thêm hoặc tìm faculty
-            faculty = Faculty.query.filter_by(name=faculty_name).first()
-            if not faculty:
-                faculty = Faculty(name=faculty_name, prefix=generate_prefix_from_name(faculty_name))
-                db.session.add(faculty)
-                db.session.flush()  # để lấy faculty.id ngay lập tức
-                added_faculty += 1
-
-            # Thêm major nếu chưa có
-            existing_major = Major.query.filter_by(name=major_name, faculty_id=faculty.id).first()
-            if existing_major:
-                skipped_major += 1
-                continue
-
-            prefix = generate_prefix_from_name(major_name)
-            major = Major(name=major_name, prefix=prefix, faculty_id=faculty.id)
-            db.session.add(major)
-            added_major += 1
-
-        db.session.commit()
+        with open_table(filepath) as reader:
+            result = import_faculty_major_rows(reader.iter_rows(['Faculty Name', 'Major Name']))
         os.remove(filepath)
 
         return jsonify({
             'message': 'Import ngành và chuyên ngành hoàn tất',
-            'added_faculty': added_faculty,
-            'added_major': added_major,
-            'skipped_major (tồn tại)': skipped_major
+            'added_faculty': result['added_faculty'],
+            'added_major': result['added_major'],
+            'skipped_major (tồn tại)': result['skipped_major'],
+            'missing_faculty': result['missing_faculty']
         }), 200
 
     except Exception as e:
@@ -73,23 +55,32 @@ def import_faculty_and_majors():
         return jsonify({'message': f'Lỗi xử lý file: {str(e)}'}), 500
     
 
-# Kiểm tra trùng lặp tên ngành
+# Kiểm tra trùng lặp tên ngành (không phân biệt hoa thường, dấu)
 def is_duplicate_faculty_name(name, exclude_id=None):
-    query = Faculty.query.filter(Faculty.name == name)
+    query = Faculty.query.filter(Faculty.name_normalized == normalize_text(name))
     if exclude_id is not None:
         query = query.filter(Faculty.id != exclude_id)
     return db.session.query(query.exists()).scalar()
 
 # đã test
+FACULTY_FIELDS = ('id', 'name', 'prefix')
+
+# ?fields=id,name : chỉ SELECT các cột cần
 @admin_faculty_bp.route('', methods=['GET'])
 @role_required(['Admin'])
+@etag_by_table_version('faculties')
 def get_all_faculty():
-    faculty=Faculty.query.all()
-    data = [{
-        'id':c.id,
-        'name':c.name,
-        'prefix':c.prefix
-    }for c in faculty]
+    try:
+        fields = requested_fields(FACULTY_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    query = db.session.query(*model_columns(Faculty, fields)).order_by(Faculty.id)
+    stream_format = requested_stream_format()
+    if stream_format:
+        return stream_query(query, row_to_dict, stream_format)
+
+    data = [row_to_dict(row) for row in query.all()]
     return jsonify(data)
 
 
@@ -105,7 +96,9 @@ def add_faculty():
     new_faculty = Faculty(name=name, prefix=prefix)
     
     db.session.add(new_faculty)
+    bump_version('faculties')
     db.session.commit()
+    invalidate_catalog()
     
     return jsonify({"message": "Faculty added successfully"}), 201
 
@@ -130,13 +123,22 @@ def update_faculty(id):
 
     faculty.name = name
     faculty.prefix = generate_prefix_from_name(name)
+    bump_version('faculties')
     db.session.commit()
+    invalidate_catalog()
 
     return jsonify({"message": "Faculty updated successfully"}), 200
 
 
 
 
+# Số lần hit/miss của cache danh mục khoa/chuyên ngành trong process này
+@admin_faculty_bp.route('/cache-stats', methods=['GET'])
+@role_required(['Admin'])
+def get_catalog_cache_stats():
+    return jsonify(cache_stats()), 200
+
+
 @admin_faculty_bp.route('/<int:id>', methods=['DELETE'])
 @role_required(['Admin'])
 def delete_faculty(id):
@@ -145,7 +147,9 @@ def delete_faculty(id):
         return jsonify({"error": "Faculty not found"}), 404
     
     db.session.delete(faculty)
+    bump_version('faculties')
     db.session.commit()
+    invalidate_catalog()
     
     return jsonify({"message": "Faculty deleted successfully"}), 200
 
@@ -161,42 +165,20 @@ def import_faculties_api():
     if file.filename == '':
         return jsonify({'message': 'Tên file không hợp lệ'}), 400
 
-    if not file.filename.endswith('.xlsx'):
-        return jsonify({'message': 'Chỉ chấp nhận file .xlsx'}), 400
-
     filename = secure_filename(file.filename)
     filepath = os.path.join('tmp', filename)
     os.makedirs('tmp', exist_ok=True)
     file.save(filepath)
 
     try:
-        df = pd.read_excel(filepath)
-
-        added = 0
-        skipped = 0
-
-        for index, row in df.iterrows():
-            name = row.get('Faculty Name')
-            if not name:
-                continue
-
-            existing = Faculty.query.filter_by(name=name).first()
-            if existing:
-                skipped += 1
-                continue
-
-            prefix = generate_prefix_from_name(name)
-            faculty = Faculty(name=name, prefix=prefix)
-            db.session.add(faculty)
-            added += 1
-
-        db.session.commit()
+        with open_table(filepath) as reader:
+            result = import_faculty_rows(reader.iter_rows(['Faculty Name']))
         os.remove(filepath)
 
         return jsonify({
             'message': 'Import thành công',
-            'added': added,
-            'skipped (tồn tại)': skipped
+            'added': result['added'],
+            'skipped (tồn tại)': result['skipped']
         }), 200
 
     except Exception as e:
@@ -2,8 +2,15 @@ from flask import Blueprint, request, jsonify
 from app import db
 from app.models.user import Major, Faculty
 from app.utils.course_helper import generate_prefix_from_name
+from app.utils.table_reader import open_table
+from app.services.catalog_import import import_major_rows
 from app.utils.user_helper import role_required
-from app.utils.user_helper import normalize_text  # Import normalize_text if it exists in text_helper
+from app.utils.streaming import requested_stream_format, stream_query
+from app.utils.fieldsets import requested_fields, model_columns, row_to_dict
+from app.utils.conditional import etag_by_table_version
+from app.services.table_versions import bump_version
+from app.services.catalog_cache import invalidate_catalog, get_faculty
+from app.utils.text_helper import normalize_text
 import os
 from werkzeug.utils import secure_filename
 import pandas as pd
@@ -15,28 +22,33 @@ admin_major_bp = Blueprint('admin_major_bp', __name__)
 
 # Kiểm tra trùng lặp tên chuyên ngành
 def is_duplicate_major_name(name, faculty_id, exclude_id=None):
-    normalized_name = normalize_text(name)
-
-    query = Major.query.filter(Major.faculty_id == faculty_id)
+    query = Major.query.filter(
+        Major.faculty_id == faculty_id,
+        Major.name_normalized == normalize_text(name)
+    )
     if exclude_id is not None:
         query = query.filter(Major.id != exclude_id)
+    return db.session.query(query.exists()).scalar()
 
-    for major in query.all():
-        if normalize_text(major.name) == normalized_name:
-            return True
-    return False
 
+MAJOR_FIELDS = ('id', 'name', 'prefix', 'faculty_id')
 
+# ?fields=id,name : chỉ SELECT các cột cần
 @admin_major_bp.route('', methods=['GET'])
 @role_required(['Admin'])
+@etag_by_table_version('majors')
 def get_all_majors():
-    majors = Major.query.all()
-    data = [{
-        'id': m.id,
-        'name': m.name,
-        'prefix': m.prefix,
-        'faculty_id': m.faculty_id
-    } for m in majors]
+    try:
+        fields = requested_fields(MAJOR_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    query = db.session.query(*model_columns(Major, fields)).order_by(Major.id)
+    stream_format = requested_stream_format()
+    if stream_format:
+        return stream_query(query, row_to_dict, stream_format)
+
+    data = [row_to_dict(row) for row in query.all()]
     return jsonify(data)
 
 
@@ -54,7 +66,7 @@ def update_major(faculty_id, major_id):
     if major.faculty_id != faculty_id:
         return jsonify({"error": "Major does not belong to this faculty"}), 400
 
-    if normalize_text(name) == normalize_text(major.name):
+    if normalize_text(name) == major.name_normalized:
         return jsonify({"error": "Tên chuyên ngành chưa thay đổi"}), 400
 
     if is_duplicate_major_name(name, faculty_id=faculty_id, exclude_id=major_id):
@@ -64,7 +76,9 @@ def update_major(faculty_id, major_id):
     major.prefix = generate_prefix_from_name(name)
     major.faculty_id = faculty_id  # giữ lại hoặc cho phép cập nhật nếu cần
 
+    bump_version('majors')
     db.session.commit()
+    invalidate_catalog()
     return jsonify({"message": "Major updated successfully"}), 200
 
 
@@ -80,7 +94,9 @@ def delete_major(faculty_id, id):
         return jsonify({"error": "Major does not belong to the specified faculty"}), 400
 
     db.session.delete(major)
+    bump_version('majors')
     db.session.commit()
+    invalidate_catalog()
     return jsonify({"message": "Major deleted successfully"}), 200
 
 
@@ -88,7 +104,7 @@ def delete_major(faculty_id, id):
 @admin_major_bp.route('/add_majors/<int:faculty_id>', methods=['POST'])
 @role_required(['Admin'])  # Kiểm tra quyền Admin
 def add_majors(faculty_id):
-    faculty = Faculty.query.get(faculty_id)
+    faculty = get_faculty(faculty_id)
     if not faculty:
         return jsonify({"error": f"Faculty with ID {faculty_id} not found"}), 404
 
@@ -98,8 +114,7 @@ def add_majors(faculty_id):
     skipped = 0
 
     for name in major_names:
-        existing = Major.query.filter_by(name=name, faculty_id=faculty_id).first()
-        if existing:
+        if is_duplicate_major_name(name, faculty_id):
             skipped += 1
             continue
 
@@ -108,7 +123,11 @@ def add_majors(faculty_id):
         db.session.add(major)
         added += 1
 
+    if added:
+        bump_version('majors')
     db.session.commit()
+    if added:
+        invalidate_catalog()
 
     return jsonify({
         "message": f"{added} chuyên ngành đã được thêm thành công, {skipped} chuyên ngành bị bỏ qua vì đã tồn tại!",
@@ -124,8 +143,8 @@ def import_majors_api():
         return jsonify({'message': 'Không tìm thấy file'}), 400
 
     file = request.files['file']
-    if file.filename == '' or not file.filename.endswith('.xlsx'):
-        return jsonify({'message': 'Tên file không hợp lệ hoặc không phải định dạng .xlsx'}), 400
+    if file.filename == '':
+        return jsonify({'message': 'Tên file không hợp lệ'}), 400
 
     filename = secure_filename(file.filename)
     filepath = os.path.join('tmp', filename)
@@ -133,38 +152,15 @@ def import_majors_api():
     file.save(filepath)
 
     try:
-        df = pd.read_excel(filepath)
-        added, skipped, missing_faculty = 0, 0, 0
-
-        for _, row in df.iterrows():
-            faculty_name = row.get('Faculty Name')
-            major_name = row.get('Major Name')
-            if not faculty_name or not major_name:
-                continue
-
-            faculty = Faculty.query.filter_by(name=faculty_name).first()
-            if not faculty:
-                missing_faculty += 1
-                continue
-
-            exists = Major.query.filter_by(name=major_name, faculty_id=faculty.id).first()
-            if exists:
-                skipped += 1
-                continue
-
-            prefix = generate_prefix_from_name(major_name)
-            major = Major(name=major_name, prefix=prefix, faculty_id=faculty.id)
-            db.session.add(major)
-            added += 1
-
-        db.session.commit()
+        with open_table(filepath) as reader:
+            result = import_major_rows(reader.iter_rows(['Faculty Name', 'Major Name']))
         os.remove(filepath)
 
         return jsonify({
             'message': 'Import chuyên ngành hoàn tất',
-            'added': added,
-            'skipped (tồn tại)': skipped,
-            'missing_faculty': missing_faculty
+            'added': result['added'],
+            'skipped (tồn tại)': result['skipped'],
+            'missing_faculty': result['missing_faculty']
         }), 200
 
     except Exception as e:
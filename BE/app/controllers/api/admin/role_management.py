@@ -2,7 +2,14 @@ from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.extensions import db 
 from app.utils.user_helper import role_required  
+from app.services.role_claims import bump_role_version, invalidate_role_version
+from app.services.permission_matrix import rebuild_permission_matrix
+from app.utils.fieldsets import requested_fields, model_columns, row_to_dict
+from app.utils.conditional import etag_by_table_version
+from app.services.table_versions import bump_version
 from app.models.user import Users, Role, UserRole ,Permission, RolePermission
+from app.services.user_query import parse_user_filters
+from app.services.user_bulk import bulk_grant_roles, bulk_revoke_roles, BulkUpdateError
 
 admin_role_bp = Blueprint('admin_role_bp', __name__)
 @admin_role_bp.route('/get_user_roles/<int:user_id>', methods=['GET'])
@@ -68,7 +75,9 @@ def assign_role_to_user(user_id):
     # Gán role
     new_user_role = UserRole(user_id=user_id, role_id=role_id)
     db.session.add(new_user_role)
+    bump_role_version()
     db.session.commit()
+    invalidate_role_version()
 
     return jsonify({'message': 'Gán vai trò thành công'}), 201
 
@@ -93,15 +102,57 @@ def remove_role_from_user(user_id, role_id):
 
     # Xoá role khỏi user
     db.session.delete(user_role)
+    bump_role_version()
     db.session.commit()
+    invalidate_role_version()
 
     return jsonify({'message': 'Gỡ vai trò khỏi người dùng thành công'}), 200
 
+# Gán / gỡ vai trò hàng loạt, body là một trong hai dạng:
+#   {"role_ids": [3], "user_ids": [10, 11, 12]}
+#   {"role_ids": [3], "filter": {"enrollment_year": "2024", "faculty_id": 2}}
+def _bulk_role_request(handler):
+    data = request.get_json(silent=True) or {}
+    try:
+        if 'user_ids' in data:
+            result = handler(data.get('role_ids'), user_ids=data['user_ids'])
+        elif isinstance(data.get('filter'), dict):
+            result = handler(data.get('role_ids'), filters=parse_user_filters(data['filter']))
+        else:
+            return jsonify({'error': 'Cần "user_ids" hoặc "filter"'}), 400
+    except BulkUpdateError as e:
+        return jsonify({'error': str(e), **e.details}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(result), 200
+
+
+@admin_role_bp.route('/bulk_assign', methods=['POST'])
+@role_required(['Admin'])
+def bulk_assign_roles():
+    return _bulk_role_request(bulk_grant_roles)
+
+
+@admin_role_bp.route('/bulk_remove', methods=['POST'])
+@role_required(['Admin'])
+def bulk_remove_roles():
+    return _bulk_role_request(bulk_revoke_roles)
+
+
+ROLE_FIELDS = ('id', 'name', 'description')
+
+# ?fields=id,name : chỉ SELECT các cột cần
 @admin_role_bp.route('', methods=['GET'])
 @role_required(['Admin'])
+@etag_by_table_version('roles')
 def get_all_roles():
-    roles = Role.query.all()
-    role_list = [{'id': r.id, 'name': r.name, 'description': r.description} for r in roles]
+    try:
+        fields = requested_fields(ROLE_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    roles = db.session.query(*model_columns(Role, fields)).order_by(Role.id).all()
+    role_list = [row_to_dict(r) for r in roles]
     return jsonify({'': role_list}), 200
 
 @admin_role_bp.route('', methods=['POST'])
@@ -119,7 +170,9 @@ def create_role():
 
     new_role = Role(name=name, description=description)
     db.session.add(new_role)
+    bump_version('roles')
     db.session.commit()
+    rebuild_permission_matrix()
 
     return jsonify({'message': 'Tạo vai trò thành công', 'role_id': new_role.id}), 201
 
@@ -148,5 +201,6 @@ def assign_permission_to_role(role_id):
     new_rp = RolePermission(role_id=role_id, permission_id=permission_id)
     db.session.add(new_rp)
     db.session.commit()
+    rebuild_permission_matrix()
 
     return jsonify({'message': 'Gán quyền cho vai trò thành công'}), 201
@@ -1,53 +1,40 @@
-import pandas as pd
+import os
 from flask import Blueprint, request, jsonify, send_file
-from io import BytesIO
-from datetime import datetime
-from werkzeug.security import generate_password_hash
 import bcrypt
-from app.models.user import Users, Student, Instructor, Faculty, Major,UserRole,Role
+from app.models.user import Users, Student, Instructor, UserRole
 from app import db
-from app.utils.user_helper import normalize_text
 from app.utils.user_helper import role_required
-from app.utils.user_helper import (
-    generate_instructor_id, generate_student_id,
-    generate_instructor_email, generate_student_email,
-    get_next_instructor_stt
+from app.services.role_claims import bump_role_version, invalidate_role_version
+from app.utils.table_reader import open_table
+from app.services.catalog_cache import get_faculty, get_major
+from app.services.user_query import (
+    list_users, parse_user_list_args, parse_user_filters, build_user_export_query, user_row_to_dict
 )
+from app.services.user_bulk import (
+    bulk_update_users, bulk_patch_users, bulk_soft_delete_users, bulk_restore_users,
+    bulk_purge_users, BulkUpdateError
+)
+from sqlalchemy.exc import DataError, IntegrityError
+from app.utils.streaming import requested_stream_format, stream_query
+from app.services.user_search import search_users, DEFAULT_LIMIT as SEARCH_LIMIT, MAX_LIMIT as SEARCH_MAX_LIMIT
+from app.services.user_import import (
+    import_student_file, import_instructor_file, build_result_workbook,
+    STUDENT_COLUMNS, INSTRUCTOR_COLUMNS
+)
+from app.services.import_checkpoints import file_sha256
+from app.services.roster_validation import validate_student_rows, validate_instructor_rows
+from app.services.import_jobs import submit_import_job, get_job, result_path, JOB_DONE
 
 admin_user_bp = Blueprint('admin_user_bp', __name__)
 
-GENDER_MAP = {
-    'nam': 'male',
-    'nữ': 'female',
-    'nu': 'female',
-    'khác': 'other',
-    'other': 'other'
-}
-
-def parse_date(value):
-    if isinstance(value, str):
-        try:
-            return datetime.strptime(value.strip(), '%d/%m/%Y').date()
-        except ValueError:
-            return None
-    if isinstance(value, datetime):
-        return value.date()
-    return None
-
-def validate_columns(df, required_columns):
-    missing = [col for col in required_columns if col not in df.columns]
+def validate_columns(columns, required_columns):
+    missing = [col for col in required_columns if col not in columns]
     if missing:
-        return f"Các cột bị thiếu trong file Excel: {', '.join(missing)}"
+        return f"Các cột bị thiếu trong file: {', '.join(missing)}"
     return None
 
 def prepare_excel_response(success_results, error_results, filename):
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        if success_results:
-            pd.DataFrame(success_results).to_excel(writer, sheet_name='Thành công', index=False)
-        if error_results:
-            pd.DataFrame({'Lỗi': error_results}).to_excel(writer, sheet_name='Lỗi', index=False)
-    output.seek(0)
+    output = build_result_workbook(success_results, error_results)
     return send_file(
         output,
         as_attachment=True,
@@ -55,83 +42,44 @@ def prepare_excel_response(success_results, error_results, filename):
         mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
     )
 
+# ?dry_run=1: chỉ kiểm tra file, trả về báo cáo lỗi theo dòng, không ghi DB
+def is_dry_run_request():
+    return request.args.get('dry_run', '').lower() in ('1', 'true')
+
+# ?async=1: trả về job_id ngay, file được xử lý bởi worker nền
+def is_async_request():
+    return request.args.get('async', '').lower() in ('1', 'true')
+
+def enqueue_import(kind, runner, result_filename):
+    file = request.files['file']
+    file.stream.seek(0)
+    job_id = submit_import_job(kind, file, runner, result_filename)
+    return jsonify({'message': 'Đã nhận file, đang xử lý', 'job_id': job_id}), 202
+
 @admin_user_bp.route('/upload-instructor-list', methods=['POST'])
 def upload_instructor_list():
     if 'file' not in request.files:
         return jsonify({'error': 'Chưa tải file'}), 400
 
     try:
-        df = pd.read_excel(request.files['file'])
+        file_hash = file_sha256(request.files['file'])
+        reader = open_table(request.files['file'])
     except Exception as e:
-        return jsonify({'error': f"Lỗi khi đọc file Excel: {str(e)}"}), 500
-
-    required_columns = ['STT', 'Tên', 'Ngày tháng năm sinh', 'CCCD', 'Faculty', 'SĐT', 'Giới tính', 'Địa chỉ', 'Vị trí', 'Học vị', 'Năm vào']
-    error_msg = validate_columns(df, required_columns)
-    if error_msg:
-        return jsonify({'error': error_msg}), 400
-
-    faculties = {normalize_text(f.name): f.id for f in Faculty.query.all()}
-    faculty_stt_map = {}
-    success_results, error_results, emails_in_file = [], [], set()
-
-    for _, row in df.iterrows():
-        try:
-            name = str(row['Tên']).strip()
-            dob = parse_date(row['Ngày tháng năm sinh'])
-            cccd = str(row['CCCD']).strip()
-            faculty_name = normalize_text(row['Faculty'])
-            phone = str(row['SĐT']).strip()
-            gender = GENDER_MAP.get(str(row['Giới tính']).strip().lower(), 'other')
-            address = str(row['Địa chỉ']).strip()
-            position = str(row['Vị trí']).strip()
-            degree = str(row['Học vị']).strip()
-            joined_year = str(int(row['Năm vào'])) if pd.notnull(row['Năm vào']) else None
-
-            faculty_id = faculties.get(faculty_name)
-            if not faculty_id:
-                error_results.append(f"Khoa không hợp lệ: {row['Faculty']}")
-                continue
-            if not dob:
-                error_results.append(f"Không thể chuyển đổi ngày sinh cho {name}")
-                continue
-
-            if faculty_id not in faculty_stt_map:
-                faculty_stt_map[faculty_id] = get_next_instructor_stt(faculty_id)
-            next_stt = faculty_stt_map[faculty_id]
-            faculty_stt_map[faculty_id] += 1
-
-            employee_id = generate_instructor_id(faculty_id, next_stt)
-            email = generate_instructor_email(employee_id)
-
-            if email in emails_in_file or Users.query.filter_by(email=email).first() or Instructor.query.filter_by(employee_id=employee_id).first():
-                error_results.append(f"Email hoặc mã nhân viên đã tồn tại: {email}")
-                continue
-            emails_in_file.add(email)
-
-            hashed_password = generate_password_hash(cccd)
-
-            user = Users(
-                email=email, password=hashed_password, name=name,
-                phone=phone, birth=dob, gender=gender,
-                address=address, first_login=True
-            )
-            db.session.add(user)
-            db.session.flush()
-
-            instructor = Instructor(
-                user_id=user.id, employee_id=employee_id,
-                position=position, degree=degree,
-                faculty_id=faculty_id, joined_year=joined_year
-            )
-            db.session.add(instructor)
-            db.session.commit()
-
-            success_results.append({'STT': len(success_results) + 1, 'Tên': name, 'Gmail': email})
-        except Exception as e:
-            db.session.rollback()
-            error_results.append(f"Lỗi giảng viên {name if 'name' in locals() else '[Không rõ]'}: {str(e)}")
-
-    return prepare_excel_response(success_results, error_results, 'ket_qua_upload_giang_vien.xlsx')
+        return jsonify({'error': f"Lỗi khi đọc file: {str(e)}"}), 500
+
+    with reader:
+        error_msg = validate_columns(reader.columns, INSTRUCTOR_COLUMNS)
+        if error_msg:
+            return jsonify({'error': error_msg}), 400
+
+        if is_dry_run_request():
+            return jsonify(validate_instructor_rows(reader)), 200
+
+        if not is_async_request():
+            success_results, error_results = import_instructor_file(reader, file_hash=file_hash)
+            return prepare_excel_response(success_results, error_results, 'ket_qua_upload_giang_vien.xlsx')
+
+    return enqueue_import('instructor', import_instructor_file, 'ket_qua_upload_giang_vien.xlsx')
 
 
 @admin_user_bp.route('/upload-student-list', methods=['POST'])
@@ -140,140 +88,93 @@ def upload_student_list():
         return jsonify({'error': 'Chưa tải file'}), 400
 
     try:
-        df = pd.read_excel(request.files['file'])
+        file_hash = file_sha256(request.files['file'])
+        reader = open_table(request.files['file'])
     except Exception as e:
-        return jsonify({'error': f"Lỗi khi đọc file Excel: {str(e)}"}), 500
-
-    required_columns = ['STT', 'Tên', 'Ngày tháng năm sinh', 'CCCD', 'Faculty', 'Major',
-                        'Enrollment Year', 'SĐT', 'Giới tính', 'Địa chỉ']
-    error_msg = validate_columns(df, required_columns)
-    if error_msg:
-        return jsonify({'error': error_msg}), 400
-
-    faculties = {normalize_text(f.name): f.id for f in Faculty.query.all()}
-    majors = {normalize_text(m.name): m.id for m in Major.query.all()}
-    success_results, error_results, emails_in_file = [], [], set()
-
-    for _, row in df.iterrows():
-        try:
-            name = str(row['Tên']).strip()
-            dob = parse_date(row['Ngày tháng năm sinh'])
-            cccd = str(row['CCCD']).strip()
-            faculty_name = normalize_text(row['Faculty'])
-            major_name = normalize_text(row['Major'])
-            enrollment_year = str(row['Enrollment Year']).strip()
-            phone = str(row['SĐT']).strip()
-            stt = row['STT']
-            address = str(row['Địa chỉ']).strip()
-            gender = GENDER_MAP.get(str(row['Giới tính']).strip().lower(), 'other')
-
-            faculty_id = faculties.get(faculty_name)
-            major_id = majors.get(major_name)
-            if not faculty_id or not major_id:
-                error_results.append(f"Không tìm thấy Faculty/Major: {row['Faculty']}/{row['Major']}")
-                continue
-            if not dob:
-                error_results.append(f"Không thể chuyển đổi ngày sinh cho {name}")
-                continue
-
-            student_id = generate_student_id(enrollment_year, major_id, faculty_id, stt)
-            email = generate_student_email(student_id)
-
-            if email in emails_in_file or Users.query.filter_by(email=email).first() or Student.query.filter_by(student_id=student_id).first():
-                error_results.append(f"Email hoặc mã sinh viên đã tồn tại: {email}")
-                continue
-            emails_in_file.add(email)
-
-            hashed_password = generate_password_hash(cccd)
-
-            user = Users(
-                email=email, password=hashed_password, name=name,
-                phone=phone, birth=dob, gender=gender,
-                address=address, first_login=True
-            )
-            db.session.add(user)
-            db.session.flush()
-
-            student = Student(
-                user_id=user.id, student_id=student_id,
-                faculty_id=faculty_id, major_id=major_id,
-                enrollment_year=enrollment_year
-            )
-            db.session.add(student)
-            db.session.commit()
-
-            success_results.append({'STT': len(success_results) + 1, 'Tên': name, 'Gmail': email})
-        except Exception as e:
-            db.session.rollback()
-            error_results.append(f"Lỗi sinh viên {name if 'name' in locals() else '[Không rõ]'}: {str(e)}")
-
-    return prepare_excel_response(success_results, error_results, 'ket_qua_upload_sinh_vien.xlsx')
+        return jsonify({'error': f"Lỗi khi đọc file: {str(e)}"}), 500
+
+    with reader:
+        error_msg = validate_columns(reader.columns, STUDENT_COLUMNS)
+        if error_msg:
+            return jsonify({'error': error_msg}), 400
+
+        if is_dry_run_request():
+            return jsonify(validate_student_rows(reader)), 200
+
+        if not is_async_request():
+            success_results, error_results = import_student_file(reader, file_hash=file_hash)
+            return prepare_excel_response(success_results, error_results, 'ket_qua_upload_sinh_vien.xlsx')
+
+    return enqueue_import('student', import_student_file, 'ket_qua_upload_sinh_vien.xlsx')
+
+
+# Trạng thái job import: số dòng đã xử lý / thành công / lỗi
+@admin_user_bp.route('/import-jobs/<job_id>', methods=['GET'])
+@role_required(['Admin'])
+def get_import_job(job_id):
+    job = get_job(job_id)
+    if not job:
+        return jsonify({'error': 'Không tìm thấy job import'}), 404
+    return jsonify(job), 200
+
+
+# Tải file kết quả khi job đã hoàn tất
+@admin_user_bp.route('/import-jobs/<job_id>/result', methods=['GET'])
+@role_required(['Admin'])
+def download_import_job_result(job_id):
+    job = get_job(job_id)
+    if not job:
+        return jsonify({'error': 'Không tìm thấy job import'}), 404
+    if job['status'] != JOB_DONE:
+        return jsonify({'error': 'Job import chưa hoàn tất', 'status': job['status']}), 409
+    return send_file(
+        os.path.abspath(result_path(job_id)),
+        as_attachment=True,
+        download_name=job['result_filename'],
+        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
+
 # Lấy tất cả các user theo vai trò
 @admin_user_bp.route('', methods=['GET'])
 @role_required(['Admin'])  # Chỉ admin được phép truy cập
 def get_users():
-    role_filter = request.args.get('role')
-    users = Users.query.all()
-    user_list = []
-    for user in users:
-        # Lấy role
-        user_role = (
-            db.session.query(Role.name)
-            .join(UserRole, Role.id == UserRole.role_id)
-            .filter(UserRole.user_id == user.id)
-            .first()
+    # ?limit=&cursor=&sort=name|-name|email|id&fields=id,name,email&role=&faculty_id=&major_id=&status=&enrollment_year=&is_deleted=&q=
+    try:
+        options = parse_user_list_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # ?stream=json|ndjson: xuất toàn bộ user khớp bộ lọc, không phân trang
+    stream_format = requested_stream_format()
+    if stream_format:
+        return stream_query(
+            build_user_export_query(options),
+            lambda row: user_row_to_dict(row, options['fields']),
+            stream_format
         )
-        role = user_role[0] if user_role else "Không có"
-
-        # Lọc nếu có yêu cầu ?role=
-        if role_filter:
-            if role_filter.lower() == 'student' and not Student.query.filter_by(user_id=user.id).first():
-                continue
-            if role_filter.lower() == 'instructor' and not Instructor.query.filter_by(user_id=user.id).first():
-                continue
-
-        # Thông tin cơ bản
-        user_data = {
-            'id': user.id,
-            'name': user.name,
-            'email': user.email,
-            'phone': user.phone,
-            'birth': user.birth,
-            'gender': user.gender,
-            'address': user.address,
-            'status': user.status,
-            'first_login': user.first_login,
-            'created_at': user.created_at,
-            'role': role
-        }
-
-        # Thông tin sinh viên nếu có
-        student = Student.query.filter_by(user_id=user.id).first()
-        if student:
-            faculty = Faculty.query.get(student.faculty_id)
-            major = Major.query.get(student.major_id)
-            user_data['student_info'] = {
-                'student_id': student.student_id,
-                'faculty': faculty.name if faculty else None,
-                'major': major.name if major else None,
-                'enrollment_year': student.enrollment_year
-            }
-
-        # Thông tin giảng viên nếu có
-        instructor = Instructor.query.filter_by(user_id=user.id).first()
-        if instructor:
-            faculty = Faculty.query.get(instructor.faculty_id)
-            user_data['instructor_info'] = {
-                'employee_id': instructor.employee_id,
-                'faculty': faculty.name if faculty else None,
-                'position': instructor.position,
-                'degree': instructor.degree,
-                'joined_year': instructor.joined_year
-            }
-
-        user_list.append(user_data)
-
-    return jsonify({'users': user_list}), 200
+    return jsonify(list_users(options)), 200
+
+
+# Tìm nhanh user: ?q=nguyen van&limit=10&prefix=1 (autocomplete)
+@admin_user_bp.route('/search', methods=['GET'])
+@role_required(['Admin'])
+def search_user():
+    text = request.args.get('q', '').strip()
+    if not text:
+        return jsonify({'error': 'Thiếu từ khoá tìm kiếm (q)'}), 400
+
+    try:
+        limit = int(request.args.get('limit', SEARCH_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'Tham số limit phải là số nguyên'}), 400
+
+    results = search_users(
+        text,
+        limit=max(1, min(limit, SEARCH_MAX_LIMIT)),
+        prefix_only=request.args.get('prefix', '').lower() in ('1', 'true'),
+        include_deleted=request.args.get('include_deleted', '').lower() in ('1', 'true')
+    )
+    return jsonify({'users': results}), 200
 
 
 @admin_user_bp.route('/update_users/<int:user_id>', methods=['PUT'])
@@ -321,13 +222,13 @@ def update_user(user_id):
             student.student_id = data['student_id']
 
         if 'faculty_id' in data:
-            faculty = Faculty.query.get(data['faculty_id'])
+            faculty = get_faculty(data['faculty_id'])
             if not faculty:
                 return jsonify({'error': 'Khoa không tồn tại'}), 400
             student.faculty_id = data['faculty_id']
 
         if 'major_id' in data:
-            major = Major.query.get(data['major_id'])
+            major = get_major(data['major_id'])
             if not major:
                 return jsonify({'error': 'Ngành học không tồn tại'}), 400
             student.major_id = data['major_id']
@@ -342,7 +243,7 @@ def update_user(user_id):
             instructor.employee_id = data['employee_id']
 
         if 'faculty_id' in data:
-            faculty = Faculty.query.get(data['faculty_id'])
+            faculty = get_faculty(data['faculty_id'])
             if not faculty:
                 return jsonify({'error': 'Khoa không tồn tại'}), 400
             instructor.faculty_id = data['faculty_id']
@@ -360,6 +261,31 @@ def update_user(user_id):
 
     return jsonify({'message': 'Cập nhật người dùng thành công'}), 200
 
+# Cập nhật hàng loạt, body là một trong hai dạng:
+#   {"updates": [{"id": 1, "status": "inactive"}, {"id": 2, "major_id": 3}]}
+#   {"filter": {"enrollment_year": "2021", "major_id": 2}, "patch": {"major_id": 5}}
+@admin_user_bp.route('/bulk', methods=['PATCH'])
+@role_required(['Admin'])
+def bulk_update_users_api():
+    data = request.get_json(silent=True) or {}
+
+    try:
+        if 'updates' in data:
+            result = bulk_update_users(data['updates'])
+        elif isinstance(data.get('filter'), dict) and 'patch' in data:
+            result = bulk_patch_users(parse_user_filters(data['filter']), data['patch'])
+        else:
+            return jsonify({'error': 'Cần "updates" hoặc "filter" + "patch"'}), 400
+    except BulkUpdateError as e:
+        return jsonify({'error': str(e), **e.details}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except DataError:
+        return jsonify({'error': 'Giá trị cập nhật không hợp lệ'}), 400
+
+    return jsonify({'message': 'Cập nhật hàng loạt thành công', **result}), 200
+
+
 # xóa cứng 1 bản xóa vĩnh viên
 @admin_user_bp.route('/delete_users/<int:user_id>', methods=['DELETE'])
 @role_required(['Admin'])  # Chỉ admin được phép xoá
@@ -380,10 +306,12 @@ def delete_user(user_id):
 
     # Xoá các vai trò liên kết (nếu dùng bảng trung gian)
     UserRole.query.filter_by(user_id=user.id).delete()
+    bump_role_version()
 
     # Xoá người dùng chính
     db.session.delete(user)
     db.session.commit()
+    invalidate_role_version()
 
     return jsonify({'message': 'Xoá người dùng thành công'}), 200
 
@@ -417,4 +345,36 @@ def restore_user(user_id):
     user.status = 'active'
     db.session.commit()
 
-    return jsonify({'message': 'Khôi phục người dùng thành công'}), 200
\ No newline at end of file
+    return jsonify({'message': 'Khôi phục người dùng thành công'}), 200
+
+
+# Xoá mềm / khôi phục / xoá vĩnh viễn hàng loạt theo bộ lọc, body:
+#   {"filter": {"enrollment_year": "2021", "faculty_id": 2, "status": "active"}}
+_BULK_DELETE_ACTIONS = {
+    'soft_delete': (bulk_soft_delete_users, 'Đã xoá mềm người dùng'),
+    'restore': (bulk_restore_users, 'Đã khôi phục người dùng'),
+    'purge': (bulk_purge_users, 'Đã xoá vĩnh viễn người dùng'),
+}
+
+
+@admin_user_bp.route('/bulk/<action>', methods=['POST'])
+@role_required(['Admin'])
+def bulk_delete_users_api(action):
+    if action not in _BULK_DELETE_ACTIONS:
+        return jsonify({'error': 'Thao tác không hợp lệ'}), 404
+    handler, message = _BULK_DELETE_ACTIONS[action]
+
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data.get('filter'), dict):
+        return jsonify({'error': 'Cần "filter"'}), 400
+
+    try:
+        result = handler(parse_user_filters(data['filter']))
+    except BulkUpdateError as e:
+        return jsonify({'error': str(e), **e.details}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except IntegrityError:
+        return jsonify({'error': 'Có người dùng vẫn còn dữ liệu liên quan (lớp học phần, đăng ký học...), không thể xoá vĩnh viễn'}), 409
+
+    return jsonify({'message': message, **result}), 200
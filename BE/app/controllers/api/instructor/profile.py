@@ -1,7 +1,8 @@
 
 from flask import Blueprint, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models.user import Faculty,Users,Instructor
+from app.models.user import Users,Instructor
+from app.services.catalog_cache import get_faculty
 
 instructor_bp = Blueprint('instructor_bp', __name__)
 
@@ -16,7 +17,7 @@ def get_instructor_profile():
     if not user or not instructor:
         return jsonify({'error': 'Không tìm thấy thông tin'}), 404
 
-    faculty = Faculty.query.get(instructor.faculty_id)
+    faculty = get_faculty(instructor.faculty_id)
 
     return jsonify({
         'name': user.name,
@@ -28,5 +29,5 @@ def get_instructor_profile():
         'position': instructor.position,
         'degree': instructor.degree,
         'joined_year': instructor.joined_year,
-        'faculty': faculty.name if faculty else None
+        'faculty': faculty['name'] if faculty else None
     }), 200
@@ -8,11 +8,11 @@ from flask_jwt_extended import jwt_required, get_jwt
 import re
 import random
 from flask_mail import Message
+from app.services.role_claims import role_claims
+from app.utils.token_blocklist import revoke_token
 from app.extensions import mail, db
 
-reset_codes = {}
 auth_bp = Blueprint('auth', __name__)
-BLACKLIST = set()
 SCHOOL_EMAIL_REGEX = r'^[a-zA-Z0-9._%+-]+@daihocnguyentrai\.edu\.vn$'
 # SCHOOL_EMAIL_REGEX = r'^[a-zA-Z0-9._%+-]+@gmail\.com$'
 
@@ -39,7 +39,8 @@ def login():
         print("Mật khẩu không khớp!")
         return jsonify({'error': 'Mật khẩu không đúng'}), 401
 
-    access_token = create_access_token(identity=str(user.id))
+    # Vai trò đi kèm token để role_required không phải truy vấn DB mỗi request
+    access_token = create_access_token(identity=str(user.id), additional_claims=role_claims(user.id))
 
     # Nếu là lần đầu đăng nhập, yêu cầu đổi mật khẩu
     if user.first_login:
@@ -86,12 +87,8 @@ def register():
 @auth_bp.route('/logout', methods=['POST'])
 @jwt_required()
 def logout():
-    # Lấy JWT ID (jti) của token hiện tại
-    jti = get_jwt()["jti"]
-    
-    # Thêm jti vào danh sách blacklist
-    from app.extensions import BLACKLIST
-    BLACKLIST.add(jti)
+    # Thêm jti của token hiện tại vào blacklist, giữ đến khi token hết hạn
+    revoke_token(get_jwt())
 
     return jsonify({"message": "Đăng xuất thành công"}), 200
 
@@ -2,17 +2,15 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
 from flask_mail import Mail
+from app.utils.token_blocklist import is_token_revoked
 
 # Tạo một đối tượng duy nhất cho SQLAlchemy và JWTManager
 db = SQLAlchemy()
 jwt = JWTManager()
 
-# Danh sách token đã bị blacklist
-BLACKLIST = set()
-
-# Kiểm tra nếu token có bị blacklist không
+# Kiểm tra nếu token có bị blacklist không (store cấu hình bởi TOKEN_BLOCKLIST_BACKEND)
 @jwt.token_in_blocklist_loader
 def check_if_token_in_blacklist(jwt_header, jwt_payload):
-    return jwt_payload["jti"] in BLACKLIST
+    return is_token_revoked(jwt_payload)
 
 mail = Mail()
\ No newline at end of file
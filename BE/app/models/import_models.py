@@ -0,0 +1,17 @@
+from app import db
+from datetime import datetime
+
+# Điểm dừng của một lần import danh sách: file (theo hash) đã commit tới dòng nào.
+# Chỉ tồn tại khi import chưa chạy xong, import xong thì bị xoá.
+class ImportCheckpoint(db.Model):
+    __tablename__ = 'import_checkpoints'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    kind = db.Column(db.String(20), nullable=False)  # student / instructor
+    file_hash = db.Column(db.String(64), nullable=False)
+    last_row = db.Column(db.Integer, nullable=False, default=0)
+    succeeded = db.Column(db.Integer, nullable=False, default=0)
+    failed = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.TIMESTAMP, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (db.UniqueConstraint('kind', 'file_hash'),)
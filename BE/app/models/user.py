@@ -1,5 +1,7 @@
 from app import db
 from datetime import datetime
+from sqlalchemy.orm import validates
+from app.utils.text_helper import normalize_text
 
 class Users(db.Model):
     __tablename__ = 'users'
@@ -8,6 +10,8 @@ class Users(db.Model):
     email = db.Column(db.String(255), unique=True, nullable=False)
     password = db.Column(db.String(255), nullable=False)
     name = db.Column(db.String(255), nullable=False)
+    # normalize_text(name): khoá tìm kiếm không dấu cho /api/user/search
+    name_normalized = db.Column(db.String(255))
     phone = db.Column(db.String(20))
     created_at = db.Column(db.TIMESTAMP, default=datetime.utcnow)
     updated_at = db.Column(db.TIMESTAMP, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -23,46 +27,100 @@ class Users(db.Model):
     # roles = db.relationship('Role', secondary='User_Roles', backref=db.backref('users', lazy='dynamic'))
     students = db.relationship('Student', backref='user', lazy=True)
 
+    # Khoá sắp xếp của trang danh sách user (phân trang keyset theo tên)
+    # và index tìm kiếm: trigram (pg_trgm) cho tìm một phần, pattern_ops cho tìm theo tiền tố
+    __table_args__ = (
+        db.Index('ix_users_name_id', 'name', 'id'),
+        db.Index('ix_users_name_normalized_trgm', 'name_normalized',
+                 postgresql_using='gin', postgresql_ops={'name_normalized': 'gin_trgm_ops'}),
+        db.Index('ix_users_name_normalized_prefix', 'name_normalized',
+                 postgresql_ops={'name_normalized': 'varchar_pattern_ops'}),
+        db.Index('ix_users_email_trgm', 'email',
+                 postgresql_using='gin', postgresql_ops={'email': 'gin_trgm_ops'}),
+    )
+
+    @validates('name')
+    def _set_name_normalized(self, key, value):
+        self.name_normalized = normalize_text(value) if value else None
+        return value
+
 class Faculty(db.Model):
     __tablename__ = 'faculties'
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), unique=True, nullable=False)
+    # normalize_text(name), tự cập nhật mỗi khi gán name; dùng để kiểm tra trùng/tra cứu theo tên
+    name_normalized = db.Column(db.String(100), unique=True)
     prefix=db.Column(db.String(10))
+
+    @validates('name')
+    def _set_name_normalized(self, key, value):
+        self.name_normalized = normalize_text(value) if value else None
+        return value
+
 class Major(db.Model):
     __tablename__ = 'majors'
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), unique=True, nullable=False)
+    name_normalized = db.Column(db.String(100))
     faculty_id = db.Column(db.Integer, db.ForeignKey('faculties.id'), nullable=False)
     prefix=db.Column(db.String(10))
 
+    # Tên chuyên ngành (đã chuẩn hoá) không trùng trong cùng một khoa
+    __table_args__ = (
+        db.UniqueConstraint('faculty_id', 'name_normalized', name='uq_majors_faculty_name_normalized'),
+    )
+
+    @validates('name')
+    def _set_name_normalized(self, key, value):
+        self.name_normalized = normalize_text(value) if value else None
+        return value
+
 class Student(db.Model):
     __tablename__ = 'students'
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     student_id = db.Column(db.String(20), unique=True, nullable=False)
-    faculty_id = db.Column(db.Integer, db.ForeignKey('faculties.id'), nullable=True)
-    major_id = db.Column(db.Integer, db.ForeignKey('majors.id'), nullable=True)
+    faculty_id = db.Column(db.Integer, db.ForeignKey('faculties.id'), nullable=True, index=True)
+    major_id = db.Column(db.Integer, db.ForeignKey('majors.id'), nullable=True, index=True)
     enrollment_year = db.Column(db.String(4), nullable=True)
 
     # Quan hệ
     faculty = db.relationship('Faculty', backref='students')
     major = db.relationship('Major', backref='students')
 
+    # Tìm theo tiền tố mã sinh viên (LIKE 'abc%')
+    __table_args__ = (
+        db.Index('ix_students_student_id_prefix', 'student_id',
+                 postgresql_ops={'student_id': 'varchar_pattern_ops'}),
+    )
+
 # 👉 Instructor Model mới
 class Instructor(db.Model):
     __tablename__ = 'instructors'
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     employee_id = db.Column(db.String(20), unique=True, nullable=False)
     position = db.Column(db.String(100), nullable=True)
     degree = db.Column(db.String(50), nullable=True)
     joined_year = db.Column(db.String(4), nullable=True)
-    faculty_id = db.Column(db.Integer, db.ForeignKey('faculties.id'), nullable=True)
+    faculty_id = db.Column(db.Integer, db.ForeignKey('faculties.id'), nullable=True, index=True)
 
     faculty = db.relationship('Faculty', backref='instructors')
+
+    __table_args__ = (
+        db.Index('ix_instructors_employee_id_prefix', 'employee_id',
+                 postgresql_ops={'employee_id': 'varchar_pattern_ops'}),
+    )
     
+# Bộ đếm STT mã giảng viên theo khoa, cấp phát theo khối bằng 1 lệnh UPDATE ... RETURNING
+class InstructorSequence(db.Model):
+    __tablename__ = 'instructor_sequences'
+
+    faculty_id = db.Column(db.Integer, db.ForeignKey('faculties.id'), primary_key=True)
+    last_value = db.Column(db.Integer, nullable=False, default=0)
+
 class Role(db.Model):
     __tablename__ = 'roles'
     
@@ -0,0 +1,9 @@
+from app import db
+
+# Bộ đếm phiên bản theo bảng: mỗi lần ghi vào bảng (qua API quản trị) thì tăng 1.
+# Dùng làm ETag cho các API danh mục mà không phải chạy lại query dữ liệu.
+class TableVersion(db.Model):
+    __tablename__ = 'table_versions'
+
+    table_name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
@@ -0,0 +1,92 @@
+import threading
+import time
+from flask import current_app
+from app import db
+from app.models.user import Faculty, Major
+from app.utils.user_helper import get_faculties_map, get_majors_map
+
+# Cache trong process cho danh mục khoa/chuyên ngành (ít thay đổi, được tra rất nhiều lần).
+# Mỗi map sống tối đa CATALOG_CACHE_TTL giây; các API ghi khoa/chuyên ngành gọi
+# invalidate_catalog() sau khi commit để process hiện tại đọc lại ngay.
+# Process khác chỉ thấy thay đổi khi hết TTL.
+# Các map trả về được dùng chung giữa các request: chỉ đọc, không sửa.
+
+_lock = threading.Lock()
+_entries = {}
+_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+_generation = 0
+
+
+def _ttl():
+    return current_app.config['CATALOG_CACHE_TTL']
+
+
+def _cached(key, loader):
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(key)
+        if entry and entry[0] > now:
+            _stats['hits'] += 1
+            return entry[1]
+        _stats['misses'] += 1
+        generation = _generation
+
+    # Nạp ngoài lock để request khác không phải chờ query; nếu trong lúc nạp
+    # có invalidate thì không lưu kết quả (có thể đã cũ)
+    value = loader()
+    with _lock:
+        if generation == _generation:
+            _entries[key] = (now + _ttl(), value)
+    return value
+
+
+def _load_faculties():
+    rows = db.session.query(Faculty.id, Faculty.name, Faculty.prefix).all()
+    return {r.id: {'id': r.id, 'name': r.name, 'prefix': r.prefix} for r in rows}
+
+
+def _load_majors():
+    rows = db.session.query(Major.id, Major.name, Major.prefix, Major.faculty_id).all()
+    return {
+        r.id: {'id': r.id, 'name': r.name, 'prefix': r.prefix, 'faculty_id': r.faculty_id}
+        for r in rows
+    }
+
+
+# Tên đã chuẩn hoá (normalize_text) -> id
+def faculty_ids_by_name():
+    return _cached('faculty_ids_by_name', get_faculties_map)
+
+
+def major_ids_by_name():
+    return _cached('major_ids_by_name', get_majors_map)
+
+
+def _to_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# id -> {'id', 'name', 'prefix'}, None nếu không tồn tại
+def get_faculty(faculty_id):
+    return _cached('faculties', _load_faculties).get(_to_id(faculty_id))
+
+
+# id -> {'id', 'name', 'prefix', 'faculty_id'}, None nếu không tồn tại
+def get_major(major_id):
+    return _cached('majors', _load_majors).get(_to_id(major_id))
+
+
+def invalidate_catalog():
+    global _generation
+    with _lock:
+        _generation += 1
+        _entries.clear()
+        _stats['invalidations'] += 1
+
+
+def cache_stats():
+    with _lock:
+        return dict(_stats, entries=len(_entries))
@@ -0,0 +1,131 @@
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app import db
+from app.models.user import Faculty, Major
+from app.utils.course_helper import generate_prefix_from_name
+from app.utils.text_helper import normalize_text
+from app.services.table_versions import bump_version
+from app.services.catalog_cache import invalidate_catalog
+
+# Import danh mục khoa/chuyên ngành theo tập hợp: gom tên khác nhau trong file,
+# rồi INSERT ... ON CONFLICT DO NOTHING một lần cho mỗi bảng.
+
+
+def _clean(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+# Thêm các khoa chưa có, trả về (map tên -> id của tất cả khoa trong file, số khoa thêm mới).
+# Các tên chỉ khác nhau về dấu/hoa thường được coi là cùng một khoa (trùng name_normalized).
+def upsert_faculties(names):
+    names = list(dict.fromkeys(names))
+    if not names:
+        return {}, 0
+    unique_names = {normalize_text(name): name for name in reversed(names)}
+    stmt = (
+        pg_insert(Faculty)
+        .values([
+            {'name': name, 'name_normalized': key, 'prefix': generate_prefix_from_name(name)}
+            for key, name in unique_names.items()
+        ])
+        .on_conflict_do_nothing()
+        .returning(Faculty.id)
+    )
+    added = len(db.session.execute(stmt).all())
+    return get_faculty_ids(names), added
+
+
+def get_faculty_ids(names):
+    keys = {name: normalize_text(name) for name in names}
+    if not keys:
+        return {}
+    ids = dict(
+        db.session.query(Faculty.name_normalized, Faculty.id)
+        .filter(Faculty.name_normalized.in_(set(keys.values())))
+        .all()
+    )
+    return {name: ids[key] for name, key in keys.items() if key in ids}
+
+
+# Thêm các chuyên ngành (name, faculty_id) chưa có, trả về số dòng thêm mới.
+# Không chỉ định cột conflict để bỏ qua cả trường hợp trùng tên ở khoa khác (majors.name là unique)
+# lẫn trùng (faculty_id, name_normalized).
+def upsert_majors(pairs):
+    pairs = {(normalize_text(name), faculty_id): name for name, faculty_id in reversed(pairs)}
+    if not pairs:
+        return 0
+    stmt = (
+        pg_insert(Major)
+        .values([
+            {
+                'name': name,
+                'name_normalized': key,
+                'faculty_id': faculty_id,
+                'prefix': generate_prefix_from_name(name)
+            }
+            for (key, faculty_id), name in pairs.items()
+        ])
+        .on_conflict_do_nothing()
+        .returning(Major.id)
+    )
+    return len(db.session.execute(stmt).all())
+
+
+# rows: (faculty_name, major_name); tạo khoa nếu chưa có rồi thêm chuyên ngành.
+# Khoa cũ chưa có name_normalized (chưa chạy backfill-name-normalized) bị bỏ qua khi INSERT
+# vì trùng tên nhưng không tra được id: các dòng của khoa đó được báo là missing_faculty.
+def import_faculty_major_rows(rows):
+    rows = [(_clean(f), _clean(m)) for f, m in rows]
+    rows = [(f, m) for f, m in rows if f and m]
+
+    faculty_ids, added_faculty = upsert_faculties([f for f, _ in rows])
+    valid = [(m, faculty_ids[f]) for f, m in rows if f in faculty_ids]
+    added_major = upsert_majors(valid)
+    changed = [t for t, n in (('faculties', added_faculty), ('majors', added_major)) if n]
+    if changed:
+        bump_version(*changed)
+    db.session.commit()
+    if changed:
+        invalidate_catalog()
+
+    return {
+        'added_faculty': added_faculty,
+        'added_major': added_major,
+        'skipped_major': len(valid) - added_major,
+        'missing_faculty': len(rows) - len(valid)
+    }
+
+
+# rows: (faculty_name,)
+def import_faculty_rows(rows):
+    names = [name for name in (_clean(r[0]) for r in rows) if name]
+    _, added = upsert_faculties(names)
+    if added:
+        bump_version('faculties')
+    db.session.commit()
+    if added:
+        invalidate_catalog()
+    return {'added': added, 'skipped': len(names) - added}
+
+
+# rows: (faculty_name, major_name); chỉ thêm chuyên ngành cho khoa đã tồn tại
+def import_major_rows(rows):
+    rows = [(_clean(f), _clean(m)) for f, m in rows]
+    rows = [(f, m) for f, m in rows if f and m]
+
+    faculty_ids = get_faculty_ids(list({f for f, _ in rows}))
+    valid = [(m, faculty_ids[f]) for f, m in rows if f in faculty_ids]
+    added = upsert_majors(valid)
+    if added:
+        bump_version('majors')
+    db.session.commit()
+    if added:
+        invalidate_catalog()
+
+    return {
+        'added': added,
+        'skipped': len(valid) - added,
+        'missing_faculty': len(rows) - len(valid)
+    }
@@ -0,0 +1,46 @@
+import hashlib
+from app import db
+from app.models.import_models import ImportCheckpoint
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+# Tính SHA-256 của file upload (đường dẫn hoặc file-like), đọc theo từng khối
+def file_sha256(file):
+    digest = hashlib.sha256()
+    if isinstance(file, str):
+        with open(file, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+                digest.update(block)
+    else:
+        file.seek(0)
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+        file.seek(0)
+    return digest.hexdigest()
+
+
+# Lấy checkpoint của lần import dở dang trước đó, chưa có thì tạo mới (chưa commit)
+def get_checkpoint(kind, file_hash):
+    checkpoint = ImportCheckpoint.query.filter_by(kind=kind, file_hash=file_hash).first()
+    if not checkpoint:
+        checkpoint = ImportCheckpoint(kind=kind, file_hash=file_hash, last_row=0, succeeded=0, failed=0)
+    return checkpoint
+
+
+# Ghi vị trí đã commit (giá trị tuyệt đối, an toàn khi transaction trước bị rollback);
+# được commit cùng chunk dữ liệu tương ứng
+def save_checkpoint(checkpoint, last_row, succeeded, failed):
+    if checkpoint is None:
+        return
+    checkpoint.last_row = last_row
+    checkpoint.succeeded = succeeded
+    checkpoint.failed = failed
+    db.session.add(checkpoint)
+
+
+# Import chạy hết file: xoá checkpoint để lần upload sau xử lý lại từ đầu
+def clear_checkpoint(checkpoint):
+    if checkpoint.id is not None:
+        db.session.delete(checkpoint)
+        db.session.commit()
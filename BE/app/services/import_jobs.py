@@ -0,0 +1,118 @@
+import os
+import threading
+import uuid
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import current_app
+from app import db
+from app.utils.table_reader import open_table
+from app.utils.sqlite_store import connect
+from app.services.user_import import build_result_workbook
+from app.services.import_checkpoints import file_sha256
+
+# Trạng thái job được lưu trong SQLite để mọi worker trên máy đều đọc được,
+# còn việc xử lý chạy trên thread pool của process nhận file (không cần broker).
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS import_jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result_filename TEXT NOT NULL,
+    processed INTEGER NOT NULL DEFAULT 0,
+    succeeded INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at TEXT NOT NULL,
+    finished_at TEXT
+);
+"""
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _jobs_dir():
+    return current_app.config['IMPORT_JOBS_DIR']
+
+
+def _connect():
+    return connect(os.path.join(_jobs_dir(), 'jobs.sqlite3'), SCHEMA)
+
+
+def _upload_path(job_id):
+    return os.path.join(_jobs_dir(), f'{job_id}.upload')
+
+
+def result_path(job_id):
+    return os.path.join(_jobs_dir(), f'{job_id}_result.xlsx')
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=current_app.config['IMPORT_JOB_WORKERS'],
+                thread_name_prefix='import-job'
+            )
+    return _executor
+
+
+def _update_job(job_id, **fields):
+    columns = ', '.join(f'{name} = ?' for name in fields)
+    with closing(_connect()) as conn:
+        conn.execute(f'UPDATE import_jobs SET {columns} WHERE id = ?', [*fields.values(), job_id])
+
+
+# Lưu file upload, tạo job và đưa vào hàng đợi; trả về job_id ngay.
+# runner(reader, progress, file_hash) trả về (success_results, error_results).
+def submit_import_job(kind, file, runner, result_filename, success_sheet='Thành công'):
+    job_id = uuid.uuid4().hex
+    with closing(_connect()) as conn:
+        conn.execute(
+            'INSERT INTO import_jobs (id, kind, status, result_filename, created_at) VALUES (?, ?, ?, ?, ?)',
+            (job_id, kind, JOB_QUEUED, result_filename, datetime.utcnow().isoformat())
+        )
+    file.save(_upload_path(job_id))
+
+    app = current_app._get_current_object()
+    _get_executor().submit(_run_job, app, job_id, runner, success_sheet)
+    return job_id
+
+
+def _run_job(app, job_id, runner, success_sheet):
+    with app.app_context():
+        upload_path = _upload_path(job_id)
+        try:
+            _update_job(job_id, status=JOB_RUNNING)
+
+            def progress(processed, succeeded, failed):
+                _update_job(job_id, processed=processed, succeeded=succeeded, failed=failed)
+
+            file_hash = file_sha256(upload_path)
+            with open_table(upload_path) as reader:
+                success_results, error_results = runner(reader, progress, file_hash)
+
+            output = build_result_workbook(success_results, error_results, success_sheet)
+            with open(result_path(job_id), 'wb') as f:
+                f.write(output.getvalue())
+            _update_job(job_id, status=JOB_DONE, finished_at=datetime.utcnow().isoformat())
+        except Exception as e:
+            db.session.rollback()
+            _update_job(job_id, status=JOB_FAILED, error=str(e), finished_at=datetime.utcnow().isoformat())
+        finally:
+            db.session.remove()
+            if os.path.exists(upload_path):
+                os.remove(upload_path)
+
+
+def get_job(job_id):
+    with closing(_connect()) as conn:
+        row = conn.execute('SELECT * FROM import_jobs WHERE id = ?', (job_id,)).fetchone()
+    return dict(row) if row else None
@@ -0,0 +1,160 @@
+import os
+import queue
+import smtplib
+import threading
+import time
+from flask import current_app
+from flask_mail import BadHeaderError
+from app.extensions import mail
+
+# Gửi mail nền: request chỉ đưa Message vào hàng đợi rồi trả về ngay, một thread gửi
+# lần lượt qua 1 kết nối SMTP dùng lại (mail.connect()). Kết nối được mở khi có mail
+# và đóng sau MAIL_QUEUE_IDLE_TIMEOUT giây rảnh (server SMTP tự ngắt kết nối để lâu).
+# Lỗi tạm thời (mất kết nối, timeout, 4xx...) được thử lại với thời gian chờ tăng gấp đôi;
+# lỗi cố định (địa chỉ bị từ chối, header sai, mã phản hồi 5xx) thì bỏ qua mail đó.
+# Hàng đợi nằm trong process: mail chưa gửi sẽ mất nếu process bị kill.
+
+PERMANENT_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, BadHeaderError, AssertionError)
+
+_STOP = object()
+
+
+# Server trả mã 5xx (vd. SMTPDataError 550) là lỗi cố định, gửi lại cũng không được
+def _is_permanent(error):
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+
+class MailQueue:
+    def __init__(self, app):
+        self.app = app
+        self.max_retries = app.config['MAIL_QUEUE_MAX_RETRIES']
+        self.backoff = app.config['MAIL_QUEUE_BACKOFF']
+        self.idle_timeout = app.config['MAIL_QUEUE_IDLE_TIMEOUT']
+        self._queue = queue.Queue(maxsize=app.config['MAIL_QUEUE_MAX_SIZE'])
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._connection = None
+        self._stats = {
+            'sent': 0, 'failed': 0, 'retries': 0, 'dropped': 0,
+            'connections': 0, 'latency_ms_total': 0.0, 'latency_ms_max': 0.0,
+        }
+
+    # Thread được tạo ở lần enqueue đầu tiên của mỗi process (gunicorn fork sau khi tạo app)
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._connection = None
+            self._thread = threading.Thread(target=self._run, name='mail-sender', daemon=True)
+            self._thread.start()
+
+    # Trả về False nếu hàng đợi đầy (mail không được nhận)
+    def enqueue(self, message):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((message, time.monotonic()))
+        except queue.Full:
+            with self._lock:
+                self._stats['dropped'] += 1
+            return False
+        return True
+
+    # Chờ gửi hết mail đang đợi (tối đa timeout giây) rồi dừng thread gửi
+    def stop(self, timeout=None):
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        sent = stats.pop('latency_ms_total')
+        stats['queue_depth'] = self._queue.qsize()
+        stats['latency_ms_avg'] = round(sent / stats['sent'], 2) if stats['sent'] else None
+        stats['latency_ms_max'] = round(stats['latency_ms_max'], 2)
+        return stats
+
+    def _run(self):
+        with self.app.app_context():
+            while True:
+                try:
+                    item = self._queue.get(timeout=self.idle_timeout)
+                except queue.Empty:
+                    self._close()
+                    continue
+                if item is _STOP:
+                    self._close()
+                    return
+                self._deliver(*item)
+
+    def _deliver(self, message, queued_at):
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._open().send(message)
+            except PERMANENT_ERRORS as e:
+                current_app.logger.error("Không gửi được mail tới %s: %s", message.recipients, e)
+                self._count('failed')
+                return
+            except (smtplib.SMTPException, OSError) as e:
+                self._close()
+                if _is_permanent(e):
+                    current_app.logger.error("Không gửi được mail tới %s: %s", message.recipients, e)
+                    self._count('failed')
+                    return
+                if attempt == self.max_retries:
+                    current_app.logger.error("Gửi mail tới %s thất bại sau %d lần: %s",
+                                             message.recipients, attempt + 1, e)
+                    self._count('failed')
+                    return
+                self._count('retries')
+                time.sleep(self.backoff * 2 ** attempt)
+            except Exception:
+                # Lỗi khác (vd. lỗi mã hoá khi dựng mail): chỉ bỏ mail này, thread gửi vẫn chạy tiếp
+                current_app.logger.exception("Không gửi được mail tới %s", message.recipients)
+                self._close()
+                self._count('failed')
+                return
+            else:
+                latency = (time.monotonic() - queued_at) * 1000
+                with self._lock:
+                    self._stats['sent'] += 1
+                    self._stats['latency_ms_total'] += latency
+                    self._stats['latency_ms_max'] = max(self._stats['latency_ms_max'], latency)
+                return
+
+    def _open(self):
+        if self._connection is None:
+            connection = mail.connect()
+            connection.__enter__()
+            self._connection = connection
+            self._count('connections')
+        return self._connection
+
+    def _close(self):
+        connection, self._connection = self._connection, None
+        if connection is None:
+            return
+        try:
+            connection.__exit__(None, None, None)
+        except (smtplib.SMTPException, OSError):
+            pass
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+
+def init_mail_queue(app):
+    app.extensions['mail_queue'] = MailQueue(app)
+
+
+# Dùng thay cho mail.send(msg) trong request
+def send_async(message):
+    return current_app.extensions['mail_queue'].enqueue(message)
+
+
+def mail_queue_stats():
+    return current_app.extensions['mail_queue'].stats()
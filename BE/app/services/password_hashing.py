@@ -0,0 +1,58 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app, has_app_context
+from werkzeug.security import generate_password_hash
+
+# Ít hơn số mật khẩu này thì băm tuần tự, không đáng gửi sang process khác
+MIN_PARALLEL_SIZE = 8
+
+# Pool dùng chung trong process, tạo lười ở lần gọi đầu tiên (có lock vì nhiều job import
+# có thể gọi cùng lúc). Process con không được fork từ worker đang chạy các thread nền
+# (gửi mail, dọn mã, job import) mà tạo qua forkserver / spawn.
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _mp_context():
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+
+def _get_pool(workers):
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=_mp_context())
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown_pool():
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+        _pool, _pool_workers = None, 0
+
+
+# Băm danh sách mật khẩu, chia theo chunk cho nhiều process.
+# Kết quả giữ đúng thứ tự đầu vào.
+def hash_passwords(passwords, workers=None, chunk_size=None):
+    passwords = list(passwords)
+    if has_app_context():
+        if workers is None:
+            workers = current_app.config.get('PASSWORD_HASH_WORKERS', 1)
+        if chunk_size is None:
+            chunk_size = current_app.config.get('PASSWORD_HASH_CHUNK_SIZE', 16)
+    workers = workers or 1
+    chunk_size = chunk_size or 16
+
+    if workers <= 1 or len(passwords) < MIN_PARALLEL_SIZE:
+        return [generate_password_hash(p) for p in passwords]
+
+    return list(_get_pool(workers).map(generate_password_hash, passwords, chunksize=chunk_size))
@@ -0,0 +1,65 @@
+import threading
+import time
+from flask import current_app
+from app import db
+from app.models.user import Role, Permission, RolePermission
+
+# Ma trận quyền dựng sẵn trong process: role id -> bitset các quyền (bit thứ permission.id).
+# Kiểm tra quyền chỉ là tra dict + phép AND, không truy vấn DB.
+# Ma trận được dựng lại ngay sau khi tạo vai trò / gán quyền (rebuild_permission_matrix)
+# và tự dựng lại sau PERMISSION_MATRIX_TTL giây để process khác cũng thấy thay đổi.
+
+_lock = threading.Lock()
+_matrix = None
+_generation = 0
+
+
+def _build():
+    codes = {code: 1 << id for id, code in db.session.query(Permission.id, Permission.code)}
+    roles, role_ids = {}, {}
+    rows = (
+        db.session.query(Role.id, Role.name, RolePermission.permission_id)
+        .outerjoin(RolePermission, RolePermission.role_id == Role.id)
+        .all()
+    )
+    for role_id, name, permission_id in rows:
+        role_ids[name.lower()] = role_id
+        roles[role_id] = roles.get(role_id, 0) | (1 << permission_id if permission_id else 0)
+    return {'codes': codes, 'roles': roles, 'role_ids': role_ids}
+
+
+def _get_matrix():
+    global _matrix
+    now = time.monotonic()
+    with _lock:
+        if _matrix and _matrix[0] > now:
+            return _matrix[1]
+        generation = _generation
+
+    matrix = _build()
+    with _lock:
+        if generation == _generation:
+            _matrix = (now + current_app.config['PERMISSION_MATRIX_TTL'], matrix)
+    return matrix
+
+
+# Gọi sau khi commit thay đổi roles / role_permissions / permissions
+def rebuild_permission_matrix():
+    global _matrix, _generation
+    with _lock:
+        _generation += 1
+        _matrix = None
+    _get_matrix()
+
+
+# role_names: tên vai trò của người gọi (từ resolve_roles); mã quyền không tồn tại -> False
+def has_permission(role_names, code):
+    matrix = _get_matrix()
+    bit = matrix['codes'].get(code)
+    if not bit:
+        return False
+    for name in role_names:
+        role_id = matrix['role_ids'].get(name.lower())
+        if role_id is not None and matrix['roles'][role_id] & bit:
+            return True
+    return False
@@ -0,0 +1,72 @@
+import threading
+import time
+from flask import current_app
+from app import db
+from app.models.user import Role, UserRole
+from app.services.table_versions import get_versions, bump_version
+
+# Vai trò của user được ghi vào access token khi đăng nhập (claim 'roles'),
+# kèm phiên bản của bảng user_roles lúc cấp token (claim 'role_version').
+# role_required tin claim khi phiên bản trong token bằng phiên bản hiện tại, ngược lại
+# (có thay đổi gán/gỡ vai trò sau khi cấp token) mới đọc vai trò từ DB.
+# Phiên bản hiện tại được cache trong process ROLE_VERSION_TTL giây: process khác
+# chỉ thấy thay đổi vai trò sau tối đa ngần ấy thời gian.
+
+ROLE_VERSION_TABLE = 'user_roles'
+
+_lock = threading.Lock()
+_cached = None
+_generation = 0
+
+
+def user_role_names(user_id):
+    rows = (
+        db.session.query(Role.name)
+        .join(UserRole, Role.id == UserRole.role_id)
+        .filter(UserRole.user_id == user_id)
+        .order_by(Role.id)
+        .all()
+    )
+    return [r[0] for r in rows]
+
+
+def current_role_version():
+    global _cached
+    now = time.monotonic()
+    with _lock:
+        if _cached and _cached[0] > now:
+            return _cached[1]
+        generation = _generation
+
+    version = get_versions(ROLE_VERSION_TABLE)[0]
+    with _lock:
+        if generation == _generation:
+            _cached = (now + current_app.config['ROLE_VERSION_TTL'], version)
+    return version
+
+
+# additional_claims cho create_access_token.
+# Đọc phiên bản (không qua cache) trước rồi mới đọc vai trò: nếu vai trò đổi giữa
+# hai lần đọc thì token mang phiên bản cũ và sẽ được kiểm tra lại bằng DB.
+def role_claims(user_id):
+    version = get_versions(ROLE_VERSION_TABLE)[0]
+    return {'roles': user_role_names(user_id), 'role_version': version}
+
+
+# Vai trò của người gọi: từ token nếu còn đúng phiên bản, không thì từ DB
+def resolve_roles(user_id, claims):
+    if 'roles' in claims and claims.get('role_version') == current_role_version():
+        return claims['roles']
+    return user_role_names(user_id)
+
+
+# Gọi trong transaction thay đổi user_roles; người gọi commit rồi gọi invalidate_role_version()
+def bump_role_version():
+    bump_version(ROLE_VERSION_TABLE)
+
+
+def invalidate_role_version():
+    global _cached, _generation
+    with _lock:
+        _generation += 1
+        _cached = None
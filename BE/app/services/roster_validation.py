@@ -0,0 +1,127 @@
+from datetime import datetime, date
+import numpy as np
+import pandas as pd
+from app.models.user import Users, Student
+from app.utils.user_helper import normalize_text
+from app.services.catalog_cache import faculty_ids_by_name, major_ids_by_name
+from app.services.user_import import (
+    find_existing, cell_text, student_identity, STUDENT_COLUMNS, INSTRUCTOR_COLUMNS
+)
+
+# Kiểm tra trước (dry run) file danh sách bằng các phép toán theo cột của pandas,
+# không ghi gì vào DB. Kết quả là báo cáo lỗi theo từng dòng dữ liệu.
+
+
+# dtype=object để giữ nguyên giá trị ô (số nguyên không bị đổi sang float khi có ô trống)
+def _read_frame(reader, columns):
+    return pd.DataFrame(list(reader.iter_rows(columns)), columns=columns, dtype=object)
+
+
+# normalize_text chỉ chạy trên các giá trị khác nhau, rồi map lại cho cả cột
+def _resolve_names(series, name_map):
+    lookup = {
+        value: name_map.get(normalize_text(str(value)))
+        for value in series.dropna().unique()
+    }
+    return series.map(lookup)
+
+
+# Tương đương parse_date: chuỗi dd/mm/YYYY hoặc ô kiểu ngày (giờ) của Excel/Parquet
+def _parse_dates(series):
+    types = series.map(type)
+    is_text = types.eq(str)
+    is_datetime = types.isin([datetime, date, pd.Timestamp])
+    from_text = pd.to_datetime(series.where(is_text).str.strip(), format='%d/%m/%Y', errors='coerce')
+    from_cell = pd.to_datetime(series.where(is_datetime), errors='coerce')
+    return from_text.fillna(from_cell)
+
+
+def _text(series):
+    return series.astype('string').str.strip().fillna('')
+
+
+# Gom các mask lỗi thành báo cáo: chỉ lặp trên các dòng có lỗi
+def _build_report(df, checks):
+    errors = {}
+    for mask, message in checks:
+        for i in np.flatnonzero(mask.to_numpy(dtype=bool)):
+            errors.setdefault(int(i), []).append(message)
+    stt = [None if pd.isna(v) else v for v in df['STT'].tolist()]
+    report = [
+        {'row': i + 1, 'STT': stt[i], 'errors': messages}
+        for i, messages in sorted(errors.items())
+    ]
+    return {
+        'dry_run': True,
+        'total_rows': len(df),
+        'valid_rows': len(df) - len(errors),
+        'error_rows': len(errors),
+        'errors': report
+    }
+
+
+# student_id/email của từng dòng sinh bằng đúng hàm của bộ import (student_identity),
+# mỗi bộ (năm, khoa, ngành, STT) khác nhau chỉ tính 1 lần; dòng chưa có khoa/ngành -> ''
+def _student_identities(df, faculty_id, major_id):
+    cache = {}
+    identities = []
+    for year, f_id, m_id, stt in zip(df['Enrollment Year'], faculty_id, major_id, df['STT']):
+        if pd.isna(f_id) or pd.isna(m_id):
+            identities.append(('', ''))
+            continue
+        key = (cell_text(year), int(f_id), int(m_id), stt)
+        if key not in cache:
+            cache[key] = student_identity(*key)
+        identities.append(cache[key])
+    student_ids, emails = zip(*identities) if identities else ((), ())
+    return pd.Series(student_ids, index=df.index, dtype=object), pd.Series(emails, index=df.index, dtype=object)
+
+
+def validate_student_rows(reader):
+    df = _read_frame(reader, STUDENT_COLUMNS)
+    faculties = faculty_ids_by_name()
+    majors = major_ids_by_name()
+
+    faculty_id = _resolve_names(df['Faculty'], faculties)
+    major_id = _resolve_names(df['Major'], majors)
+    dob = _parse_dates(df['Ngày tháng năm sinh'])
+    resolved = faculty_id.notna() & major_id.notna()
+
+    student_id, email = _student_identities(df, faculty_id, major_id)
+
+    checkable = resolved & dob.notna()
+    existing_emails = find_existing(Users.email, email[checkable].tolist())
+    existing_ids = find_existing(Student.student_id, student_id[checkable].tolist())
+
+    checks = [
+        (_text(df['Tên']).eq(''), "Thiếu tên"),
+        (_text(df['CCCD']).eq(''), "Thiếu CCCD"),
+        (faculty_id.isna(), "Không tìm thấy Faculty"),
+        (major_id.isna(), "Không tìm thấy Major"),
+        (dob.isna(), "Không thể chuyển đổi ngày sinh (dd/mm/yyyy)"),
+        (checkable & email.duplicated(keep='first'), "Email bị trùng trong file"),
+        (checkable & email.isin(existing_emails), "Email đã tồn tại trong hệ thống"),
+        (checkable & student_id.isin(existing_ids), "Mã sinh viên đã tồn tại trong hệ thống"),
+    ]
+    return _build_report(df, checks)
+
+
+def validate_instructor_rows(reader):
+    df = _read_frame(reader, INSTRUCTOR_COLUMNS)
+    faculties = faculty_ids_by_name()
+
+    faculty_id = _resolve_names(df['Faculty'], faculties)
+    dob = _parse_dates(df['Ngày tháng năm sinh'])
+    joined_year = pd.to_numeric(df['Năm vào'], errors='coerce')
+    cccd = _text(df['CCCD'])
+
+    # Mã giảng viên/email được cấp khi import nên không trùng; kiểm tra trùng CCCD trong file
+    checks = [
+        (_text(df['Tên']).eq(''), "Thiếu tên"),
+        (cccd.eq(''), "Thiếu CCCD"),
+        (faculty_id.isna(), "Khoa không hợp lệ"),
+        (dob.isna(), "Không thể chuyển đổi ngày sinh (dd/mm/yyyy)"),
+        (df['Năm vào'].notna() & joined_year.isna(), "Năm vào không hợp lệ"),
+        (cccd.ne('') & cccd.duplicated(keep='first'), "CCCD bị trùng trong file"),
+    ]
+    return _build_report(df, checks)
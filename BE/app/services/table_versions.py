@@ -0,0 +1,24 @@
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app import db
+from app.models.version_models import TableVersion
+
+
+# Phiên bản hiện tại của các bảng (bảng chưa từng ghi -> 0), 1 query theo khoá chính
+def get_versions(*tables):
+    rows = (
+        db.session.query(TableVersion.table_name, TableVersion.version)
+        .filter(TableVersion.table_name.in_(tables))
+        .all()
+    )
+    versions = dict(rows)
+    return [versions.get(table, 0) for table in tables]
+
+
+# Tăng phiên bản trong transaction hiện tại; người gọi commit cùng với dữ liệu thay đổi
+def bump_version(*tables):
+    stmt = pg_insert(TableVersion).values([{'table_name': table, 'version': 1} for table in tables])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[TableVersion.table_name],
+        set_={'version': TableVersion.version + 1}
+    )
+    db.session.execute(stmt)
@@ -0,0 +1,329 @@
+from sqlalchemy import String, bindparam, delete, func, literal, select, true, union_all, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app import db
+from app.models.user import Users, Student, Instructor, Faculty, Major, UserRole, Role
+from app.utils.text_helper import normalize_text
+from app.services.user_query import build_user_id_query
+from app.services.role_claims import bump_role_version, invalidate_role_version
+
+# Thao tác hàng loạt trên user: kiểm tra dữ liệu một lần cho cả lô,
+# ghi bằng các câu UPDATE theo lô (executemany / WHERE id IN ...) trong một transaction.
+
+# Các field được phép sửa hàng loạt, theo bảng. faculty_id áp dụng cho cả hồ sơ
+# sinh viên lẫn giảng viên (giống update_user).
+USER_PATCH_FIELDS = ('name', 'phone', 'birth', 'gender', 'address', 'status')
+STUDENT_PATCH_FIELDS = ('faculty_id', 'major_id', 'enrollment_year')
+INSTRUCTOR_PATCH_FIELDS = ('faculty_id', 'position', 'degree', 'joined_year')
+PATCH_FIELDS = tuple(dict.fromkeys(USER_PATCH_FIELDS + STUDENT_PATCH_FIELDS + INSTRUCTOR_PATCH_FIELDS))
+
+
+class BulkUpdateError(ValueError):
+    def __init__(self, message, details=None):
+        super().__init__(message)
+        self.details = details or {}
+
+
+def _check_patch(patch):
+    if not isinstance(patch, dict):
+        raise BulkUpdateError("Mỗi bản cập nhật phải là một object")
+    unknown = [key for key in patch if key not in PATCH_FIELDS]
+    if unknown:
+        raise BulkUpdateError(
+            f"Field không được phép cập nhật: {', '.join(unknown)}",
+            {'allowed': list(PATCH_FIELDS)}
+        )
+    # Các cột NOT NULL không được gán rỗng
+    for key in ('name', 'status'):
+        if key in patch and not str(patch[key] or '').strip():
+            raise BulkUpdateError(f"Giá trị {key} không được để trống")
+    for key in ('faculty_id', 'major_id'):
+        if patch.get(key) is not None and not _is_id(patch[key]):
+            raise BulkUpdateError(f"{key} phải là số nguyên")
+    # Cột chuỗi: kiểm tra kiểu và độ dài theo định nghĩa cột để không rơi vào DataError khi UPDATE
+    for key, value in patch.items():
+        if key not in _STRING_LENGTHS or value is None:
+            continue
+        if not isinstance(value, str):
+            raise BulkUpdateError(f"{key} phải là chuỗi")
+        length = _STRING_LENGTHS[key]
+        if length is not None and len(value) > length:
+            raise BulkUpdateError(f"{key} dài tối đa {length} ký tự")
+
+
+def _string_lengths():
+    lengths = {}
+    for model, fields in (
+        (Users, USER_PATCH_FIELDS),
+        (Student, STUDENT_PATCH_FIELDS),
+        (Instructor, INSTRUCTOR_PATCH_FIELDS),
+    ):
+        for key in fields:
+            column = model.__table__.c[key]
+            if isinstance(column.type, String):
+                lengths[key] = column.type.length
+    return lengths
+
+
+_STRING_LENGTHS = _string_lengths()
+
+
+def _is_id(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+# Kiểm tra tất cả faculty_id/major_id được tham chiếu bằng 1 query
+def _check_catalog_ids(patches):
+    faculty_ids = {p['faculty_id'] for p in patches if p.get('faculty_id') is not None}
+    major_ids = {p['major_id'] for p in patches if p.get('major_id') is not None}
+    if not faculty_ids and not major_ids:
+        return
+
+    found = db.session.execute(union_all(
+        select(literal('faculty').label('kind'), Faculty.id).where(Faculty.id.in_(faculty_ids)),
+        select(literal('major').label('kind'), Major.id).where(Major.id.in_(major_ids)),
+    )).all()
+    missing_faculties = sorted(faculty_ids - {id for kind, id in found if kind == 'faculty'})
+    missing_majors = sorted(major_ids - {id for kind, id in found if kind == 'major'})
+    if missing_faculties or missing_majors:
+        raise BulkUpdateError("Khoa hoặc ngành học không tồn tại", {
+            'missing_faculty_ids': missing_faculties,
+            'missing_major_ids': missing_majors
+        })
+
+
+def _split(patch, fields):
+    values = {key: patch[key] for key in fields if key in patch}
+    # UPDATE bằng Core không qua @validates nên tự cập nhật cột tìm kiếm
+    if 'name' in values:
+        values['name_normalized'] = normalize_text(values['name'])
+    return values
+
+
+# executemany theo từng nhóm bản ghi có cùng tập cột cần sửa
+def _update_many(table, key_column, rows):
+    groups = {}
+    for key, values in rows:
+        if values:
+            groups.setdefault(tuple(sorted(values)), []).append((key, values))
+
+    for columns, items in groups.items():
+        stmt = (
+            update(table)
+            .where(key_column == bindparam('b_key'))
+            .values({column: bindparam(f'b_{column}') for column in columns})
+        )
+        db.session.execute(stmt, [
+            {'b_key': key, **{f'b_{column}': values[column] for column in columns}}
+            for key, values in items
+        ])
+
+
+# updates: [{'id': 1, 'status': 'inactive', 'major_id': 3}, ...]
+def bulk_update_users(updates):
+    if not isinstance(updates, list) or not updates:
+        raise BulkUpdateError("Danh sách cập nhật trống")
+
+    patches = {}
+    for item in updates:
+        if not isinstance(item, dict) or not _is_id(item.get('id')):
+            raise BulkUpdateError("Mỗi bản cập nhật phải là object có id người dùng")
+        patch = {key: value for key, value in item.items() if key != 'id'}
+        _check_patch(patch)
+        patches.setdefault(item['id'], {}).update(patch)
+
+    existing = set(db.session.scalars(select(Users.id).where(Users.id.in_(list(patches)))))
+    missing = sorted(set(patches) - existing)
+    if missing:
+        raise BulkUpdateError("Người dùng không tồn tại", {'missing_user_ids': missing})
+    _check_catalog_ids(patches.values())
+
+    try:
+        _update_many(Users.__table__, Users.__table__.c.id,
+                     [(id, _split(p, USER_PATCH_FIELDS)) for id, p in patches.items()])
+        _update_many(Student.__table__, Student.__table__.c.user_id,
+                     [(id, _split(p, STUDENT_PATCH_FIELDS)) for id, p in patches.items()])
+        _update_many(Instructor.__table__, Instructor.__table__.c.user_id,
+                     [(id, _split(p, INSTRUCTOR_PATCH_FIELDS)) for id, p in patches.items()])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return {'updated': len(patches)}
+
+
+# Id các user khớp bộ lọc (parse_user_filters), chốt trước khi ghi:
+# câu lệnh ghi có thể làm thay đổi chính các cột đang lọc
+def _filtered_user_ids(filters, **forced):
+    if not any(value is not None for value in filters.values()):
+        raise BulkUpdateError("Cần ít nhất một điều kiện lọc")
+    return list(db.session.scalars(build_user_id_query(dict(filters, **forced)).statement))
+
+
+# Chạy các câu lệnh trong một transaction, lỗi thì rollback toàn bộ
+# roles_changed: có ghi vào user_roles -> tăng phiên bản vai trò (xem role_claims)
+def _execute_all(statements, roles_changed=False):
+    try:
+        for stmt in statements:
+            db.session.execute(stmt)
+        if roles_changed:
+            bump_role_version()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    if roles_changed:
+        invalidate_role_version()
+
+
+# Áp cùng một patch cho mọi user khớp bộ lọc
+def bulk_patch_users(filters, patch):
+    _check_patch(patch)
+    if not patch:
+        raise BulkUpdateError("Patch trống")
+    user_ids = _filtered_user_ids(filters)
+    _check_catalog_ids([patch])
+    if not user_ids:
+        return {'updated': 0}
+
+    statements = []
+    for model, key, fields in (
+        (Users, Users.id, USER_PATCH_FIELDS),
+        (Student, Student.user_id, STUDENT_PATCH_FIELDS),
+        (Instructor, Instructor.user_id, INSTRUCTOR_PATCH_FIELDS),
+    ):
+        values = _split(patch, fields)
+        if values:
+            statements.append(update(model.__table__).where(key.in_(user_ids)).values(values))
+    _execute_all(statements)
+
+    return {'updated': len(user_ids)}
+
+
+# Xoá mềm các user khớp bộ lọc (bỏ qua user đã xoá), giống soft_delete_user
+def bulk_soft_delete_users(filters):
+    user_ids = _filtered_user_ids(filters, is_deleted=False)
+    if user_ids:
+        _execute_all([
+            update(Users.__table__).where(Users.id.in_(user_ids))
+            .values(is_deleted=True, status='inactive')
+        ])
+    return {'deleted': len(user_ids)}
+
+
+# Khôi phục các user đã xoá mềm khớp bộ lọc, giống restore_user
+def bulk_restore_users(filters):
+    user_ids = _filtered_user_ids(filters, is_deleted=True)
+    if user_ids:
+        _execute_all([
+            update(Users.__table__).where(Users.id.in_(user_ids))
+            .values(is_deleted=False, status='active')
+        ])
+    return {'restored': len(user_ids)}
+
+
+# Xoá vĩnh viễn các user khớp bộ lọc cùng hồ sơ SV/GV và vai trò, giống delete_user.
+# User còn được tham chiếu (lớp học phần, đăng ký học...) -> IntegrityError, không xoá gì.
+def bulk_purge_users(filters):
+    user_ids = _filtered_user_ids(filters)
+    if user_ids:
+        _execute_all([
+            delete(UserRole.__table__).where(UserRole.user_id.in_(user_ids)),
+            delete(Student.__table__).where(Student.user_id.in_(user_ids)),
+            delete(Instructor.__table__).where(Instructor.user_id.in_(user_ids)),
+            delete(Users.__table__).where(Users.id.in_(user_ids)),
+        ], roles_changed=True)
+    return {'deleted': len(user_ids)}
+
+
+# id vai trò theo tên (không phân biệt hoa thường), bỏ qua tên không tồn tại
+def role_ids_by_name(*names):
+    names = [name.lower() for name in names]
+    return list(db.session.scalars(select(Role.id).where(func.lower(Role.name).in_(names))))
+
+
+def _check_role_ids(role_ids):
+    if not isinstance(role_ids, list) or not role_ids or not all(_is_id(id) for id in role_ids):
+        raise BulkUpdateError("role_ids phải là danh sách id vai trò")
+    role_ids = list(dict.fromkeys(role_ids))
+    missing = sorted(set(role_ids) - set(db.session.scalars(select(Role.id).where(Role.id.in_(role_ids)))))
+    if missing:
+        raise BulkUpdateError("Vai trò không tồn tại", {'missing_role_ids': missing})
+    return role_ids
+
+
+def _check_user_ids(user_ids):
+    if not isinstance(user_ids, list) or not user_ids or not all(_is_id(id) for id in user_ids):
+        raise BulkUpdateError("user_ids phải là danh sách id người dùng")
+    user_ids = list(dict.fromkeys(user_ids))
+    existing = set(db.session.scalars(
+        select(Users.id).where(Users.id.in_(user_ids), Users.is_deleted.isnot(True))
+    ))
+    missing = sorted(set(user_ids) - existing)
+    if missing:
+        raise BulkUpdateError("Người dùng không tồn tại hoặc đã bị xoá", {'missing_user_ids': missing})
+    return user_ids
+
+
+# Câu SELECT id user cần gán/gỡ vai trò: danh sách id hoặc bộ lọc (parse_user_filters).
+# Theo bộ lọc mà không chỉ định is_deleted thì bỏ qua user đã xoá mềm.
+def _target_user_ids(user_ids=None, filters=None):
+    if user_ids is not None:
+        return select(Users.id).where(Users.id.in_(_check_user_ids(user_ids)))
+    if not filters or not any(value is not None for value in filters.values()):
+        raise BulkUpdateError("Cần user_ids hoặc ít nhất một điều kiện lọc")
+    if filters.get('is_deleted') is None:
+        filters = dict(filters, is_deleted=False)
+    return build_user_id_query(filters).statement
+
+
+# INSERT ... SELECT user x role (CROSS JOIN), cặp đã có bị bỏ qua (ON CONFLICT DO NOTHING).
+# Không commit: dùng chung transaction của người gọi (vd. mỗi chunk import).
+def insert_user_roles(user_ids_select, role_ids):
+    users = user_ids_select.subquery()
+    pairs = (
+        select(users.c.id, Role.id)
+        .select_from(users.join(Role, true()))
+        .where(Role.id.in_(role_ids))
+    )
+    stmt = (
+        pg_insert(UserRole)
+        .from_select(['user_id', 'role_id'], pairs)
+        .on_conflict_do_nothing(index_elements=['user_id', 'role_id'])
+    )
+    return db.session.execute(stmt).rowcount
+
+
+# Gán các vai trò cho nhiều user; trả về số cặp (user, role) được thêm mới
+def bulk_grant_roles(role_ids, user_ids=None, filters=None):
+    role_ids = _check_role_ids(role_ids)
+    target = _target_user_ids(user_ids, filters)
+    try:
+        granted = insert_user_roles(target, role_ids)
+        if granted:
+            bump_role_version()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    invalidate_role_version()
+    return {'granted': granted}
+
+
+# Gỡ các vai trò khỏi nhiều user bằng 1 câu DELETE; trả về số cặp đã xoá
+def bulk_revoke_roles(role_ids, user_ids=None, filters=None):
+    role_ids = _check_role_ids(role_ids)
+    target = _target_user_ids(user_ids, filters)
+    try:
+        revoked = db.session.execute(
+            delete(UserRole.__table__)
+            .where(UserRole.role_id.in_(role_ids), UserRole.user_id.in_(target))
+        ).rowcount
+        if revoked:
+            bump_role_version()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    invalidate_role_version()
+    return {'revoked': revoked}
@@ -0,0 +1,303 @@
+from sqlalchemy import insert, select
+from sqlalchemy.exc import DataError, IntegrityError
+from io import BytesIO
+import pandas as pd
+from app import db
+from app.models.user import Users, Student, Instructor
+from app.utils.user_helper import (
+    GENDER_MAP, parse_date, normalize_text,
+    generate_student_id,
+    generate_instructor_email, generate_student_email,
+    reserve_instructor_ids
+)
+from app.services.catalog_cache import faculty_ids_by_name, major_ids_by_name
+from app.services.password_hashing import hash_passwords
+from app.services.import_checkpoints import get_checkpoint, save_checkpoint, clear_checkpoint
+from app.services.user_bulk import insert_user_roles, role_ids_by_name
+
+STUDENT_COLUMNS = ['STT', 'Tên', 'Ngày tháng năm sinh', 'CCCD', 'Faculty', 'Major',
+                   'Enrollment Year', 'SĐT', 'Giới tính', 'Địa chỉ']
+INSTRUCTOR_COLUMNS = ['STT', 'Tên', 'Ngày tháng năm sinh', 'CCCD', 'Faculty', 'SĐT',
+                      'Giới tính', 'Địa chỉ', 'Vị trí', 'Học vị', 'Năm vào']
+
+
+# Lấy các giá trị đã tồn tại trong DB bằng 1 truy vấn duy nhất
+def find_existing(column, values):
+    if not values:
+        return set()
+    rows = db.session.query(column).filter(column.in_(set(values))).all()
+    return {r[0] for r in rows}
+
+
+# Lỗi do dữ liệu của một dòng (quá độ dài cột, vi phạm ràng buộc...): chỉ dòng đó bị báo lỗi
+ROW_DATA_ERRORS = (DataError, IntegrityError)
+
+
+# INSERT Users + hồ sơ (+ vai trò mặc định) cho các dòng, trong transaction hiện tại
+def insert_entries(to_insert, profile_model, role_ids=None):
+    result = db.session.execute(
+        insert(Users).returning(Users.id, Users.email),
+        [e['record']['user'] for e in to_insert]
+    )
+    user_ids = {email: user_id for user_id, email in result}
+    db.session.execute(
+        insert(profile_model),
+        [dict(e['record']['profile'], user_id=user_ids[e['record']['user']['email']])
+         for e in to_insert]
+    )
+    if role_ids:
+        insert_user_roles(select(Users.id).where(Users.id.in_(list(user_ids.values()))), role_ids)
+
+
+# Import hàng loạt Users + hồ sơ (Student/Instructor) theo từng chunk dòng:
+# mỗi chunk chỉ có 2 truy vấn kiểm tra trùng, 2 lệnh INSERT nhiều dòng và 1 commit.
+# Nếu lệnh INSERT của chunk lỗi do dữ liệu, chunk được insert lại từng dòng trong
+# savepoint để chỉ các dòng sai bị báo lỗi.
+# Mật khẩu chỉ được băm cho các dòng hợp lệ, ngay trước khi insert.
+# prepare_row(row) trả về (record, error), record gồm 'name', 'user', 'profile'.
+# assign_keys(records) (nếu có) cấp mã/email cho các dòng hợp lệ của chunk, trong transaction của chunk.
+# role_ids (nếu có): vai trò mặc định gán cho user mới, trong cùng lệnh commit của chunk.
+# progress(processed, succeeded, failed) được gọi sau mỗi chunk nếu có.
+# checkpoint (ImportCheckpoint): bỏ qua các dòng đã commit ở lần chạy trước và
+# ghi lại dòng cuối cùng đã commit trong cùng transaction với mỗi chunk.
+# progress nhận số dòng tính cả phần đã xử lý ở lần chạy trước.
+def bulk_import_users(chunks, prepare_row, profile_model, profile_key, duplicate_message, error_label,
+                      progress=None, checkpoint=None, assign_keys=None, role_ids=None):
+    success_results, error_results, emails_in_file = [], [], set()
+    processed = 0
+    start_row = checkpoint.last_row if checkpoint else 0
+    base_succeeded = checkpoint.succeeded if checkpoint else 0
+    base_failed = checkpoint.failed if checkpoint else 0
+
+    for batch in chunks:
+        # Các dòng trước checkpoint đã được commit, không cần kiểm tra lại với DB
+        if processed + len(batch) <= start_row:
+            processed += len(batch)
+            continue
+        if processed < start_row:
+            batch = batch[start_row - processed:]
+            processed = start_row
+
+        entries = []
+        for row in batch:
+            try:
+                record, error = prepare_row(row)
+            except Exception as e:
+                record, error = None, f"{error_label} [Không rõ]: {str(e)}"
+            entries.append({'record': record, 'error': error})
+
+        last_row = processed + len(batch)
+        succeeded = base_succeeded + len(success_results)
+        failed = base_failed + len(error_results)
+        to_insert = []
+        try:
+            records = [e['record'] for e in entries if e['record']]
+            if assign_keys and records:
+                assign_keys(records)
+            existing_emails = find_existing(Users.email, [r['user']['email'] for r in records])
+            existing_keys = find_existing(profile_key, [r['profile'][profile_key.key] for r in records])
+
+            for entry in entries:
+                record = entry['record']
+                if not record:
+                    continue
+                email = record['user']['email']
+                if (email in emails_in_file or email in existing_emails
+                        or record['profile'][profile_key.key] in existing_keys):
+                    entry['error'] = duplicate_message.format(email=email)
+                    continue
+                emails_in_file.add(email)
+                to_insert.append(entry)
+
+            try:
+                if to_insert:
+                    # Mật khẩu mặc định là CCCD, băm song song cho cả lô
+                    hashed = hash_passwords([e['record']['user']['password'] for e in to_insert])
+                    for entry, password in zip(to_insert, hashed):
+                        entry['record']['user']['password'] = password
+
+                    insert_entries(to_insert, profile_model, role_ids)
+                save_checkpoint(checkpoint, last_row, succeeded + len(to_insert),
+                                failed + len(entries) - len(to_insert))
+                db.session.commit()
+            except ROW_DATA_ERRORS:
+                db.session.rollback()
+                inserted = _insert_one_by_one(to_insert, profile_model, role_ids, assign_keys, error_label)
+                save_checkpoint(checkpoint, last_row, succeeded + inserted, failed + len(entries) - inserted)
+                db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            # Mọi dòng hợp lệ chưa được ghi, kể cả khi lỗi xảy ra lúc cấp mã / kiểm tra trùng
+            for entry in entries:
+                if entry['record'] and not entry['error']:
+                    entry['error'] = f"{error_label} {entry['record']['name']}: {str(e)}"
+            # Lỗi không do dữ liệu (mất kết nối DB...): checkpoint giữ nguyên ở chunk cuối đã
+            # commit và không tiến thêm trong lần chạy này, để lần chạy lại xử lý lại chunk này
+            checkpoint = None
+
+        for entry in entries:
+            if entry['error']:
+                error_results.append(entry['error'])
+            elif entry['record']:
+                success_results.append({
+                    'STT': len(success_results) + 1,
+                    'Tên': entry['record']['name'],
+                    'Gmail': entry['record']['user']['email']
+                })
+
+        processed = last_row
+        if progress:
+            progress(processed, base_succeeded + len(success_results), base_failed + len(error_results))
+
+    return success_results, error_results
+
+
+# Insert lại từng dòng của chunk lỗi, mỗi dòng một savepoint; dòng lỗi được ghi vào entry['error'].
+# Transaction của chunk đã rollback nên mã giữ trước (assign_keys) phải cấp lại.
+def _insert_one_by_one(to_insert, profile_model, role_ids, assign_keys, error_label):
+    if assign_keys:
+        assign_keys([e['record'] for e in to_insert])
+    inserted = 0
+    for entry in to_insert:
+        try:
+            with db.session.begin_nested():
+                insert_entries([entry], profile_model, role_ids)
+            inserted += 1
+        except ROW_DATA_ERRORS as e:
+            entry['error'] = f"{error_label} {entry['record']['name']}: {str(e.orig)}"
+    return inserted
+
+
+# Tạo file Excel kết quả: sheet dòng thành công và sheet lỗi
+def build_result_workbook(success_results, error_results, success_sheet='Thành công'):
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        if success_results:
+            pd.DataFrame(success_results).to_excel(writer, sheet_name=success_sheet, index=False)
+        if error_results:
+            pd.DataFrame({'Lỗi': error_results}).to_excel(writer, sheet_name='Lỗi', index=False)
+    output.seek(0)
+    return output
+
+
+# Ô trống đọc từ file là None
+def cell_text(value):
+    return '' if value is None else str(value).strip()
+
+
+# Mã sinh viên + email cấp cho 1 dòng; dùng chung cho import và dry run (roster_validation)
+# để hai bên luôn sinh cùng giá trị. enrollment_year đã qua cell_text, stt là giá trị ô.
+def student_identity(enrollment_year, faculty_id, major_id, stt):
+    student_id = generate_student_id(enrollment_year, major_id, faculty_id, stt)
+    return student_id, generate_student_email(student_id)
+
+
+def import_students(chunks, faculties, majors, progress=None, checkpoint=None, role_ids=None):
+    # chunks: các danh sách tuple theo thứ tự STUDENT_COLUMNS
+    def prepare_row(row):
+        stt, name, dob, cccd, faculty, major, enrollment_year, phone, gender, address = row
+        name = cell_text(name)
+        dob = parse_date(dob)
+        enrollment_year = cell_text(enrollment_year)
+
+        faculty_id = faculties.get(normalize_text(faculty))
+        major_id = majors.get(normalize_text(major))
+        if not faculty_id or not major_id:
+            return None, f"Không tìm thấy Faculty/Major: {faculty}/{major}"
+        if not dob:
+            return None, f"Không thể chuyển đổi ngày sinh cho {name}"
+
+        student_id, email = student_identity(enrollment_year, faculty_id, major_id, stt)
+        return {
+            'name': name,
+            'user': {
+                'email': email, 'password': cell_text(cccd),
+                'name': name, 'name_normalized': normalize_text(name),
+                'phone': cell_text(phone), 'birth': dob,
+                'gender': GENDER_MAP.get(cell_text(gender).lower(), 'other'),
+                'address': cell_text(address), 'first_login': True
+            },
+            'profile': {
+                'student_id': student_id, 'faculty_id': faculty_id,
+                'major_id': major_id, 'enrollment_year': enrollment_year
+            }
+        }, None
+
+    return bulk_import_users(
+        chunks, prepare_row, Student, Student.student_id,
+        "Email hoặc mã sinh viên đã tồn tại: {email}", "Lỗi sinh viên", progress, checkpoint,
+        role_ids=role_ids
+    )
+
+
+def import_instructors(chunks, faculties, progress=None, checkpoint=None, role_ids=None):
+    # chunks: các danh sách tuple theo thứ tự INSTRUCTOR_COLUMNS
+    def prepare_row(row):
+        _, name, dob, cccd, faculty, phone, gender, address, position, degree, joined_year = row
+        name = cell_text(name)
+        dob = parse_date(dob)
+        joined_year = str(int(joined_year)) if pd.notnull(joined_year) else None
+
+        faculty_id = faculties.get(normalize_text(faculty))
+        if not faculty_id:
+            return None, f"Khoa không hợp lệ: {faculty}"
+        if not dob:
+            return None, f"Không thể chuyển đổi ngày sinh cho {name}"
+
+        # Mã giảng viên và email được cấp theo khối trong assign_keys
+        return {
+            'name': name,
+            'user': {
+                'email': None, 'password': cell_text(cccd),
+                'name': name, 'name_normalized': normalize_text(name),
+                'phone': cell_text(phone), 'birth': dob,
+                'gender': GENDER_MAP.get(cell_text(gender).lower(), 'other'),
+                'address': cell_text(address), 'first_login': True
+            },
+            'profile': {
+                'employee_id': None, 'position': cell_text(position),
+                'degree': cell_text(degree), 'faculty_id': faculty_id,
+                'joined_year': joined_year
+            }
+        }, None
+
+    # Mỗi khoa trong chunk chỉ cần 1 lệnh để giữ trước đủ số mã
+    def assign_keys(records):
+        by_faculty = {}
+        for record in records:
+            by_faculty.setdefault(record['profile']['faculty_id'], []).append(record)
+        for faculty_id, faculty_records in by_faculty.items():
+            employee_ids = reserve_instructor_ids(faculty_id, len(faculty_records))
+            for record, employee_id in zip(faculty_records, employee_ids):
+                record['profile']['employee_id'] = employee_id
+                record['user']['email'] = generate_instructor_email(employee_id)
+
+    return bulk_import_users(
+        chunks, prepare_row, Instructor, Instructor.employee_id,
+        "Email hoặc mã nhân viên đã tồn tại: {email}", "Lỗi giảng viên", progress, checkpoint,
+        assign_keys, role_ids
+    )
+
+
+# Import toàn bộ file (reader của open_table đã mở, đã kiểm tra cột) - dùng cho cả request và job nền.
+# Có file_hash thì import theo checkpoint: upload lại cùng file sẽ chạy tiếp từ chỗ dừng.
+def import_student_file(reader, progress=None, file_hash=None):
+    faculties = faculty_ids_by_name()
+    majors = major_ids_by_name()
+    checkpoint = get_checkpoint('student', file_hash) if file_hash else None
+    # User mới được gán sẵn vai trò Student
+    results = import_students(reader.iter_chunks(STUDENT_COLUMNS), faculties, majors, progress, checkpoint,
+                              role_ids_by_name('Student'))
+    if checkpoint is not None:
+        clear_checkpoint(checkpoint)
+    return results
+
+
+def import_instructor_file(reader, progress=None, file_hash=None):
+    faculties = faculty_ids_by_name()
+    checkpoint = get_checkpoint('instructor', file_hash) if file_hash else None
+    results = import_instructors(reader.iter_chunks(INSTRUCTOR_COLUMNS), faculties, progress, checkpoint,
+                                 role_ids_by_name('Instructor'))
+    if checkpoint is not None:
+        clear_checkpoint(checkpoint)
+    return results
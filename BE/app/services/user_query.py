@@ -0,0 +1,281 @@
+import base64
+import json
+from sqlalchemy import func, select, or_, and_, exists
+from sqlalchemy.orm import aliased
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from app import db
+from app.models.user import Users, Student, Instructor, Faculty, Major, Role, UserRole
+from app.utils.fieldsets import parse_fields
+from app.services.user_search import search_candidates
+
+# Danh sách user cho trang quản trị: 1 câu SELECT duy nhất
+# users LEFT JOIN students/instructors/faculties/majors + danh sách role gom theo user,
+# số query không phụ thuộc số dòng trả về.
+# Phân trang kiểu keyset: cursor là khoá sắp xếp của dòng cuối trang trước,
+# trang sau lọc theo (khoá, id) > cursor nên không phải OFFSET qua các dòng đã đọc.
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+# Các khoá sắp xếp cho phép, luôn kèm users.id để thứ tự ổn định khi trùng giá trị
+SORT_KEYS = {
+    'id': Users.id,
+    'name': Users.name,
+    'email': Users.email,
+}
+
+# Field có thể chọn qua ?fields=; id/name/email luôn được SELECT (làm khoá sắp xếp/cursor)
+USER_COLUMN_FIELDS = ('phone', 'birth', 'gender', 'address', 'status', 'first_login', 'created_at')
+USER_FIELDS = ('id', 'name', 'email') + USER_COLUMN_FIELDS + ('role', 'roles', 'student_info', 'instructor_info')
+
+StudentFaculty = aliased(Faculty)
+InstructorFaculty = aliased(Faculty)
+
+
+# Danh sách role của user, tính bằng subquery tương quan nên chỉ chạy cho các dòng của trang
+def _roles_column():
+    return (
+        select(func.array_agg(aggregate_order_by(Role.name, Role.id)))
+        .join(UserRole, Role.id == UserRole.role_id)
+        .where(UserRole.user_id == Users.id)
+        .scalar_subquery()
+        .label('roles')
+    )
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    if str(value).lower() in ('1', 'true'):
+        return True
+    if str(value).lower() in ('0', 'false'):
+        return False
+    raise ValueError(f"Giá trị không hợp lệ: {value}")
+
+
+def _parse_int(name, value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Tham số {name} phải là số nguyên")
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise ValueError("Cursor không hợp lệ")
+
+
+# Đọc bộ lọc user từ query string hoặc JSON; thiếu -> None, sai định dạng -> ValueError
+def parse_user_filters(args):
+    filters = {
+        'role': args.get('role') or None,
+        'status': args.get('status') or None,
+        'enrollment_year': str(args['enrollment_year']) if args.get('enrollment_year') else None,
+        'q': str(args.get('q') or '').strip() or None,
+    }
+    for name in ('faculty_id', 'major_id'):
+        filters[name] = _parse_int(name, args[name]) if args.get(name) else None
+    filters['is_deleted'] = _parse_bool(args['is_deleted']) if args.get('is_deleted') not in (None, '') else None
+    return filters
+
+
+# Đọc tham số lọc/phân trang từ query string; sai định dạng -> ValueError
+def parse_user_list_args(args):
+    options = parse_user_filters(args)
+    options['fields'] = parse_fields(args.get('fields'), USER_FIELDS)
+
+    sort = args.get('sort', 'id')
+    options['descending'] = sort.startswith('-')
+    options['sort'] = sort.lstrip('-')
+    if options['sort'] not in SORT_KEYS:
+        raise ValueError(f"Chỉ sắp xếp theo: {', '.join(SORT_KEYS)}")
+
+    limit = _parse_int('limit', args['limit']) if args.get('limit') else DEFAULT_LIMIT
+    options['limit'] = max(1, min(limit, MAX_LIMIT))
+    options['cursor'] = None
+    if args.get('cursor'):
+        options['cursor'] = _check_cursor(decode_cursor(args['cursor']), options['sort'])
+    return options
+
+
+# Cursor phải khớp khoá sắp xếp: [id] hoặc [giá trị, id], mỗi giá trị đúng kiểu của cột
+def _check_cursor(cursor, sort):
+    columns = [Users.id] if sort == 'id' else [SORT_KEYS[sort], Users.id]
+    if not isinstance(cursor, list) or len(cursor) != len(columns):
+        raise ValueError("Cursor không hợp lệ")
+    for value, column in zip(cursor, columns):
+        if isinstance(value, bool) or not isinstance(value, column.type.python_type):
+            raise ValueError("Cursor không hợp lệ")
+    return cursor
+
+
+# Các cột cần SELECT cho từng field trả về; student_info/instructor_info kéo theo JOIN tương ứng
+def _user_columns(fields):
+    columns = [Users.id, Users.name, Users.email]
+    columns += [getattr(Users, f) for f in USER_COLUMN_FIELDS if f in fields]
+    if 'role' in fields or 'roles' in fields:
+        columns.append(_roles_column())
+    if 'student_info' in fields:
+        columns += [
+            Student.student_id, Student.enrollment_year,
+            StudentFaculty.name.label('student_faculty'), Major.name.label('student_major'),
+        ]
+    if 'instructor_info' in fields:
+        columns += [
+            Instructor.employee_id, Instructor.position, Instructor.degree, Instructor.joined_year,
+            InstructorFaculty.name.label('instructor_faculty'),
+        ]
+    return columns
+
+
+def build_user_list_query(role=None, faculty_id=None, major_id=None, status=None,
+                          enrollment_year=None, is_deleted=None, q=None, fields=USER_FIELDS):
+    role = role.lower() if role else None
+    # Chỉ JOIN bảng hồ sơ khi cần trả về hoặc cần lọc theo nó
+    join_student = (
+        'student_info' in fields or role == 'student'
+        or faculty_id is not None or major_id is not None or enrollment_year
+    )
+    join_instructor = 'instructor_info' in fields or role == 'instructor' or faculty_id is not None
+
+    query = db.session.query(*_user_columns(fields))
+    if join_student:
+        query = query.outerjoin(Student, Student.user_id == Users.id)
+        if 'student_info' in fields:
+            query = (
+                query.outerjoin(StudentFaculty, StudentFaculty.id == Student.faculty_id)
+                .outerjoin(Major, Major.id == Student.major_id)
+            )
+    if join_instructor:
+        query = query.outerjoin(Instructor, Instructor.user_id == Users.id)
+        if 'instructor_info' in fields:
+            query = query.outerjoin(InstructorFaculty, InstructorFaculty.id == Instructor.faculty_id)
+
+    # 'student' / 'instructor' lọc theo hồ sơ tương ứng (giữ cách lọc cũ), role khác lọc theo user_roles
+    if role:
+        if role == 'student':
+            query = query.filter(Student.id.isnot(None))
+        elif role == 'instructor':
+            query = query.filter(Instructor.id.isnot(None))
+        else:
+            query = query.filter(exists().where(
+                UserRole.user_id == Users.id,
+                UserRole.role_id == Role.id,
+                func.lower(Role.name) == role
+            ))
+    if faculty_id is not None:
+        query = query.filter(or_(Student.faculty_id == faculty_id, Instructor.faculty_id == faculty_id))
+    if major_id is not None:
+        query = query.filter(Student.major_id == major_id)
+    if status:
+        query = query.filter(Users.status == status)
+    if enrollment_year:
+        query = query.filter(Student.enrollment_year == enrollment_year)
+    if is_deleted is not None:
+        query = query.filter(Users.is_deleted.is_(True) if is_deleted else Users.is_deleted.isnot(True))
+    # q: tìm theo tên (không dấu), email, mã SV/GV như /api/user/search
+    if q:
+        query = query.filter(Users.id.in_(search_candidates(q)))
+
+    return query
+
+
+# Lấy 1 trang: trả về (danh sách dòng, cursor của trang sau hoặc None)
+def paginate_users(query, sort='id', descending=False, limit=DEFAULT_LIMIT, cursor=None):
+    key = SORT_KEYS[sort]
+
+    if cursor is not None:
+        if sort == 'id':
+            query = query.filter(Users.id < cursor[0] if descending else Users.id > cursor[0])
+        else:
+            value, last_id = cursor
+            if descending:
+                query = query.filter(or_(key < value, and_(key == value, Users.id < last_id)))
+            else:
+                query = query.filter(or_(key > value, and_(key == value, Users.id > last_id)))
+
+    order = [key.desc(), Users.id.desc()] if descending else [key.asc(), Users.id.asc()]
+    if sort == 'id':
+        order = order[1:]
+
+    rows = query.order_by(*order).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    next_cursor = [last.id] if sort == 'id' else [getattr(last, sort), last.id]
+    return rows, encode_cursor(next_cursor)
+
+
+# Chuyển 1 dòng kết quả sang JSON đúng định dạng API cũ, chỉ gồm các field được yêu cầu
+def user_row_to_dict(row, fields=USER_FIELDS):
+    user_data = {}
+    for field in ('id', 'name', 'email') + USER_COLUMN_FIELDS:
+        if field in fields:
+            user_data[field] = getattr(row, field)
+
+    if 'role' in fields or 'roles' in fields:
+        roles = row.roles or []
+        if 'role' in fields:
+            user_data['role'] = roles[0] if roles else "Không có"
+        if 'roles' in fields:
+            user_data['roles'] = roles
+
+    if 'student_info' in fields and row.student_id is not None:
+        user_data['student_info'] = {
+            'student_id': row.student_id,
+            'faculty': row.student_faculty,
+            'major': row.student_major,
+            'enrollment_year': row.enrollment_year
+        }
+
+    if 'instructor_info' in fields and row.employee_id is not None:
+        user_data['instructor_info'] = {
+            'employee_id': row.employee_id,
+            'faculty': row.instructor_faculty,
+            'position': row.position,
+            'degree': row.degree,
+            'joined_year': row.joined_year
+        }
+
+    return user_data
+
+
+def _filtered_query(options):
+    return build_user_list_query(
+        role=options['role'], faculty_id=options['faculty_id'], major_id=options['major_id'],
+        status=options['status'], enrollment_year=options['enrollment_year'],
+        is_deleted=options['is_deleted'], q=options['q'], fields=options['fields']
+    )
+
+
+# SELECT users.id theo bộ lọc (kết quả của parse_user_filters), dùng cho thao tác hàng loạt
+def build_user_id_query(filters):
+    return build_user_list_query(fields=('id',), **filters).with_entities(Users.id)
+
+
+# Toàn bộ user khớp bộ lọc (bỏ qua limit/cursor), dùng cho response dạng stream
+def build_user_export_query(options):
+    key = SORT_KEYS[options['sort']]
+    if options['descending']:
+        return _filtered_query(options).order_by(key.desc(), Users.id.desc())
+    return _filtered_query(options).order_by(key.asc(), Users.id.asc())
+
+
+# Trang danh sách user theo tham số đã parse: {'users': [...], 'next_cursor': ...}
+def list_users(options):
+    query = _filtered_query(options)
+    rows, next_cursor = paginate_users(
+        query, options['sort'], options['descending'], options['limit'], options['cursor']
+    )
+    return {
+        'users': [user_row_to_dict(row, options['fields']) for row in rows],
+        'next_cursor': next_cursor
+    }
@@ -0,0 +1,89 @@
+from sqlalchemy import case, func, or_, select, union
+from app import db
+from app.models.user import Users, Student, Instructor
+from app.utils.text_helper import normalize_text
+
+# Tìm user theo một phần tên (không dấu), email, mã sinh viên, mã giảng viên.
+# Tên so khớp trên cột users.name_normalized (cùng cách chuẩn hoá với normalize_text)
+# có index trigram + pattern_ops; mã SV/GV chỉ tìm theo tiền tố.
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+
+# Tập id user khớp text (UNION các nhánh, mỗi nhánh chỉ chạm một bảng nên dùng được
+# index riêng của cột đó). Dùng cho search_users và bộ lọc q của danh sách user.
+# prefix_only=True cho ô autocomplete: chỉ khớp đầu tên / đầu một từ trong tên / đầu email / đầu mã
+def search_candidates(text, prefix_only=False):
+    term = normalize_text(text)
+    code = text.strip().upper()
+
+    user_conditions = [
+        Users.name_normalized.startswith(term, autoescape=True),
+        Users.name_normalized.contains(' ' + term, autoescape=True),
+        Users.email.startswith(term, autoescape=True),
+    ]
+    if not prefix_only:
+        user_conditions += [
+            Users.name_normalized.contains(term, autoescape=True),
+            Users.email.contains(term, autoescape=True),
+        ]
+    return union(
+        select(Users.id).where(or_(*user_conditions)),
+        select(Student.user_id).where(Student.student_id.startswith(code, autoescape=True)),
+        select(Instructor.user_id).where(Instructor.employee_id.startswith(code, autoescape=True)),
+    )
+
+
+def search_users(text, limit=DEFAULT_LIMIT, prefix_only=False, include_deleted=False):
+    term = normalize_text(text)
+    code = text.strip().upper()
+
+    name_prefix = Users.name_normalized.startswith(term, autoescape=True)
+    word_prefix = Users.name_normalized.contains(' ' + term, autoescape=True)
+    email_prefix = Users.email.startswith(term, autoescape=True)
+    student_prefix = Student.student_id.startswith(code, autoescape=True)
+    employee_prefix = Instructor.employee_id.startswith(code, autoescape=True)
+    exact_code = or_(Student.student_id == code, Instructor.employee_id == code)
+    candidates = search_candidates(text, prefix_only)
+
+    # Hạng: trùng mã > khớp đầu tên/email/mã > khớp đầu một từ trong tên > khớp giữa chuỗi
+    rank = case(
+        (exact_code, 0),
+        (or_(name_prefix, email_prefix, student_prefix, employee_prefix), 1),
+        (word_prefix, 2),
+        else_=3
+    ).label('rank')
+
+    query = (
+        db.session.query(
+            Users.id, Users.name, Users.email, Users.status,
+            Student.student_id, Instructor.employee_id, rank
+        )
+        .outerjoin(Student, Student.user_id == Users.id)
+        .outerjoin(Instructor, Instructor.user_id == Users.id)
+        .filter(Users.id.in_(candidates))
+    )
+    if not include_deleted:
+        query = query.filter(Users.is_deleted.isnot(True))
+
+    rows = (
+        query.order_by(
+            rank,
+            func.similarity(Users.name_normalized, term).desc(),
+            Users.name,
+            Users.id
+        )
+        .limit(limit)
+        .all()
+    )
+
+    return [{
+        'id': row.id,
+        'name': row.name,
+        'email': row.email,
+        'status': row.status,
+        'student_id': row.student_id,
+        'employee_id': row.employee_id,
+        'rank': row.rank
+    } for row in rows]
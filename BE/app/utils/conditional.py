@@ -0,0 +1,38 @@
+import hashlib
+from functools import wraps
+from flask import request, make_response
+from app.services.table_versions import get_versions
+from app.utils.streaming import requested_stream_format
+
+# Conditional GET cho API danh mục: ETag mạnh ghép từ phiên bản của các bảng
+# và query string (fields=, stream=... cho ra nội dung khác nhau), cộng kiểu stream đã
+# chọn vì header Accept: application/x-ndjson cũng đổi định dạng body.
+# Client gửi If-None-Match trùng ETag -> trả 304 ngay, không chạy query dữ liệu.
+
+
+def _build_etag(tables):
+    versions = get_versions(*tables)
+    key = '|'.join(f'{t}:{v}' for t, v in zip(tables, versions))
+    key += '|' + request.query_string.decode('latin-1')
+    key += '|' + (requested_stream_format() or 'json')
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def etag_by_table_version(*tables):
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            etag = _build_etag(tables)
+            if request.if_none_match.contains(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(fn(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.vary.add('Accept')
+            # Trình duyệt vẫn lưu nhưng luôn hỏi lại server bằng If-None-Match
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
@@ -1,6 +1,6 @@
 from app import db
 from app.models.course_models import Course, CourseClass, CourseSchedule
-from app.models.user import Major
+from app.services.catalog_cache import get_major
 from sqlalchemy import and_
 import re
 
@@ -30,13 +30,13 @@ def is_conflicting_schedule(class_id, day_of_week, start_time, end_time, exclude
         query = query.filter(CourseSchedule.id != exclude_id)
     return db.session.query(query.exists()).scalar()
 def generate_course_code(major_id):
-    major = Major.query.get(major_id)
-    if not major or not major.prefix:
+    major = get_major(major_id)
+    if not major or not major['prefix']:
         return None
 
     # Đếm số môn học đã có trong chuyên ngành
     count = Course.query.filter_by(major_id=major_id).count()
-    code = f"{major.prefix.upper()}{str(count + 1).zfill(3)}" 
+    code = f"{major['prefix'].upper()}{str(count + 1).zfill(3)}" 
     return code
 
 
@@ -0,0 +1,62 @@
+from openpyxl import load_workbook
+
+# Số dòng trong mỗi chunk trả về cho phía xử lý
+CHUNK_SIZE = 1000
+
+
+def iter_chunks(rows, size=CHUNK_SIZE):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# Đọc file Excel dạng stream (read-only, duyệt từng dòng) thay cho pd.read_excel:
+# không dựng DataFrame, bộ nhớ không tăng theo kích thước file.
+# Dòng đầu tiên là tiêu đề cột, các dòng trống hoàn toàn bị bỏ qua.
+# Đường dẫn được mở ở chế độ nhị phân: openpyxl chọn reader theo đuôi file và từ chối
+# file .xlsx lưu với đuôi khác (vd. file upload của job nền).
+class ExcelReader:
+    def __init__(self, file, chunk_size=CHUNK_SIZE):
+        self._owned = open(file, 'rb') if isinstance(file, str) else None
+        try:
+            self.workbook = load_workbook(self._owned or file, read_only=True, data_only=True)
+        except Exception:
+            if self._owned:
+                self._owned.close()
+            raise
+        self.chunk_size = chunk_size
+        self._rows = self.workbook.active.iter_rows(values_only=True)
+        header = next(self._rows, None) or ()
+        self.columns = ['' if c is None else str(c).strip() for c in header]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.workbook.close()
+        if self._owned:
+            self._owned.close()
+
+    # Trả về các tuple giá trị theo đúng thứ tự `columns` (cột thiếu -> None),
+    # giá trị giữ nguyên kiểu của ô: str, int, float, datetime...
+    def iter_rows(self, columns):
+        index = {name: i for i, name in enumerate(self.columns)}
+        positions = [index.get(name) for name in columns]
+        for values in self._rows:
+            if all(v is None for v in values):
+                continue
+            yield tuple(
+                values[p] if p is not None and p < len(values) else None
+                for p in positions
+            )
+
+    def iter_chunks(self, columns):
+        return iter_chunks(self.iter_rows(columns), self.chunk_size)
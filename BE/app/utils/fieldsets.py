@@ -0,0 +1,31 @@
+from flask import request
+
+# ?fields=id,name,email : chỉ chọn (SELECT) và trả về các cột được yêu cầu.
+# Không truyền fields -> trả về đủ các cột như trước.
+
+
+# allowed: tuple tên field theo thứ tự trả về; field lạ -> ValueError
+def parse_fields(value, allowed):
+    value = (value or '').strip()
+    if not value:
+        return list(allowed)
+
+    fields = [f.strip() for f in value.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise ValueError(f"Field không hợp lệ: {', '.join(unknown)}. Cho phép: {', '.join(allowed)}")
+    # Giữ thứ tự khai báo, bỏ trùng
+    return [f for f in allowed if f in fields]
+
+
+def requested_fields(allowed):
+    return parse_fields(request.args.get('fields'), allowed)
+
+
+# Các cột của model tương ứng với danh sách field (tên field = tên thuộc tính của model)
+def model_columns(model, fields):
+    return [getattr(model, field).label(field) for field in fields]
+
+
+def row_to_dict(row):
+    return row._asdict()
@@ -0,0 +1,141 @@
+import hmac
+import threading
+import time
+from contextlib import closing
+from flask import current_app
+from app.utils.sqlite_store import connect
+
+# Mã khôi phục mật khẩu theo email: hết hạn sau RESET_CODE_TTL giây, bị huỷ sau
+# RESET_CODE_MAX_ATTEMPTS lần nhập sai. Mã hết hạn được một thread nền dọn định kỳ.
+#   memory: dict trong process (chạy 1 worker / test)
+#   sqlite: file SQLite dùng chung cho mọi worker trên máy (mặc định)
+
+CODE_OK = 'ok'
+CODE_INVALID = 'invalid'
+CODE_MISSING = 'missing'
+CODE_LOCKED = 'locked'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reset_codes (
+    email TEXT PRIMARY KEY,
+    code TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+# Kết quả kiểm tra 1 mã đang lưu; trả về (kết quả, có xoá mã không).
+# So sánh dạng bytes: compare_digest từ chối chuỗi có ký tự ngoài ASCII.
+def _check(stored_code, attempts, code, max_attempts):
+    if hmac.compare_digest(stored_code.encode(), str(code).encode()):
+        return CODE_OK, True
+    if attempts + 1 >= max_attempts:
+        return CODE_LOCKED, True
+    return CODE_INVALID, False
+
+
+class MemoryResetCodeStore:
+    def __init__(self, max_attempts):
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def save(self, email, code, ttl):
+        with self._lock:
+            self._entries[email] = {'code': code, 'attempts': 0, 'expires_at': time.time() + ttl}
+
+    def verify(self, email, code):
+        with self._lock:
+            entry = self._entries.get(email)
+            if not entry or entry['expires_at'] <= time.time():
+                return CODE_MISSING
+            result, consumed = _check(entry['code'], entry['attempts'], code, self.max_attempts)
+            if consumed:
+                del self._entries[email]
+            else:
+                entry['attempts'] += 1
+            return result
+
+    def sweep(self):
+        now = time.time()
+        with self._lock:
+            self._entries = {k: v for k, v in self._entries.items() if v['expires_at'] > now}
+
+
+class SqliteResetCodeStore:
+    def __init__(self, path, max_attempts):
+        self.path = path
+        self.max_attempts = max_attempts
+        connect(path, SCHEMA).close()
+
+    def save(self, email, code, ttl):
+        with closing(connect(self.path)) as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO reset_codes (email, code, attempts, expires_at) VALUES (?, ?, 0, ?)',
+                (email, code, time.time() + ttl)
+            )
+
+    def verify(self, email, code):
+        with closing(connect(self.path)) as conn:
+            # Khoá ghi để 2 worker không cùng dùng 1 mã / cùng đếm lượt sai
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute(
+                    'SELECT code, attempts FROM reset_codes WHERE email = ? AND expires_at > ?',
+                    (email, time.time())
+                ).fetchone()
+                if row is None:
+                    return CODE_MISSING
+                result, consumed = _check(row['code'], row['attempts'], code, self.max_attempts)
+                if consumed:
+                    conn.execute('DELETE FROM reset_codes WHERE email = ?', (email,))
+                else:
+                    conn.execute('UPDATE reset_codes SET attempts = attempts + 1 WHERE email = ?', (email,))
+                return result
+            finally:
+                conn.execute('COMMIT')
+
+    def sweep(self):
+        with closing(connect(self.path)) as conn:
+            conn.execute('DELETE FROM reset_codes WHERE expires_at <= ?', (time.time(),))
+
+
+def create_reset_code_store(config):
+    backend = config['RESET_CODE_BACKEND']
+    if backend == 'memory':
+        return MemoryResetCodeStore(config['RESET_CODE_MAX_ATTEMPTS'])
+    if backend == 'sqlite':
+        return SqliteResetCodeStore(config['RESET_CODE_PATH'], config['RESET_CODE_MAX_ATTEMPTS'])
+    raise ValueError(f"RESET_CODE_BACKEND không hợp lệ: {backend}")
+
+
+# Thread nền dọn mã hết hạn (daemon: tự dừng khi process thoát)
+def _start_sweeper(store, interval, logger):
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                store.sweep()
+            except Exception as e:
+                logger.error("Lỗi dọn mã khôi phục: %s", e)
+
+    thread = threading.Thread(target=run, name='reset-code-sweeper', daemon=True)
+    thread.start()
+    return thread
+
+
+def init_reset_codes(app):
+    store = create_reset_code_store(app.config)
+    app.extensions['reset_codes'] = store
+    _start_sweeper(store, app.config['RESET_CODE_SWEEP_INTERVAL'], app.logger)
+
+
+def save_reset_code(email, code):
+    store = current_app.extensions['reset_codes']
+    store.save(email, code, current_app.config['RESET_CODE_TTL'])
+
+
+# Trả về CODE_OK (mã đúng, đã bị huỷ), CODE_INVALID, CODE_MISSING (không có / hết hạn) hoặc CODE_LOCKED
+def verify_reset_code(email, code):
+    return current_app.extensions['reset_codes'].verify(email, code)
@@ -0,0 +1,16 @@
+import os
+import sqlite3
+
+
+# Mở kết nối SQLite dùng chung giữa các worker trên cùng máy (WAL cho phép đọc song song).
+# Kết nối ở chế độ autocommit, mỗi thao tác nên mở/đóng kết nối riêng (contextlib.closing).
+def connect(path, schema=None):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    if schema:
+        conn.executescript(schema)
+    return conn
@@ -0,0 +1,54 @@
+from flask import Response, current_app, request, stream_with_context
+
+# Trả danh sách lớn theo kiểu stream: đọc DB bằng server-side cursor (yield_per)
+# và ghi từng dòng ra response, bộ nhớ không tăng theo số dòng, client nhận byte đầu ngay.
+#   ?stream=json   -> một mảng JSON [ {...}, {...} ]
+#   ?stream=ndjson -> mỗi dòng một object JSON (hoặc Accept: application/x-ndjson)
+
+STREAM_BATCH_SIZE = 1000
+
+STREAM_JSON = 'json'
+STREAM_NDJSON = 'ndjson'
+
+
+# Kiểu stream client yêu cầu, None nếu trả JSON bình thường
+def requested_stream_format():
+    value = request.args.get('stream', '').lower()
+    if value in (STREAM_JSON, STREAM_NDJSON):
+        return value
+    if value in ('1', 'true'):
+        return STREAM_JSON
+    if 'application/x-ndjson' in request.headers.get('Accept', ''):
+        return STREAM_NDJSON
+    return None
+
+
+def _json_array(rows, dumps):
+    yield '['
+    first = True
+    for row in rows:
+        yield ('' if first else ',') + dumps(row)
+        first = False
+    yield ']'
+
+
+def _ndjson(rows, dumps):
+    for row in rows:
+        yield dumps(row) + '\n'
+
+
+# query: Query của SQLAlchemy (chưa .all()), to_dict: hàm chuyển 1 dòng sang dict
+def stream_query(query, to_dict, fmt=STREAM_JSON):
+    # Dùng cùng bộ encode với jsonify (datetime, date...)
+    dumps = current_app.json.dumps
+    rows = (to_dict(row) for row in query.yield_per(STREAM_BATCH_SIZE))
+
+    if fmt == STREAM_NDJSON:
+        body, mimetype = _ndjson(rows, dumps), 'application/x-ndjson'
+    else:
+        body, mimetype = _json_array(rows, dumps), 'application/json'
+
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    # Không để reverse proxy gom cả response rồi mới gửi
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,122 @@
+import csv
+import io
+from app.utils.excel_reader import ExcelReader, iter_chunks, CHUNK_SIZE
+
+# File danh sách có thể là .xlsx, CSV (UTF-8) hoặc Parquet với cùng tiêu đề cột.
+# Định dạng được nhận biết qua vài byte đầu của nội dung, không dựa vào đuôi file.
+FORMAT_XLSX = 'xlsx'
+FORMAT_PARQUET = 'parquet'
+FORMAT_CSV = 'csv'
+
+XLSX_MAGIC = b'PK\x03\x04'
+PARQUET_MAGIC = b'PAR1'
+
+
+# file: đường dẫn hoặc file-like (FileStorage của Flask); con trỏ được đưa về đầu file
+def detect_format(file):
+    if isinstance(file, str):
+        with open(file, 'rb') as f:
+            head = f.read(4)
+    else:
+        file.seek(0)
+        head = file.read(4)
+        file.seek(0)
+
+    if head == XLSX_MAGIC:
+        return FORMAT_XLSX
+    if head == PARQUET_MAGIC:
+        return FORMAT_PARQUET
+    return FORMAT_CSV
+
+
+def _binary_stream(file):
+    # FileStorage chỉ proxy các thuộc tính, pyarrow/csv cần đối tượng stream thật
+    return getattr(file, 'stream', file)
+
+
+# Các reader dưới đây có cùng giao diện với ExcelReader: columns, iter_rows(columns),
+# iter_chunks(columns), close() và dùng được với `with`.
+class _BaseReader:
+    def __init__(self, chunk_size):
+        self.chunk_size = chunk_size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def iter_chunks(self, columns):
+        return iter_chunks(self.iter_rows(columns), self.chunk_size)
+
+
+# CSV UTF-8 (có hoặc không có BOM). Ô trống được trả về None giống ô Excel trống,
+# còn lại giữ nguyên dạng chuỗi.
+class CsvReader(_BaseReader):
+    def __init__(self, file, chunk_size=CHUNK_SIZE):
+        super().__init__(chunk_size)
+        if isinstance(file, str):
+            self._text = open(file, encoding='utf-8-sig', newline='')
+            self._owned = True
+        else:
+            self._text = io.TextIOWrapper(_binary_stream(file), encoding='utf-8-sig', newline='')
+            self._owned = False
+        self._rows = csv.reader(self._text)
+        header = next(self._rows, None) or ()
+        self.columns = [c.strip() for c in header]
+
+    def close(self):
+        if self._owned:
+            self._text.close()
+        else:
+            # Không đóng stream upload của request, chỉ tách wrapper ra
+            self._text.detach()
+
+    def iter_rows(self, columns):
+        index = {name: i for i, name in enumerate(self.columns)}
+        positions = [index.get(name) for name in columns]
+        for values in self._rows:
+            values = [v if v.strip() else None for v in values]
+            if all(v is None for v in values):
+                continue
+            yield tuple(
+                values[p] if p is not None and p < len(values) else None
+                for p in positions
+            )
+
+
+# Parquet đọc theo từng record batch và chỉ các cột cần dùng.
+# Giá trị giữ kiểu của cột: int, str, date/datetime...
+class ParquetReader(_BaseReader):
+    def __init__(self, file, chunk_size=CHUNK_SIZE):
+        import pyarrow.parquet as pq
+
+        super().__init__(chunk_size)
+        self._file = pq.ParquetFile(file if isinstance(file, str) else _binary_stream(file))
+        self._names = {str(name).strip(): name for name in self._file.schema_arrow.names}
+        self.columns = list(self._names)
+
+    def close(self):
+        self._file.close()
+
+    def iter_rows(self, columns):
+        present = [self._names[name] for name in dict.fromkeys(columns) if name in self._names]
+        for batch in self._file.iter_batches(batch_size=self.chunk_size, columns=present):
+            data = batch.to_pydict()
+            missing = [None] * batch.num_rows
+            for values in zip(*(data.get(self._names.get(name), missing) for name in columns)):
+                if all(v is None for v in values):
+                    continue
+                yield values
+
+
+READERS = {
+    FORMAT_XLSX: ExcelReader,
+    FORMAT_CSV: CsvReader,
+    FORMAT_PARQUET: ParquetReader,
+}
+
+
+# Mở file danh sách với reader phù hợp định dạng nội dung
+def open_table(file, chunk_size=CHUNK_SIZE):
+    return READERS[detect_format(file)](file, chunk_size)
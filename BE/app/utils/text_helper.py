@@ -0,0 +1,12 @@
+import unicodedata
+import re
+
+
+# Chuẩn hoá tên để so sánh: chữ thường, bỏ dấu, gộp khoảng trắng.
+# Cũng là giá trị lưu ở cột name_normalized của Faculty/Major.
+def normalize_text(text):
+    text = text.lower().strip()
+    text = unicodedata.normalize('NFD', text)
+    text = ''.join(c for c in text if unicodedata.category(c) != 'Mn')  # bỏ dấu
+    text = re.sub(r'\s+', ' ', text)  # bỏ khoảng trắng thừa
+    return text
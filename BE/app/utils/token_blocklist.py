@@ -0,0 +1,96 @@
+import threading
+import time
+from flask import current_app
+from app.utils.sqlite_store import connect
+
+# Danh sách token đã thu hồi (đăng xuất), theo jti. Mỗi mục chỉ giữ đến khi token hết hạn
+# (claim exp): sau đó token bị từ chối vì hết hạn nên không cần nhớ nữa.
+#   memory: set trong process, chỉ đúng khi chạy 1 worker
+#   sqlite: file SQLite dùng chung cho mọi worker trên máy (mặc định)
+
+SWEEP_INTERVAL = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS token_blocklist (
+    jti TEXT PRIMARY KEY,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class MemoryBlocklist:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._next_sweep = time.time() + SWEEP_INTERVAL
+
+    def add(self, jti, expires_at):
+        now = time.time()
+        with self._lock:
+            self._entries[jti] = expires_at
+            if now >= self._next_sweep:
+                self._entries = {k: v for k, v in self._entries.items() if v > now}
+                self._next_sweep = now + SWEEP_INTERVAL
+
+    def contains(self, jti):
+        expires_at = self._entries.get(jti)
+        return expires_at is not None and expires_at > time.time()
+
+
+class SqliteBlocklist:
+    def __init__(self, path):
+        self.path = path
+        # Kiểm tra chạy ở mọi request nên mỗi thread giữ 1 kết nối thay vì mở lại mỗi lần
+        self._local = threading.local()
+        self._next_sweep = 0
+        connect(path, SCHEMA).close()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = connect(self.path)
+        return conn
+
+    def add(self, jti, expires_at):
+        now = time.time()
+        conn = self._connection()
+        conn.execute(
+            'INSERT OR REPLACE INTO token_blocklist (jti, expires_at) VALUES (?, ?)',
+            (jti, expires_at)
+        )
+        if now >= self._next_sweep:
+            conn.execute('DELETE FROM token_blocklist WHERE expires_at <= ?', (now,))
+            self._next_sweep = now + SWEEP_INTERVAL
+
+    def contains(self, jti):
+        row = self._connection().execute(
+            'SELECT 1 FROM token_blocklist WHERE jti = ? AND expires_at > ?', (jti, time.time())
+        ).fetchone()
+        return row is not None
+
+
+def create_blocklist(config):
+    backend = config['TOKEN_BLOCKLIST_BACKEND']
+    if backend == 'memory':
+        return MemoryBlocklist()
+    if backend == 'sqlite':
+        return SqliteBlocklist(config['TOKEN_BLOCKLIST_PATH'])
+    raise ValueError(f"TOKEN_BLOCKLIST_BACKEND không hợp lệ: {backend}")
+
+
+def init_blocklist(app):
+    app.extensions['token_blocklist'] = create_blocklist(app.config)
+
+
+def get_blocklist():
+    return current_app.extensions['token_blocklist']
+
+
+# Thu hồi token từ payload đã giải mã (get_jwt()); token không có exp giữ 1 năm
+def revoke_token(jwt_payload):
+    expires_at = jwt_payload.get('exp') or time.time() + 365 * 24 * 3600
+    get_blocklist().add(jwt_payload['jti'], expires_at)
+
+
+def is_token_revoked(jwt_payload):
+    return get_blocklist().contains(jwt_payload['jti'])
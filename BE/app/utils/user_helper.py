@@ -1,11 +1,22 @@
 from app import db
-from app.models.user import Instructor, Student
+from app.models.user import Instructor, Student, InstructorSequence, Faculty, Major
+from sqlalchemy import func, cast, update, Integer
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from functools import wraps 
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from flask import jsonify
-from app.models.user import Role, UserRole
-import unicodedata
-import re
+from app.services.role_claims import resolve_roles
+from app.services.permission_matrix import has_permission
+from datetime import datetime, date
+from app.utils.text_helper import normalize_text
+
+GENDER_MAP = {
+    'nam': 'male',
+    'nữ': 'female',
+    'nu': 'female',
+    'khác': 'other',
+    'other': 'other'
+}
 
 # Hàm tạo mã giảng viên
 def generate_instructor_id(faculty_id, stt):
@@ -17,16 +28,45 @@ def generate_instructor_id(faculty_id, stt):
 def generate_instructor_email(employee_id):
     return f"{employee_id}@daihocnguyentrai.edu.vn"
 
-# Hàm lấy STT tiếp theo theo faculty
-def get_next_instructor_stt(faculty_id):
-    faculty_code = str(faculty_id).zfill(2)
-    existing_ids = db.session.query(Instructor.employee_id).all()
-    filtered = [
-        int(eid[0][len("GV" + faculty_code):])
-        for eid in existing_ids
-        if eid[0].startswith(f"GV{faculty_code}")
-    ]
-    return max(filtered) + 1 if filtered else 1
+# STT lớn nhất đang có của khoa (dùng để khởi tạo bộ đếm lần đầu)
+def get_max_instructor_stt(faculty_id):
+    prefix = f"GV{str(faculty_id).zfill(2)}"
+    value = (
+        db.session.query(func.max(cast(func.substr(Instructor.employee_id, len(prefix) + 1), Integer)))
+        .filter(Instructor.employee_id.like(f"{prefix}%"))
+        .scalar()
+    )
+    return value or 0
+
+# Giữ trước `count` STT liên tiếp cho khoa, trả về STT đầu tiên của khối.
+# UPDATE ... RETURNING khoá dòng bộ đếm tới khi commit nên 2 lần import song song
+# không thể nhận trùng số; nếu transaction rollback thì khối số cũng được trả lại.
+def reserve_instructor_stt(faculty_id, count):
+    last_value = db.session.execute(
+        update(InstructorSequence)
+        .where(InstructorSequence.faculty_id == faculty_id)
+        .values(last_value=InstructorSequence.last_value + count)
+        .returning(InstructorSequence.last_value)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+
+    if last_value is None:
+        stmt = pg_insert(InstructorSequence).values(
+            faculty_id=faculty_id,
+            last_value=get_max_instructor_stt(faculty_id) + count
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[InstructorSequence.faculty_id],
+            set_={'last_value': InstructorSequence.last_value + count}
+        ).returning(InstructorSequence.last_value)
+        last_value = db.session.execute(stmt).scalar()
+
+    return last_value - count + 1
+
+# Cấp `count` mã giảng viên liên tiếp từ khối STT đã giữ trước
+def reserve_instructor_ids(faculty_id, count):
+    first = reserve_instructor_stt(faculty_id, count)
+    return [generate_instructor_id(faculty_id, stt) for stt in range(first, first + count)]
 
 # Hàm tạo student_id từ năm nhập học, ngành, khoa và STT
 def generate_student_id(enrollment_year, faculty_id, major_id, stt):
@@ -40,38 +80,59 @@ def generate_student_id(enrollment_year, faculty_id, major_id, stt):
 def generate_student_email(student_id):
     return f"{student_id}@daihocnguyentrai.edu.vn"
 
+# Vai trò lấy từ claim của access token (xem role_claims), chỉ truy vấn DB khi vai trò đã đổi
 def role_required(allowed_roles):
+    allowed = {r.lower() for r in allowed_roles}
+
     def decorator(fn):
         @wraps(fn)
         @jwt_required()
         def wrapper(*args, **kwargs):
-            user_id = get_jwt_identity()
+            roles = resolve_roles(get_jwt_identity(), get_jwt())
 
-            user_role = (
-                db.session.query(Role.name)
-                .join(UserRole, Role.id == UserRole.role_id)
-                .filter(UserRole.user_id == user_id)
-                .first()
-            )
+            if not any(role.lower() in allowed for role in roles):
+                return jsonify({'error': 'Bạn không có quyền truy cập'}), 403
 
-            role_name = user_role[0].lower() if user_role else None
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
 
-            if role_name not in [r.lower() for r in allowed_roles]:
-                return jsonify({'error': 'Bạn không có quyền truy cập'}), 403
+# Kiểm tra theo mã quyền (permissions.code) của các vai trò người gọi, tra ma trận dựng sẵn
+def permission_required(code):
+    def decorator(fn):
+        @wraps(fn)
+        @jwt_required()
+        def wrapper(*args, **kwargs):
+            roles = resolve_roles(get_jwt_identity(), get_jwt())
+
+            if not has_permission(roles, code):
+                return jsonify({'error': 'Bạn không có quyền thực hiện thao tác này'}), 403
 
             return fn(*args, **kwargs)
         return wrapper
     return decorator
 
-def normalize_text(text):
-    text = text.lower().strip()
-    text = unicodedata.normalize('NFD', text)
-    text = ''.join(c for c in text if unicodedata.category(c) != 'Mn')  # bỏ dấu
-    text = re.sub(r'\s+', ' ', text)  # bỏ khoảng trắng thừa
-    return text
+def parse_date(value):
+    if isinstance(value, str):
+        try:
+            return datetime.strptime(value.strip(), '%d/%m/%Y').date()
+        except ValueError:
+            return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return None
 
 def get_faculty_id_by_name(name, faculties_map):
     return faculties_map.get(normalize_text(name))
 
 def get_major_id_by_name(name, majors_map):
-    return majors_map.get(normalize_text(name))
\ No newline at end of file
+    return majors_map.get(normalize_text(name))
+
+# Map tên đã chuẩn hoá -> id, đọc thẳng cột name_normalized (không chuẩn hoá lại từng dòng)
+def get_faculties_map():
+    return dict(db.session.query(Faculty.name_normalized, Faculty.id).all())
+
+def get_majors_map():
+    return dict(db.session.query(Major.name_normalized, Major.id).all())
@@ -0,0 +1,79 @@
+# So sánh thời gian đọc file danh sách sinh viên (.xlsx / CSV / Parquet) qua open_table.
+# Chạy từ thư mục BE:  python benchmarks/bench_import_formats.py --rows 50000
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+
+from app.utils.table_reader import open_table
+from app.services.user_import import STUDENT_COLUMNS
+
+
+def make_rows(rows):
+    return [
+        [i + 1, f'Nguyễn Văn {i}', date(2003, 1 + i % 12, 1 + i % 28).strftime('%d/%m/%Y'),
+         f'{i:012d}', 'Công nghệ thông tin', 'Kỹ thuật phần mềm', '2024',
+         f'09{i:08d}', 'Nam' if i % 2 else 'Nữ', 'Hà Nội']
+        for i in range(rows)
+    ]
+
+
+def write_xlsx(path, rows):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(STUDENT_COLUMNS)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+
+
+def write_csv(path, rows):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(STUDENT_COLUMNS)
+        writer.writerows(rows)
+
+
+def write_parquet(path, rows):
+    columns = {name: [row[i] for row in rows] for i, name in enumerate(STUDENT_COLUMNS)}
+    pq.write_table(pa.table(columns), path)
+
+
+def parse(path):
+    start = time.perf_counter()
+    count = 0
+    with open_table(path) as reader:
+        for chunk in reader.iter_chunks(STUDENT_COLUMNS):
+            count += len(chunk)
+    return count, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=50000)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    writers = [('xlsx', write_xlsx), ('csv', write_csv), ('parquet', write_parquet)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'format':>8} {'size KB':>10} {'rows':>8} {'seconds':>10} {'rows/sec':>10}")
+        for fmt, write in writers:
+            path = os.path.join(tmp, f'students.{fmt}')
+            write(path, rows)
+            count, elapsed = parse(path)
+            size = os.path.getsize(path) / 1024
+            print(f"{fmt:>8} {size:>10.0f} {count:>8} {elapsed:>10.2f} {count / elapsed:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# So sánh gửi mail trực tiếp (mail.send, mỗi mail 1 kết nối SMTP) với hàng đợi nền
+# (send_async, 1 kết nối dùng lại) trên server SMTP giả lập cục bộ (aiosmtpd).
+# Cần: pip install aiosmtpd
+# Chạy từ thư mục BE:  python benchmarks/bench_mail_queue.py --messages 200 --delay 0.02
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiosmtpd.controller import Controller
+from flask_mail import Message
+
+from app import create_app
+from app.config import Config
+from app.extensions import mail
+from app.services.mail_queue import send_async, mail_queue_stats
+
+
+# Server giả lập: nhận mail, chờ delay giây cho mỗi mail như một server thật chậm
+class SlowHandler:
+    def __init__(self, delay):
+        self.delay = delay
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        await asyncio.sleep(self.delay)
+        self.received += 1
+        return '250 OK'
+
+
+def make_app(port):
+    Config.MAIL_SERVER = '127.0.0.1'
+    Config.MAIL_PORT = port
+    Config.MAIL_USE_TLS = False
+    Config.MAIL_USERNAME = None
+    Config.MAIL_PASSWORD = None
+    return create_app()
+
+
+def message(i):
+    msg = Message("Mã khôi phục mật khẩu", recipients=[f'sv{i}@daihocnguyentrai.edu.vn'])
+    msg.body = f"Mã xác nhận của bạn là: {100000 + i}"
+    return msg
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--delay', type=float, default=0.02)
+    args = parser.parse_args()
+
+    handler = SlowHandler(args.delay)
+    controller = Controller(handler, hostname='127.0.0.1', port=8025)
+    controller.start()
+    try:
+        app = make_app(8025)
+        with app.test_request_context():
+            start = time.perf_counter()
+            for i in range(args.messages):
+                mail.send(message(i))
+            inline = time.perf_counter() - start
+            print(f"mail.send trực tiếp: {inline:.2f}s, request chờ trung bình {inline / args.messages * 1000:.1f}ms/mail")
+
+            start = time.perf_counter()
+            for i in range(args.messages):
+                send_async(message(i))
+            enqueued = time.perf_counter() - start
+            app.extensions['mail_queue'].stop()
+            drained = time.perf_counter() - start
+            print(f"send_async: request chờ trung bình {enqueued / args.messages * 1000:.3f}ms/mail, "
+                  f"gửi hết sau {drained:.2f}s")
+            print(mail_queue_stats())
+        print(f"Server đã nhận {handler.received} mail")
+    finally:
+        controller.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+# Đo tốc độ băm mật khẩu (rows/sec) với 1, 4 và N process.
+# Chạy từ thư mục BE:  python benchmarks/bench_password_hashing.py --rows 400
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.password_hashing import hash_passwords, shutdown_pool
+
+
+def run(rows, workers, chunk_size):
+    passwords = [str(100000000000 + i) for i in range(rows)]
+    # Chạy nóng pool trước để không tính thời gian khởi tạo process
+    hash_passwords(passwords[:workers * 2], workers=workers, chunk_size=1)
+    start = time.perf_counter()
+    hash_passwords(passwords, workers=workers, chunk_size=chunk_size)
+    elapsed = time.perf_counter() - start
+    shutdown_pool()
+    return rows / elapsed, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=400)
+    parser.add_argument('--chunk-size', type=int, default=16)
+    parser.add_argument('--workers', type=int, nargs='*')
+    args = parser.parse_args()
+
+    worker_counts = args.workers or sorted({1, 4, os.cpu_count() or 1})
+    print(f"{'workers':>8} {'rows':>8} {'seconds':>10} {'rows/sec':>10}")
+    for workers in worker_counts:
+        rate, elapsed = run(args.rows, workers, args.chunk_size)
+        print(f"{workers:>8} {args.rows:>8} {elapsed:>10.2f} {rate:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,21 +5,30 @@ from app.models.course_models import Course, CourseClass, CourseSchedule,Enrollm
 from app.models.user import Instructor, Student
 from sqlalchemy.exc import IntegrityError
 from app.controllers.api.admin.admin import role_required
+from app.utils.streaming import requested_stream_format, stream_query
 from app.utils.course_helper import is_duplicate_course, is_duplicate_class_code, is_conflicting_schedule,generate_course_code
 
 course_bp = Blueprint('course_bp', __name__)
-# đã check
-@course_bp.route('/', methods=['GET'])    
-@role_required(['Admin'])
-def get_all_courses():
-    courses = Course.query.all()
-    data = [{
+
+def course_to_dict(c):
+    return {
         'id': c.id,
         'code': c.code,
         'name': c.name,
         'credit': c.credit,
         'faculty_id': c.faculty_id
-    } for c in courses]
+    }
+
+# đã check
+@course_bp.route('/', methods=['GET'])    
+@role_required(['Admin'])
+def get_all_courses():
+    stream_format = requested_stream_format()
+    if stream_format:
+        return stream_query(Course.query.order_by(Course.id), course_to_dict, stream_format)
+
+    courses = Course.query.all()
+    data = [course_to_dict(c) for c in courses]
     return jsonify(data)
 
 # đã check
@@ -110,17 +119,34 @@ def update_course_class(id):
     return jsonify({'message': 'Course class updated'})
 
 
-@course_bp.route('/classes/<int:instructor_id>', methods=['GET'])
-@role_required(['Admin'])
-def get_classes_by_instructor(instructor_id):
-    classes = CourseClass.query.filter_by(instructor_id=instructor_id).all()
-    result = [{
+def course_class_to_dict(c):
+    return {
         'id': c.id,
         'class_code': c.class_code,
-        'course_name': c.course.name,
+        'course_name': c.course_name,
         'semester': c.semester,
         'academic_year': c.academic_year
-    } for c in classes]
+    }
+
+@course_bp.route('/classes/<int:instructor_id>', methods=['GET'])
+@role_required(['Admin'])
+def get_classes_by_instructor(instructor_id):
+    # Lấy luôn tên môn học trong cùng câu query thay vì c.course.name cho từng lớp
+    query = (
+        db.session.query(
+            CourseClass.id, CourseClass.class_code, Course.name.label('course_name'),
+            CourseClass.semester, CourseClass.academic_year
+        )
+        .join(Course, Course.id == CourseClass.course_id)
+        .filter(CourseClass.instructor_id == instructor_id)
+        .order_by(CourseClass.id)
+    )
+
+    stream_format = requested_stream_format()
+    if stream_format:
+        return stream_query(query, course_class_to_dict, stream_format)
+
+    result = [course_class_to_dict(c) for c in query.all()]
     return jsonify(result)
 
 
@@ -0,0 +1,11 @@
+import os
+import pytest
+
+# Mặc định dùng SQLite trong bộ nhớ; đặt TEST_DATABASE_URL (PostgreSQL) để chạy cả các
+# test cần tính năng riêng của PostgreSQL (array_agg ... ORDER BY, ON CONFLICT, pg_trgm...).
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL', 'sqlite://')
+
+requires_postgres = pytest.mark.skipif(
+    not TEST_DATABASE_URL.startswith('postgresql'),
+    reason='cần PostgreSQL (TEST_DATABASE_URL)'
+)
@@ -0,0 +1,40 @@
+import pytest
+from sqlalchemy import update
+
+from app import db
+from app.models.user import Faculty, Major
+from app.services.catalog_import import import_faculty_major_rows
+from tests.markers import requires_postgres
+
+pytestmark = requires_postgres
+
+
+@pytest.fixture
+def catalog(app):
+    yield
+    db.session.rollback()
+    Major.query.delete()
+    Faculty.query.delete()
+    db.session.commit()
+
+
+def test_import_adds_faculties_and_majors(catalog):
+    result = import_faculty_major_rows([
+        ('Luật', 'Luật kinh tế'), ('LUẬT', 'Luật quốc tế'), ('Luật', 'Luật kinh tế'), (None, 'Không khoa'),
+    ])
+
+    assert result == {'added_faculty': 1, 'added_major': 2, 'skipped_major': 1, 'missing_faculty': 0}
+    assert Faculty.query.count() == 1
+
+
+# Khoa cũ chưa backfill name_normalized: dòng của khoa đó bị báo thiếu, không làm hỏng cả file
+def test_faculty_without_normalized_name_is_reported(catalog):
+    db.session.add(Faculty(name='Ngôn ngữ', prefix='NN'))
+    db.session.commit()
+    db.session.execute(update(Faculty).values(name_normalized=None))
+    db.session.commit()
+
+    result = import_faculty_major_rows([('Ngôn ngữ', 'Tiếng Anh'), ('Du lịch', 'Quản trị lữ hành')])
+
+    assert result == {'added_faculty': 1, 'added_major': 1, 'skipped_major': 0, 'missing_faculty': 1}
+    assert [m.name for m in Major.query.all()] == ['Quản trị lữ hành']
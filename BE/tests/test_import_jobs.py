@@ -0,0 +1,62 @@
+import time
+from io import BytesIO
+import pytest
+from openpyxl import Workbook
+
+from app.models.user import Student
+from app.services.import_jobs import JOB_DONE, JOB_FAILED
+from app.services.user_import import STUDENT_COLUMNS
+from app.utils.excel_reader import ExcelReader
+
+JOB_TIMEOUT = 30
+
+
+def student_workbook(count):
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(STUDENT_COLUMNS)
+    for i in range(1, count + 1):
+        sheet.append([i, f'Trần Thị {i:02d}', '01/02/2004', f'0010{i:08d}', 'Công nghệ thông tin',
+                      'Kỹ thuật phần mềm', '2024', '0912345678', 'Nữ', 'Hà Nội'])
+    output = BytesIO()
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+
+def wait_for_job(client, job_id, headers):
+    deadline = time.monotonic() + JOB_TIMEOUT
+    while True:
+        job = client.get(f'/api/user/import-jobs/{job_id}', headers=headers).get_json()
+        if job['status'] in (JOB_DONE, JOB_FAILED) or time.monotonic() > deadline:
+            return job
+        time.sleep(0.05)
+
+
+# File upload của job được lưu không có đuôi .xlsx
+def test_excel_reader_opens_path_without_xlsx_extension(tmp_path):
+    path = tmp_path / 'job.upload'
+    path.write_bytes(student_workbook(2).getvalue())
+
+    with ExcelReader(str(path)) as reader:
+        assert reader.columns == STUDENT_COLUMNS
+        assert len(list(reader.iter_rows(['STT']))) == 2
+
+
+def test_async_xlsx_student_import(client, catalog, admin_headers):
+    response = client.post(
+        '/api/user/upload-student-list?async=1',
+        data={'file': (student_workbook(3), 'danh_sach.xlsx')},
+        content_type='multipart/form-data'
+    )
+    assert response.status_code == 202
+
+    job_id = response.get_json()['job_id']
+    job = wait_for_job(client, job_id, admin_headers)
+    assert job['status'] == JOB_DONE, job['error']
+    assert (job['processed'], job['succeeded'], job['failed']) == (3, 3, 0)
+    assert Student.query.count() == 3
+
+    result = client.get(f'/api/user/import-jobs/{job_id}/result', headers=admin_headers)
+    assert result.status_code == 200
+    assert result.data[:4] == b'PK\x03\x04'
@@ -0,0 +1,176 @@
+import asyncio
+import socket
+import threading
+import pytest
+from flask import Flask
+from flask_mail import Message
+
+from app.extensions import mail
+from app.services.mail_queue import MailQueue
+
+# Gửi tới server SMTP cục bộ (aiosmtpd); thiếu thư viện thì bỏ qua cả file
+Controller = pytest.importorskip('aiosmtpd.controller').Controller
+
+TIMEOUT = 10
+
+
+# Trả lời lệnh DATA lần lượt theo `responses` ('disconnect' = server ngắt kết nối),
+# hết danh sách thì nhận mail. block: DATA chờ tới khi release được set.
+class ScriptedHandler:
+    def __init__(self):
+        self.responses = []
+        self.received = []
+        self.attempts = 0
+        self.block = False
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    async def handle_DATA(self, server, session, envelope):
+        self.attempts += 1
+        self.started.set()
+        if self.block:
+            await asyncio.get_running_loop().run_in_executor(None, self.release.wait, TIMEOUT)
+        response = self.responses.pop(0) if self.responses else '250 OK'
+        if response == 'disconnect':
+            server.transport.close()
+            return '421 closing'
+        if response.startswith('250'):
+            self.received.extend(envelope.rcpt_tos)
+        return response
+
+
+class BrokenMessage(Message):
+    def as_bytes(self):
+        raise ValueError('không dựng được nội dung mail')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def message(i):
+    msg = Message('Mã khôi phục mật khẩu', recipients=[f'sv{i}@daihocnguyentrai.edu.vn'])
+    msg.body = f'Mã xác nhận của bạn là: {100000 + i}'
+    return msg
+
+
+@pytest.fixture
+def smtp():
+    handler = ScriptedHandler()
+    controller = Controller(handler, hostname='127.0.0.1', port=free_port())
+    controller.start()
+    handler.port = controller.port
+    yield handler
+    handler.release.set()
+    controller.stop()
+
+
+@pytest.fixture
+def mail_app(smtp):
+    app = Flask(__name__)
+    app.config.update(
+        MAIL_SERVER='127.0.0.1', MAIL_PORT=smtp.port, MAIL_USE_TLS=False,
+        MAIL_DEFAULT_SENDER='noreply@daihocnguyentrai.edu.vn',
+        MAIL_QUEUE_MAX_SIZE=100, MAIL_QUEUE_MAX_RETRIES=2, MAIL_QUEUE_BACKOFF=0.01, MAIL_QUEUE_IDLE_TIMEOUT=5,
+    )
+    mail.init_app(app)
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def mail_queue(mail_app):
+    queue = MailQueue(mail_app)
+    yield queue
+    queue.stop(TIMEOUT)
+
+
+def test_messages_are_delivered_over_one_connection(mail_queue, smtp):
+    for i in range(3):
+        assert mail_queue.enqueue(message(i))
+    mail_queue.stop(TIMEOUT)
+
+    assert smtp.received == [f'sv{i}@daihocnguyentrai.edu.vn' for i in range(3)]
+    stats = mail_queue.stats()
+    assert (stats['sent'], stats['failed'], stats['retries'], stats['connections']) == (3, 0, 0, 1)
+
+
+@pytest.mark.parametrize('response', ['451 4.3.0 thử lại sau', 'disconnect'])
+def test_transient_errors_are_retried(mail_queue, smtp, response):
+    smtp.responses = [response]
+    mail_queue.enqueue(message(1))
+    mail_queue.stop(TIMEOUT)
+
+    assert smtp.received == ['sv1@daihocnguyentrai.edu.vn']
+    stats = mail_queue.stats()
+    assert (stats['sent'], stats['failed'], stats['retries']) == (1, 0, 1)
+
+
+def test_gives_up_after_max_retries(mail_queue, smtp):
+    smtp.responses = ['451 4.3.0 thử lại sau'] * 3
+    mail_queue.enqueue(message(1))
+    mail_queue.stop(TIMEOUT)
+
+    assert smtp.attempts == 3
+    stats = mail_queue.stats()
+    assert (stats['sent'], stats['failed'], stats['retries']) == (0, 1, 2)
+
+
+def test_5xx_response_is_permanent(mail_queue, smtp):
+    smtp.responses = ['550 5.1.1 hộp thư không tồn tại']
+    mail_queue.enqueue(message(1))
+    mail_queue.enqueue(message(2))
+    mail_queue.stop(TIMEOUT)
+
+    assert smtp.attempts == 2
+    assert smtp.received == ['sv2@daihocnguyentrai.edu.vn']
+    stats = mail_queue.stats()
+    assert (stats['sent'], stats['failed'], stats['retries']) == (1, 1, 0)
+
+
+# Lỗi ngoài SMTP/mạng chỉ làm hỏng mail đó, thread gửi vẫn xử lý mail tiếp theo
+def test_unexpected_error_does_not_stop_sender(mail_queue, smtp):
+    broken = BrokenMessage('Lỗi', recipients=['sv1@daihocnguyentrai.edu.vn'])
+    mail_queue.enqueue(broken)
+    mail_queue.enqueue(message(2))
+    mail_queue.stop(TIMEOUT)
+
+    assert smtp.received == ['sv2@daihocnguyentrai.edu.vn']
+    stats = mail_queue.stats()
+    assert (stats['sent'], stats['failed']) == (1, 1)
+
+
+def test_full_queue_rejects_and_counts_dropped(mail_app, smtp):
+    mail_app.config['MAIL_QUEUE_MAX_SIZE'] = 1
+    queue = MailQueue(mail_app)
+    smtp.block = True
+    try:
+        assert queue.enqueue(message(1))
+        # Mail đầu đã được lấy ra và đang gửi, hàng đợi còn chỗ cho đúng 1 mail
+        assert smtp.started.wait(TIMEOUT)
+        assert queue.enqueue(message(2))
+        assert not queue.enqueue(message(3))
+        assert queue.stats()['dropped'] == 1
+    finally:
+        smtp.release.set()
+        queue.stop(TIMEOUT)
+
+    assert queue.stats()['sent'] == 2
+
+
+def test_stop_drains_pending_messages(mail_queue, smtp):
+    smtp.block = True
+    for i in range(5):
+        mail_queue.enqueue(message(i))
+    assert smtp.started.wait(TIMEOUT)
+    assert mail_queue.stats()['queue_depth'] == 4
+
+    smtp.release.set()
+    mail_queue.stop(TIMEOUT)
+
+    assert len(smtp.received) == 5
+    stats = mail_queue.stats()
+    assert (stats['sent'], stats['queue_depth']) == (5, 0)
+    assert not mail_queue._thread.is_alive()
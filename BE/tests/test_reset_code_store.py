@@ -0,0 +1,66 @@
+import pytest
+
+from app.utils.reset_code_store import (
+    MemoryResetCodeStore, SqliteResetCodeStore, save_reset_code,
+    CODE_OK, CODE_INVALID, CODE_MISSING, CODE_LOCKED
+)
+
+MAX_ATTEMPTS = 3
+EMAIL = 'sv001@daihocnguyentrai.edu.vn'
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryResetCodeStore(MAX_ATTEMPTS)
+    return SqliteResetCodeStore(str(tmp_path / 'reset_codes.sqlite3'), MAX_ATTEMPTS)
+
+
+def test_code_is_single_use(store):
+    store.save(EMAIL, '123456', 60)
+
+    assert store.verify(EMAIL, '123456') == CODE_OK
+    assert store.verify(EMAIL, '123456') == CODE_MISSING
+
+
+def test_new_code_replaces_old_one(store):
+    store.save(EMAIL, '123456', 60)
+    store.save(EMAIL, '654321', 60)
+
+    assert store.verify(EMAIL, '123456') == CODE_INVALID
+    assert store.verify(EMAIL, '654321') == CODE_OK
+
+
+def test_expired_code_is_missing_and_swept(store):
+    store.save(EMAIL, '123456', 0)
+    store.save('other@daihocnguyentrai.edu.vn', '111111', 60)
+
+    assert store.verify(EMAIL, '123456') == CODE_MISSING
+    store.sweep()
+    assert store.verify('other@daihocnguyentrai.edu.vn', '111111') == CODE_OK
+
+
+def test_code_is_locked_after_max_attempts(store):
+    store.save(EMAIL, '123456', 60)
+
+    for _ in range(MAX_ATTEMPTS - 1):
+        assert store.verify(EMAIL, '000000') == CODE_INVALID
+    assert store.verify(EMAIL, '000000') == CODE_LOCKED
+    # Mã đã bị huỷ, nhập đúng cũng không dùng được
+    assert store.verify(EMAIL, '123456') == CODE_MISSING
+
+
+@pytest.mark.parametrize('code', ['ñ23456', 123456, None])
+def test_non_ascii_or_non_string_code_is_invalid(store, code):
+    store.save(EMAIL, '123457', 60)
+
+    assert store.verify(EMAIL, code) == CODE_INVALID
+
+
+def test_reset_password_rejects_non_ascii_code(app, client):
+    with app.app_context():
+        save_reset_code(EMAIL, '123456')
+
+    response = client.post('/api/admin/reset-password',
+                           json={'email': EMAIL, 'code': 'ñ23456', 'new_password': 'matkhaumoi'})
+    assert response.status_code == 400
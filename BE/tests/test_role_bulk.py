@@ -0,0 +1,42 @@
+import pytest
+
+from app import db
+from app.models.user import Users, Role, UserRole
+from tests.markers import requires_postgres
+
+pytestmark = [requires_postgres, pytest.mark.filterwarnings('error::sqlalchemy.exc.SAWarning')]
+
+
+@pytest.fixture
+def members(app):
+    role = Role(name='Cố vấn học tập')
+    users = [Users(name=f'Lê Văn {i}', email=f'covan{i}@daihocnguyentrai.edu.vn', password='x', status='active')
+             for i in range(3)]
+    db.session.add_all([role, *users])
+    db.session.commit()
+    yield role.id, [user.id for user in users]
+    db.session.rollback()
+    UserRole.query.filter_by(role_id=role.id).delete()
+    Users.query.filter(Users.id.in_([user.id for user in users])).delete()
+    Role.query.filter_by(id=role.id).delete()
+    db.session.commit()
+
+
+def test_bulk_assign_and_remove_by_user_ids(client, admin_headers, members):
+    role_id, user_ids = members
+    body = {'role_ids': [role_id], 'user_ids': user_ids}
+
+    assert client.post('/api/role/bulk_assign', json=body, headers=admin_headers).get_json() == {'granted': 3}
+    # Cặp đã có bị bỏ qua
+    assert client.post('/api/role/bulk_assign', json=body, headers=admin_headers).get_json() == {'granted': 0}
+    assert client.post('/api/role/bulk_remove', json=body, headers=admin_headers).get_json() == {'revoked': 3}
+    assert UserRole.query.filter_by(role_id=role_id).count() == 0
+
+
+def test_bulk_assign_rejects_unknown_role(client, admin_headers, members):
+    role_id, user_ids = members
+    response = client.post('/api/role/bulk_assign', json={'role_ids': [role_id + 1000], 'user_ids': user_ids},
+                           headers=admin_headers)
+
+    assert response.status_code == 400
+    assert response.get_json()['missing_role_ids'] == [role_id + 1000]
@@ -0,0 +1,62 @@
+import time
+import pytest
+
+from app.utils.token_blocklist import MemoryBlocklist, SqliteBlocklist
+
+LIST_ARGS = {'limit': 1, 'fields': 'id,name'}
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def blocklist(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryBlocklist()
+    return SqliteBlocklist(str(tmp_path / 'token_blocklist.sqlite3'))
+
+
+# Các jti đang được lưu (kể cả mục đã hết hạn nhưng chưa được dọn)
+def stored_jtis(blocklist):
+    if isinstance(blocklist, MemoryBlocklist):
+        return set(blocklist._entries)
+    return {row['jti'] for row in blocklist._connection().execute('SELECT jti FROM token_blocklist')}
+
+
+def test_revoked_token_is_found(blocklist):
+    blocklist.add('jti-1', time.time() + 60)
+
+    assert blocklist.contains('jti-1')
+    assert not blocklist.contains('jti-2')
+
+
+def test_entry_is_ignored_after_token_expires(blocklist):
+    blocklist.add('jti-1', time.time() - 1)
+
+    assert not blocklist.contains('jti-1')
+
+
+def test_expired_entries_are_swept_on_add(blocklist):
+    blocklist._next_sweep = time.time() + 60
+    blocklist.add('old', time.time() - 1)
+    blocklist.add('live', time.time() + 60)
+    assert 'old' in stored_jtis(blocklist)
+
+    blocklist._next_sweep = 0
+    blocklist.add('new', time.time() + 60)
+
+    assert stored_jtis(blocklist) == {'live', 'new'}
+
+
+# Các worker cùng máy dùng chung file SQLite
+def test_sqlite_blocklist_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / 'token_blocklist.sqlite3')
+    SqliteBlocklist(path).add('jti-1', time.time() + 60)
+
+    assert SqliteBlocklist(path).contains('jti-1')
+
+
+def test_token_is_rejected_after_logout(client, admin_headers):
+    assert client.get('/api/user', query_string=LIST_ARGS, headers=admin_headers).status_code == 200
+    assert client.post('/api/auth/logout', headers=admin_headers).status_code == 200
+
+    response = client.get('/api/user', query_string=LIST_ARGS, headers=admin_headers)
+    assert response.status_code == 401
+    assert response.get_json() == {'msg': 'Token has been revoked'}
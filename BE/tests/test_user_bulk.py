@@ -0,0 +1,192 @@
+import pytest
+
+from app import db
+from app.models.course_models import Course, CourseClass
+from app.models.user import Users, Student, Instructor, Faculty, Major, Role, UserRole
+from tests.markers import requires_postgres
+
+
+# 3 sinh viên khoá 2021 và 1 giảng viên cùng khoa, sinh viên có vai trò Student
+@pytest.fixture
+def people(app):
+    faculty = Faculty(name='Kinh tế', prefix='KT')
+    db.session.add(faculty)
+    db.session.flush()
+    major = Major(name='Kế toán', prefix='KTOAN', faculty_id=faculty.id)
+    role = Role(name='Student')
+    db.session.add_all([major, role])
+    db.session.flush()
+
+    students = []
+    for i in range(3):
+        user = Users(name=f'Phạm Văn {i}', email=f'kt{i}@daihocnguyentrai.edu.vn', password='x', status='active')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Student(user_id=user.id, student_id=f'21KT{i:04d}', faculty_id=faculty.id,
+                               major_id=major.id, enrollment_year='2021'))
+        db.session.add(UserRole(user_id=user.id, role_id=role.id))
+        students.append(user.id)
+    lecturer = Users(name='Đỗ Thị Lan', email='gvkt@daihocnguyentrai.edu.vn', password='x', status='active')
+    db.session.add(lecturer)
+    db.session.flush()
+    instructor = Instructor(user_id=lecturer.id, employee_id='GV990001', faculty_id=faculty.id)
+    db.session.add(instructor)
+    db.session.commit()
+
+    yield {'faculty_id': faculty.id, 'major_id': major.id, 'students': students,
+           'lecturer': lecturer.id, 'instructor_id': instructor.id}
+
+    db.session.rollback()
+    user_ids = students + [lecturer.id]
+    UserRole.query.filter(UserRole.user_id.in_(user_ids)).delete()
+    Student.query.filter(Student.user_id.in_(user_ids)).delete()
+    Instructor.query.filter(Instructor.user_id.in_(user_ids)).delete()
+    Users.query.filter(Users.id.in_(user_ids)).delete()
+    Role.query.filter_by(id=role.id).delete()
+    Major.query.filter_by(id=major.id).delete()
+    Faculty.query.filter_by(id=faculty.id).delete()
+    db.session.commit()
+
+
+def snapshot(user_ids):
+    db.session.expire_all()
+    users = Users.query.filter(Users.id.in_(user_ids)).order_by(Users.id).all()
+    return [(u.name, u.phone, u.gender, u.status, u.is_deleted) for u in users]
+
+
+def bulk_patch(client, headers, body):
+    return client.patch('/api/user/bulk', json=body, headers=headers)
+
+
+def test_bulk_update_applies_each_patch(client, admin_headers, people):
+    first, second, _ = people['students']
+    response = bulk_patch(client, admin_headers, {'updates': [
+        {'id': first, 'name': 'Phạm Văn Hùng', 'phone': '0901234567'},
+        {'id': second, 'status': 'inactive', 'enrollment_year': '2022'},
+    ]})
+
+    assert response.status_code == 200
+    assert response.get_json()['updated'] == 2
+    db.session.expire_all()
+    assert db.session.get(Users, first).name_normalized == 'pham van hung'
+    assert db.session.get(Users, second).status == 'inactive'
+    assert Student.query.filter_by(user_id=second).one().enrollment_year == '2022'
+
+
+def test_bulk_patch_by_filter(client, admin_headers, people):
+    response = bulk_patch(client, admin_headers, {
+        'filter': {'enrollment_year': '2021', 'faculty_id': people['faculty_id']},
+        'patch': {'status': 'inactive'},
+    })
+
+    assert response.get_json()['updated'] == 3
+    assert {status for _, _, _, status, _ in snapshot(people['students'])} == {'inactive'}
+    assert snapshot([people['lecturer']])[0][3] == 'active'
+
+
+@pytest.mark.parametrize('patch', [
+    {'enrollment_year': '20211'},
+    {'gender': 'không muốn nói'},
+    {'phone': '0' * 21},
+    {'birth': 20040101},
+    {'name': ''},
+    {'faculty_id': '1'},
+    {'email': 'moi@daihocnguyentrai.edu.vn'},
+])
+def test_invalid_values_are_rejected_before_writing(client, admin_headers, people, patch):
+    user_ids = people['students']
+    before = snapshot(user_ids)
+
+    updates = [{'id': user_ids[0], 'name': 'Tên mới'}, dict(patch, id=user_ids[1])]
+    assert bulk_patch(client, admin_headers, {'updates': updates}).status_code == 400
+    filtered = {'filter': {'enrollment_year': '2021'}, 'patch': patch}
+    assert bulk_patch(client, admin_headers, filtered).status_code == 400
+    assert snapshot(user_ids) == before
+
+
+def test_unknown_catalog_ids_are_rejected(client, admin_headers, people):
+    missing = people['major_id'] + 1000
+    response = bulk_patch(client, admin_headers, {'updates': [{'id': people['students'][0], 'major_id': missing}]})
+
+    assert response.status_code == 400
+    assert response.get_json()['missing_major_ids'] == [missing]
+
+
+def test_unknown_user_ids_are_rejected(client, admin_headers, people):
+    missing = people['lecturer'] + 1000
+    response = bulk_patch(client, admin_headers, {'updates': [
+        {'id': people['students'][0], 'status': 'inactive'},
+        {'id': missing, 'status': 'inactive'},
+    ]})
+
+    assert response.status_code == 400
+    assert response.get_json()['missing_user_ids'] == [missing]
+    assert snapshot(people['students'][:1])[0][3] == 'active'
+
+
+def test_bulk_patch_requires_a_filter(client, admin_headers, people):
+    response = bulk_patch(client, admin_headers, {'filter': {}, 'patch': {'status': 'inactive'}})
+
+    assert response.status_code == 400
+    assert {status for _, _, _, status, _ in snapshot(people['students'])} == {'active'}
+
+
+@pytest.mark.parametrize('action', ['soft_delete', 'restore', 'purge'])
+@pytest.mark.parametrize('body', [{}, {'filter': {}}, {'filter': {'status': ''}}])
+def test_bulk_delete_requires_a_filter(client, admin_headers, people, action, body):
+    before = snapshot(people['students'])
+
+    response = client.post(f'/api/user/bulk/{action}', json=body, headers=admin_headers)
+    assert response.status_code == 400
+    assert snapshot(people['students']) == before
+
+
+def test_soft_delete_and_restore_by_filter(client, admin_headers, people):
+    body = {'filter': {'enrollment_year': '2021'}}
+
+    response = client.post('/api/user/bulk/soft_delete', json=body, headers=admin_headers)
+    assert response.get_json()['deleted'] == 3
+    assert {(status, deleted) for _, _, _, status, deleted in snapshot(people['students'])} == {('inactive', True)}
+    assert snapshot([people['lecturer']])[0][4] is False
+
+    response = client.post('/api/user/bulk/restore', json=body, headers=admin_headers)
+    assert response.get_json()['restored'] == 3
+    assert {(status, deleted) for _, _, _, status, deleted in snapshot(people['students'])} == {('active', False)}
+
+
+def test_purge_removes_users_profiles_and_roles(client, admin_headers, people):
+    response = client.post('/api/user/bulk/purge', json={'filter': {'enrollment_year': '2021'}},
+                           headers=admin_headers)
+
+    assert response.get_json()['deleted'] == 3
+    assert snapshot(people['students']) == []
+    assert Student.query.filter(Student.user_id.in_(people['students'])).count() == 0
+    assert UserRole.query.filter(UserRole.user_id.in_(people['students'])).count() == 0
+    assert snapshot([people['lecturer']]) != []
+
+
+# Giảng viên còn lớp học phần -> IntegrityError, cả lô (kể cả sinh viên) không bị xoá
+@requires_postgres
+def test_purge_with_referenced_user_changes_nothing(client, admin_headers, people):
+    course = Course(code='KT101', name='Nguyên lý kế toán', faculty_id=people['faculty_id'])
+    db.session.add(course)
+    db.session.flush()
+    db.session.add(CourseClass(course_id=course.id, instructor_id=people['instructor_id'], class_code='KT101-01',
+                               semester='1', academic_year='2024-2025'))
+    db.session.commit()
+    user_ids = people['students'] + [people['lecturer']]
+    before = snapshot(user_ids)
+    try:
+        response = client.post('/api/user/bulk/purge', json={'filter': {'faculty_id': people['faculty_id']}},
+                               headers=admin_headers)
+
+        assert response.status_code == 409
+        assert snapshot(user_ids) == before
+        assert Student.query.filter(Student.user_id.in_(user_ids)).count() == 3
+        assert Instructor.query.filter(Instructor.user_id.in_(user_ids)).count() == 1
+        assert UserRole.query.filter(UserRole.user_id.in_(user_ids)).count() == 3
+    finally:
+        db.session.rollback()
+        CourseClass.query.filter_by(course_id=course.id).delete()
+        Course.query.filter_by(id=course.id).delete()
+        db.session.commit()
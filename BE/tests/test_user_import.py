@@ -0,0 +1,72 @@
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app.models.import_models import ImportCheckpoint
+from app.models.user import Student, Instructor
+from app.services import user_import
+from app.services.import_checkpoints import get_checkpoint
+from app.utils.text_helper import normalize_text
+
+FACULTY = 'Công nghệ thông tin'
+MAJOR = 'Kỹ thuật phần mềm'
+
+
+def student_rows(first, count):
+    return [(i, f'Vũ Minh {i:02d}', '01/02/2004', f'0010{i:08d}', FACULTY, MAJOR, '2024',
+             '0912345678', 'Nam', 'Hà Nội') for i in range(first, first + count)]
+
+
+def instructor_rows(first, count):
+    return [(i, f'Hoàng Lan {i:02d}', '05/06/1985', f'0020{i:08d}', FACULTY, '0987654321',
+             'Nữ', 'Hà Nội', 'Giảng viên', 'Thạc sĩ', 2015) for i in range(first, first + count)]
+
+
+def connection_lost():
+    return OperationalError('SELECT ...', {}, Exception('server closed the connection unexpectedly'))
+
+
+# Lỗi DB khi kiểm tra trùng chỉ làm hỏng chunk đó; checkpoint không tiến qua chunk lỗi
+def test_duplicate_lookup_error_fails_only_its_chunk(catalog, monkeypatch):
+    find_existing = user_import.find_existing
+    calls = []
+
+    def flaky_find_existing(column, values):
+        calls.append(column)
+        if len(calls) == 1:
+            raise connection_lost()
+        return find_existing(column, values)
+
+    monkeypatch.setattr(user_import, 'find_existing', flaky_find_existing)
+    success, errors = user_import.import_students(
+        [student_rows(1, 2), student_rows(3, 2)],
+        {normalize_text(FACULTY): catalog['faculty_id']}, {normalize_text(MAJOR): catalog['major_id']},
+        checkpoint=get_checkpoint('student', 'file-hash')
+    )
+
+    assert len(errors) == 2
+    assert all('server closed the connection' in error for error in errors)
+    assert [row['Tên'] for row in success] == ['Vũ Minh 03', 'Vũ Minh 04']
+    assert Student.query.count() == 2
+    assert ImportCheckpoint.query.count() == 0
+
+
+def test_key_reservation_error_fails_only_its_chunk(catalog, monkeypatch):
+    issued = []
+
+    def flaky_reserve(faculty_id, count):
+        if not issued:
+            issued.append(None)
+            raise connection_lost()
+        first = len(issued)
+        issued.extend([None] * count)
+        return [f'GV99{i:04d}' for i in range(first, first + count)]
+
+    monkeypatch.setattr(user_import, 'reserve_instructor_ids', flaky_reserve)
+    success, errors = user_import.import_instructors(
+        [instructor_rows(1, 2), instructor_rows(3, 3)], {normalize_text(FACULTY): catalog['faculty_id']}
+    )
+
+    assert len(errors) == 2
+    assert all(error.startswith('Lỗi giảng viên Hoàng Lan 0') for error in errors)
+    assert len(success) == 3
+    assert Instructor.query.count() == 3
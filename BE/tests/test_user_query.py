@@ -0,0 +1,105 @@
+import pytest
+from sqlalchemy import event
+
+from app import db
+from app.models.user import Users, Student, Instructor, Faculty, Major, Role, UserRole
+from app.services.user_query import list_users, parse_user_list_args, encode_cursor
+from tests.markers import requires_postgres
+
+USER_COUNT = 60
+
+
+@pytest.fixture(scope='module')
+def users(app):
+    faculty = Faculty(name='Công nghệ thông tin', prefix='CNTT')
+    db.session.add(faculty)
+    db.session.flush()
+    major = Major(name='Kỹ thuật phần mềm', prefix='KTPM', faculty_id=faculty.id)
+    admin, student_role = Role(name='Admin'), Role(name='Student')
+    db.session.add_all([major, admin, student_role])
+    db.session.flush()
+
+    for i in range(USER_COUNT):
+        user = Users(name=f'Nguyễn Văn {i:03d}', email=f'user{i}@daihocnguyentrai.edu.vn',
+                     password='x', status='active')
+        db.session.add(user)
+        db.session.flush()
+        if i % 2:
+            db.session.add(Instructor(user_id=user.id, employee_id=f'GV01{i:04d}', faculty_id=faculty.id))
+            db.session.add(UserRole(user_id=user.id, role_id=admin.id))
+        else:
+            db.session.add(Student(user_id=user.id, student_id=f'SV{i:06d}', faculty_id=faculty.id,
+                                   major_id=major.id, enrollment_year='2024'))
+            db.session.add(UserRole(user_id=user.id, role_id=student_role.id))
+    db.session.commit()
+    yield
+    for model in (UserRole, Student, Instructor, Users, Role, Major, Faculty):
+        model.query.delete()
+    db.session.commit()
+
+
+# Số câu lệnh SQL chạy khi lấy 1 trang danh sách
+def count_statements(args):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *rest):
+        statements.append(statement)
+
+    options = parse_user_list_args(args)
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        result = list_users(options)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    return len(statements), result['users']
+
+
+LIST_ARGS = [
+    pytest.param({}, marks=requires_postgres, id='all-fields'),
+    pytest.param({'fields': 'id,name,email,status'}, id='user-columns'),
+    pytest.param({'fields': 'id,name,student_info,instructor_info'}, id='profiles'),
+    pytest.param({'fields': 'id,name,student_info', 'role': 'student'}, id='student-filter'),
+    pytest.param({'fields': 'id,name,email', 'role': 'admin'}, id='role-filter'),
+    pytest.param({'fields': 'id,name,roles', 'role': 'admin'}, marks=requires_postgres, id='roles-role-filter'),
+]
+
+
+@pytest.mark.parametrize('args', LIST_ARGS)
+def test_list_users_query_count_does_not_depend_on_rows(users, args):
+    one_count, one_rows = count_statements(dict(args, limit='1'))
+    many_count, many_rows = count_statements(dict(args, limit='500'))
+
+    assert len(one_rows) == 1
+    assert len(many_rows) > 1
+    assert one_count == many_count == 1
+
+
+@pytest.mark.parametrize('sort, cursor', [
+    ('id', ['abc']),
+    ('id', [1.5]),
+    ('id', [True]),
+    ('id', [None]),
+    ('-id', [1, 2]),
+    ('name', ['Nguyễn Văn 001']),
+    ('name', [1, 1]),
+    ('email', ['user1@daihocnguyentrai.edu.vn', '1']),
+    ('id', {'id': 1}),
+])
+def test_cursor_values_must_match_sort_columns(sort, cursor):
+    with pytest.raises(ValueError, match='Cursor không hợp lệ'):
+        parse_user_list_args({'sort': sort, 'cursor': encode_cursor(cursor)})
+
+
+def test_next_cursor_round_trips(users):
+    options = parse_user_list_args({'sort': '-name', 'limit': '5', 'fields': 'id,name'})
+    first = list_users(options)
+    options = parse_user_list_args({'sort': '-name', 'limit': '5', 'fields': 'id,name',
+                                    'cursor': first['next_cursor']})
+    second = list_users(options)
+
+    assert [u['name'] for u in second['users']] == [f'Nguyễn Văn {i:03d}' for i in range(54, 49, -1)]
+
+
+def test_list_users_rejects_malformed_cursor(client, admin_headers):
+    response = client.get('/api/user', query_string={'cursor': encode_cursor(['abc'])}, headers=admin_headers)
+    assert response.status_code == 400
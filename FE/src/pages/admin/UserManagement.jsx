@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react'
+import React, { useState, useEffect, useRef } from 'react'
 import axios from 'axios'
 import { API_URL } from '../../config/constants'
 import { toast } from 'react-toastify'
@@ -20,6 +20,8 @@ const ResetPasswordSchema = Yup.object().shape({
   newPassword: Yup.string().min(6, 'Mật khẩu phải có ít nhất 6 ký tự').required('Vui lòng nhập mật khẩu mới')
 })
 
+const PAGE_SIZE = 50
+
 const UserManagement = () => {
   const [users, setUsers] = useState([])
   const [loading, setLoading] = useState(true)
@@ -28,23 +30,54 @@ const UserManagement = () => {
   const [editingUser, setEditingUser] = useState(null)
   const [resetUser, setResetUser] = useState(null)
   const [searchTerm, setSearchTerm] = useState('')
+  const [debouncedSearch, setDebouncedSearch] = useState('')
   const [roleFilter, setRoleFilter] = useState('all')
+  const [nextCursor, setNextCursor] = useState(null)
+  const [loadingMore, setLoadingMore] = useState(false)
+  const requestId = useRef(0)
+
+  // Danh sách được phân trang phía server: mỗi lần chỉ lấy PAGE_SIZE người dùng,
+  // lọc vai trò và tìm kiếm (q) cũng do server làm trên toàn bộ người dùng
+  const fetchUsers = async (cursor = null) => {
+    const params = { limit: PAGE_SIZE, sort: 'name' }
+    if (roleFilter !== 'all') params.role = roleFilter
+    if (debouncedSearch) params.q = debouncedSearch
+    if (cursor) params.cursor = cursor
+
+    // Bỏ qua response của lần tìm cũ về muộn hơn lần tìm mới
+    const current = ++requestId.current
+    const response = await axios.get(`${API_URL}/admin/users`, { params })
+    if (current !== requestId.current) return
+    setUsers(prev => cursor ? [...prev, ...response.data.users] : response.data.users)
+    setNextCursor(response.data.next_cursor)
+  }
 
+  // Chờ người dùng ngừng gõ rồi mới gửi từ khoá lên server
   useEffect(() => {
-    const fetchUsers = async () => {
-      try {
-        const response = await axios.get(`${API_URL}/admin/users`)
-        setUsers(response.data.users)
-      } catch (error) {
+    const timer = setTimeout(() => setDebouncedSearch(searchTerm.trim()), 300)
+    return () => clearTimeout(timer)
+  }, [searchTerm])
+
+  useEffect(() => {
+    setLoading(true)
+    fetchUsers()
+      .catch((error) => {
         toast.error('Không thể tải danh sách người dùng')
         console.error(error)
-      } finally {
-        setLoading(false)
-      }
-    }
+      })
+      .finally(() => setLoading(false))
+  }, [roleFilter, debouncedSearch])
 
-    fetchUsers()
-  }, [])
+  const handleLoadMore = async () => {
+    setLoadingMore(true)
+    try {
+      await fetchUsers(nextCursor)
+    } catch (error) {
+      toast.error('Không thể tải thêm người dùng')
+    } finally {
+      setLoadingMore(false)
+    }
+  }
 
   const handleAddUser = () => {
     setEditingUser(null)
@@ -113,19 +146,6 @@ const UserManagement = () => {
     }
   }
 
-  const filteredUsers = users.filter(user => {
-    const matchesRole = roleFilter === 'all' || user.role === roleFilter
-    const matchesSearch = user.name.toLowerCase().includes(searchTerm.toLowerCase()) || 
-                          user.email.toLowerCase().includes(searchTerm.toLowerCase()) ||
-                          (user.studentId && user.studentId.toLowerCase().includes(searchTerm.toLowerCase()))
-    
-    return matchesRole && matchesSearch
-  })
-
-  if (loading) {
-    return <div className="flex justify-center items-center h-64">Đang tải...</div>
-  }
-
   return (
     <div>
       <div className="flex justify-between items-center mb-6">
@@ -164,7 +184,10 @@ const UserManagement = () => {
         </div>
       </div>
       
-      {filteredUsers.length === 0 ? (
+      {/* Chỉ thay phần bảng khi đang tải để ô tìm kiếm không mất focus */}
+      {loading ? (
+        <div className="flex justify-center items-center h-64">Đang tải...</div>
+      ) : users.length === 0 ? (
         <div className="card text-center p-6">
           <p>Không tìm thấy người dùng nào.</p>
         </div>
@@ -182,7 +205,7 @@ const UserManagement = () => {
               </tr>
             </thead>
             <tbody>
-              {filteredUsers.map((user) => (
+              {users.map((user) => (
                 <tr key={user.id}>
                   <td>{user.name}</td>
                   <td>{user.email}</td>
@@ -234,6 +257,18 @@ const UserManagement = () => {
           </table>
         </div>
       )}
+
+      {!loading && nextCursor && (
+        <div className="flex justify-center mt-4">
+          <button
+            onClick={handleLoadMore}
+            className="btn btn-secondary"
+            disabled={loadingMore}
+          >
+            {loadingMore ? 'Đang tải...' : 'Tải thêm'}
+          </button>
+        </div>
+      )}
       
       {/* Modal for adding/editing user */}
       {showModal && (